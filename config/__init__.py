@@ -7,4 +7,5 @@ from .config_manager import (
     get_article_id_config,
     get_db_operation_config,
     get_ui_automation_config,
+    get_logging_config,
 )
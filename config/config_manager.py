@@ -136,13 +136,74 @@ class ConfigManager:
             'refresh_count': self.get('crawler.refresh_count', 3),
             'refresh_delay': self.get('crawler.refresh_delay', 3.0),
             'min_interval': self.get('crawler.min_interval', 3),
+            # AIMD 自适应速率相关
+            'adaptive_rate_enabled': self.get('crawler.adaptive_rate_enabled', False),
+            'adaptive_rate_min_interval': self.get('crawler.adaptive_rate_min_interval', 2),
+            'adaptive_rate_max_interval': self.get('crawler.adaptive_rate_max_interval', 60),
+            'adaptive_rate_increase': self.get('crawler.adaptive_rate_increase', 0.5),
+            'adaptive_rate_backoff': self.get('crawler.adaptive_rate_backoff', 0.5),
+            'adaptive_rate_state_file': self.get('crawler.adaptive_rate_state_file', 'data/runtime/rate_state.json'),
             'max_retries': self.get('crawler.max_retries', 3),
             'timeout': self.get('crawler.timeout', 30),
+            'mp_base_url': self.get('crawler.mp_base_url', 'https://mp.weixin.qq.com'),
             'account_delay': self.get('crawler.account_delay', 15),
+            'delay_scale': self.get('crawler.delay_scale', 1.0),
+            'account_workers': self.get('crawler.account_workers', 1),
+            'global_max_requests_per_minute': self.get('crawler.global_max_requests_per_minute', 0),
             'cookie_wait_timeout': self.get('crawler.cookie_wait_timeout', 120),
+            'capture_lookahead': self.get('crawler.capture_lookahead', 0),
+            'capture_daemon_enabled': self.get('crawler.capture_daemon_enabled', False),
+            'network_external_check_enabled': self.get('crawler.network_external_check_enabled', False),
+            'credential_cache_enabled': self.get('crawler.credential_cache_enabled', False),
+            'credential_cache_file': self.get('crawler.credential_cache_file', 'data/runtime/credential_cache.json'),
+            'credential_cache_max_age_sec': self.get('crawler.credential_cache_max_age_sec', 7200),
+            'credential_reuse_enabled': self.get('crawler.credential_reuse_enabled', False),
+            'credential_broker_enabled': self.get('crawler.credential_broker_enabled', False),
+            'credential_broker_url': self.get('crawler.credential_broker_url', ''),
+            'credential_broker_lease_ttl_sec': self.get('crawler.credential_broker_lease_ttl_sec', 900),
+            'credential_broker_wait_sec': self.get('crawler.credential_broker_wait_sec', 120),
             'article_delay_range': self.get('crawler.article_delay_range', [10, 15]),
+            'article_fetch_concurrency': self.get('crawler.article_fetch_concurrency', 1),
             'page_delay_range': self.get('crawler.page_delay_range', [10, 20]),
             'min_rekey_interval_sec': self.get('crawler.min_rekey_interval_sec', 1500),
+            'proactive_rekey_enabled': self.get('crawler.proactive_rekey_enabled', False),
+            'proactive_rekey_margin_sec': self.get('crawler.proactive_rekey_margin_sec', 120),
+            'proactive_rekey_retry_sec': self.get('crawler.proactive_rekey_retry_sec', 300),
+            'credential_default_lifetime_sec': self.get('crawler.credential_default_lifetime_sec', 1800),
+            'key_expiry_classifier_enabled': self.get('crawler.key_expiry_classifier_enabled', False),
+            'key_expiry_zero_streak': self.get('crawler.key_expiry_zero_streak', 2),
+            'captcha_breaker_enabled': self.get('crawler.captcha_breaker_enabled', False),
+            'captcha_breaker_min_cooldown_sec': self.get('crawler.captcha_breaker_min_cooldown_sec', 300),
+            'captcha_breaker_max_cooldown_sec': self.get('crawler.captcha_breaker_max_cooldown_sec', 3600),
+            'captcha_breaker_state_file': self.get('crawler.captcha_breaker_state_file', 'data/runtime/captcha_breaker.json'),
+            'captcha_breaker_max_wait_sec': self.get('crawler.captcha_breaker_max_wait_sec', 3600),
+            'crawl_journal_enabled': self.get('crawler.crawl_journal_enabled', False),
+            'crawl_journal_file': self.get('crawler.crawl_journal_file', 'data/runtime/crawl_journal.jsonl'),
+            'crawl_journal_batch_size': self.get('crawler.crawl_journal_batch_size', 20),
+            'crawl_journal_fsync_interval_sec': self.get('crawler.crawl_journal_fsync_interval_sec', 2.0),
+            'crawl_journal_max_age_sec': self.get('crawler.crawl_journal_max_age_sec', 86400),
+            'posting_model_enabled': self.get('crawler.posting_model_enabled', False),
+            'posting_model_file': self.get('crawler.posting_model_file', 'data/runtime/posting_model.json'),
+            'posting_model_alpha': self.get('crawler.posting_model_alpha', 0.3),
+            'posting_model_confidence_z': self.get('crawler.posting_model_confidence_z', 1.28),
+            'posting_model_min_history_days': self.get('crawler.posting_model_min_history_days', 14),
+            'posting_model_history_days': self.get('crawler.posting_model_history_days', 180),
+            'article_index_enabled': self.get('crawler.article_index_enabled', False),
+            'article_index_file': self.get('crawler.article_index_file', 'data/runtime/article_index.db'),
+            'article_index_settle_days': self.get('crawler.article_index_settle_days', 7),
+            'article_index_refresh_interval_hours': self.get('crawler.article_index_refresh_interval_hours', 0),
+            'run_metrics_enabled': self.get('crawler.run_metrics_enabled', False),
+            'run_metrics_prom_file': self.get('crawler.run_metrics_prom_file', 'data/runtime/metrics.prom'),
+            'run_metrics_report_file': self.get('crawler.run_metrics_report_file', 'data/runtime/run_report.json'),
+            'run_metrics_flush_interval_sec': self.get('crawler.run_metrics_flush_interval_sec', 30),
+            'request_ledger_enabled': self.get('crawler.request_ledger_enabled', False),
+            'request_ledger_file': self.get('crawler.request_ledger_file', 'data/runtime/request_ledger.db'),
+            'request_ledger_batch_size': self.get('crawler.request_ledger_batch_size', 50),
+            'request_ledger_flush_interval_sec': self.get('crawler.request_ledger_flush_interval_sec', 5.0),
+            'run_eta_enabled': self.get('crawler.run_eta_enabled', False),
+            'run_eta_file': self.get('crawler.run_eta_file', 'data/runtime/eta.json'),
+            'run_window_minutes': self.get('crawler.run_window_minutes', 0),
+            'run_deadline': self.get('crawler.run_deadline', ''),
             'excel_file': self.get('crawler.excel_file', 'target_articles.xlsx')
         }
     
@@ -185,6 +246,23 @@ class ConfigManager:
             'wait_after_click': self.get('ui_automation.wait_after_click', 2),
             'max_recursion_depth': self.get('ui_automation.max_recursion_depth', 5)
         }
+    
+    def get_logging_config(self) -> Dict[str, Any]:
+        """
+        获取日志配置
+        
+        Returns:
+            日志配置字典
+        """
+        return {
+            'level': self.get('logging.level', 'INFO'),
+            'format': self.get('logging.format', '%(asctime)s - %(levelname)s - %(message)s'),
+            'console_level': self.get('logging.console_level', ''),
+            'levels': self.get('logging.levels', {}) or {},
+            'log_dir': self.get('logging.log_dir', 'logs'),
+            'json_enabled': self.get('logging.json_enabled', True),
+            'queue_enabled': self.get('logging.queue_enabled', True)
+        }
 
 # 全局配置管理器实例
 config_manager = ConfigManager()
@@ -216,4 +294,8 @@ def get_db_operation_config():
 
 def get_ui_automation_config():
     """获取UI自动化配置"""
-    return config_manager.get_ui_automation_config()
\ No newline at end of file
+    return config_manager.get_ui_automation_config()
+
+def get_logging_config():
+    """获取日志配置"""
+    return config_manager.get_logging_config()
\ No newline at end of file
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端基准测试：AutomatedCrawler + BatchReadnumSpider + 存储，全部请求指向本地假公众号平台
+
+- 启动 FakeMpServer（合成或录制数据，可注入 freq control / ret=-3 / 验证码 / 零阅读量 / key 过期）
+- 生成 N 个合成公众号的目标 Excel，凭证由 ReplayCredentialProvider 直接给出（不抓包、不操作微信窗口），
+  爬取中途的 re-key 同样走该提供者
+- 所有等待时间乘以 --time-scale（配置项 delay_scale），熔断冷却与 re-key 节流同比缩短
+- 运行在独立工作目录中（运行日志、索引、状态文件与导出文件都写在这里，不影响正式数据）
+
+报告：耗时、吞吐（文章/秒、请求/秒）、服务端收到的列表/文章请求数、注入的故障数、凭证获取与 re-key 次数、
+写入的行数（--db 时为数据库新增行数，否则为导出 JSON 的记录数）
+
+状态检查（全新工作目录时）：因列表失败/验证码中断的公众号不应被标记完成回填阶段、
+不应写入自适应翻页统计（max_pages_stats.json），有问题时退出码为 1，
+例如 --freq-control-rate 0.4 --set staged_backfill_enabled=true --set "staged_backfill_stages=[7,30]"
+
+用法:
+    python -m src.bench.e2e_benchmark --accounts 50 --workers 4 --days-back 30 --time-scale 0.01
+    python -m src.bench.e2e_benchmark --accounts 50 --captcha-rate 0.005 --zero-read-rate 0.05 --json bench.json
+    python -m src.bench.e2e_benchmark --zero-read-rate 0.05 --set key_expiry_classifier_enabled=true
+    python -m src.bench.e2e_benchmark --db --db-table fx_article_records_bench   # 同时写入 MySQL 基准表
+"""
+import argparse
+import base64
+import contextlib
+import glob
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import yaml
+
+from config.config_manager import get_crawler_config
+from src.bench.fake_mp_server import add_fault_arguments, server_from_args
+from src.core.automated_crawler import AutomatedCrawler
+from src.core.credential_pipeline import CredentialProvider
+from src.database.database_config import get_database_config
+from src.database.database_manager import DatabaseManager
+
+# 同一微信会话（uin）下的所有公众号共享验证码熔断，与真实抓包结果一致
+BENCH_UIN = 'MTIzNDU2'
+# 这些停止原因表示抓取被中断，公众号本次不应推进回填阶段、不应参与自适应学习
+INTERRUPTED_STOP_REASONS = ('list_failed', 'captcha')
+
+
+def synthetic_biz(i: int) -> str:
+    return base64.b64encode(str(3000000000 + i).encode()).decode()
+
+
+class ReplayCredentialProvider(CredentialProvider):
+    """按目标链接中的 __biz 直接构造认证信息；每次 recapture/re-key 生成新的 x-wechat-key"""
+
+    handles_rekey = True
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.captures = 0
+        self.recaptures = 0
+        self._lock = threading.Lock()
+
+    def _auth_info(self, target: dict) -> Optional[dict]:
+        biz = (parse_qs(urlparse(target.get('url', '')).query).get('__biz') or [None])[0]
+        if not biz:
+            return None
+        with self._lock:
+            generation = self.captures + self.recaptures
+        if self.delay:
+            time.sleep(self.delay)
+        return {
+            'appmsg_token': f"bench_token_{generation}",
+            'biz': biz,
+            'cookie_str': f"pass_ticket=bench; wap_sid2=bench{generation}",
+            'headers': {'x-wechat-key': f"bench_key_{generation:08d}", 'x-wechat-uin': BENCH_UIN,
+                        'exportkey': 'bench'},
+        }
+
+    def capture(self, target: dict) -> Optional[dict]:
+        with self._lock:
+            self.captures += 1
+        return self._auth_info(target)
+
+    def recapture(self, target: dict) -> Optional[dict]:
+        with self._lock:
+            self.recaptures += 1
+        return self._auth_info(target)
+
+
+def write_targets(path: str, accounts: int) -> List[Dict]:
+    targets = [{'公众号名称': f"回放公众号{i:03d}",
+                '文章链接': f"https://mp.weixin.qq.com/s?__biz={synthetic_biz(i)}&mid=1&idx=1&sn=bench"}
+               for i in range(1, accounts + 1)]
+    pd.DataFrame(targets).to_excel(path, index=False)
+    return targets
+
+
+def bench_config(args, base_url: str, excel_path: str) -> Dict:
+    """在正式配置基础上改为指向假服务，并按 time_scale 缩短所有等待"""
+    scale = args.time_scale
+    config = dict(get_crawler_config())
+    config.update({
+        'mp_base_url': base_url,
+        'excel_file': excel_path,
+        'delay_scale': scale,
+        'days_back': args.days_back,
+        'account_workers': args.workers,
+        # 爬虫请求直连（不改动系统代理），流水线至少领先 1 个账号
+        'capture_lookahead': max(1, int(config.get('capture_lookahead', 0) or 0)),
+        'timeout': 10,
+        'credential_broker_enabled': False,
+        'min_rekey_interval_sec': config.get('min_rekey_interval_sec', 1500) * scale,
+        'captcha_breaker_min_cooldown_sec': config.get('captcha_breaker_min_cooldown_sec', 300) * scale,
+        'captcha_breaker_max_cooldown_sec': config.get('captcha_breaker_max_cooldown_sec', 3600) * scale,
+        'captcha_breaker_max_wait_sec': config.get('captcha_breaker_max_wait_sec', 3600) * scale,
+    })
+    if config.get('global_max_requests_per_minute'):
+        config['global_max_requests_per_minute'] = config['global_max_requests_per_minute'] / scale
+    if args.max_pages:
+        config['max_pages'] = args.max_pages
+    for item in args.set or []:
+        key, _, value = item.partition('=')
+        config[key.strip()] = yaml.safe_load(value)
+    return config
+
+
+def db_count(db_config: Dict) -> Optional[int]:
+    try:
+        with DatabaseManager(**db_config) as db:
+            return db.get_articles_count()
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"⚠️ 无法统计数据库行数: {e}")
+        return None
+
+
+def exported_rows(workdir: str) -> int:
+    rows = 0
+    for path in glob.glob(os.path.join(workdir, 'data', 'readnum_batch', 'readnum_*.json')):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                rows += len(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return rows
+
+
+def _load_json(path: str) -> Dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def check_interrupted_accounts(workdir: str, config: Dict, outcomes: List[Dict]) -> List[str]:
+    """状态检查：停止原因为 list_failed/captcha 的公众号不应出现在已完成的回填阶段与自适应统计中（需全新工作目录）"""
+    state = _load_json(os.path.join(workdir, config.get('staged_backfill_state_file',
+                                                        'data/runtime/backfill_state.json')))
+    stats = _load_json(os.path.join(workdir, 'data', 'runtime', 'max_pages_stats.json'))
+    problems = []
+    for outcome in outcomes:
+        reason = outcome.get('stop_reason')
+        if reason not in INTERRUPTED_STOP_REASONS:
+            continue
+        name = outcome['target']['name']
+        completed = state.get('accounts', {}).get(name, {}).get('completed_stages')
+        if completed:
+            problems.append(f"{name}: 停止原因 {reason}，却被标记完成回填阶段 {completed}")
+        if name in stats:
+            problems.append(f"{name}: 停止原因 {reason}，却写入了自适应统计 {stats[name]}")
+    return problems
+
+
+def run_benchmark(args) -> Dict:
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='wechat_bench_'))
+    os.makedirs(workdir, exist_ok=True)
+    # 复用已有工作目录时状态文件包含之前运行的结果，不做状态检查
+    fresh_state = not os.path.exists(os.path.join(workdir, 'data', 'runtime'))
+    server = server_from_args(args).start()
+    provider = ReplayCredentialProvider(delay=args.capture_delay)
+    db_config = None
+    if args.db:
+        db_config = dict(get_database_config())
+        if args.db_table:
+            db_config['table_name'] = args.db_table
+    cwd = os.getcwd()
+    log_path = os.path.join(workdir, 'bench.log')
+    try:
+        os.chdir(workdir)
+        excel_path = os.path.join(workdir, 'bench_targets.xlsx')
+        write_targets(excel_path, args.accounts)
+        config = bench_config(args, server.base_url, excel_path)
+        rows_before = db_count(db_config) if db_config else None
+
+        with open(log_path, 'w', encoding='utf-8') as log_fh:
+            if not args.verbose:
+                logging.basicConfig(level=logging.INFO, handlers=[logging.StreamHandler(log_fh)], force=True)
+            output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(log_fh)
+            with output:
+                started = time.perf_counter()
+                crawler = AutomatedCrawler(excel_path=excel_path, save_to_db=bool(db_config), db_config=db_config,
+                                           crawler_config=config, credential_provider=provider)
+                ok = crawler.run()
+                elapsed = time.perf_counter() - started
+    finally:
+        if not args.verbose:
+            # bench.log 已关闭，后续日志回到终端
+            logging.basicConfig(level=logging.WARNING, force=True)
+        os.chdir(cwd)
+        server.stop()
+
+    server_stats = server.stats()
+    requests_by_kind = server_stats['requests']
+    total_requests = sum(requests_by_kind.values())
+    rows = exported_rows(workdir)
+    rows_after = db_count(db_config) if db_config else None
+    state_problems = check_interrupted_accounts(workdir, config, crawler.outcomes) if fresh_state else None
+    return {
+        'accounts': args.accounts,
+        'workers': args.workers,
+        'time_scale': args.time_scale,
+        'ok': bool(ok),
+        'elapsed_sec': round(elapsed, 3),
+        'articles': rows,
+        'articles_per_sec': round(rows / elapsed, 3) if elapsed else None,
+        'requests': requests_by_kind,
+        'requests_per_sec': round(total_requests / elapsed, 3) if elapsed else None,
+        'injected': server_stats['injected'],
+        'captures': provider.captures,
+        'recaptures': provider.recaptures,
+        'exported_rows': rows,
+        'db_rows': (rows_after - rows_before) if rows_before is not None and rows_after is not None else None,
+        'stop_reasons': dict(Counter(o.get('stop_reason') or 'none' for o in crawler.outcomes)),
+        'state_problems': state_problems,
+        'workdir': workdir,
+        'log': log_path,
+    }
+
+
+def print_report(report: Dict):
+    print("=" * 60)
+    print(f"🏁 端到端基准：{report['accounts']} 个公众号，{report['workers']} 个 worker，"
+          f"time_scale={report['time_scale']}")
+    print(f"⏱️ 耗时 {report['elapsed_sec']:.2f}s | 文章 {report['articles']} 篇 "
+          f"({report['articles_per_sec']} 篇/s) | 请求 {report['requests_per_sec']} 次/s")
+    print(f"📡 服务端请求: {report['requests']}")
+    print(f"💉 注入故障: {report['injected'] or '无'}")
+    print(f"🔑 凭证获取 {report['captures']} 次，re-key/重新获取 {report['recaptures']} 次")
+    db_rows = report['db_rows'] if report['db_rows'] is not None else '未写入数据库'
+    print(f"💾 导出记录 {report['exported_rows']} 条，数据库新增 {db_rows}")
+    print(f"🛑 停止原因: {report['stop_reasons']}")
+    if report['state_problems'] is None:
+        print("🧪 状态检查: 跳过（复用了已有工作目录）")
+    elif report['state_problems']:
+        print(f"🧪 状态检查: {len(report['state_problems'])} 个问题")
+        for problem in report['state_problems']:
+            print(f"   ❌ {problem}")
+    else:
+        print("🧪 状态检查: 通过")
+    print(f"📂 工作目录: {report['workdir']}（日志: {report['log']}）")
+    print("=" * 60)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="离线端到端基准测试（本地假公众号平台）")
+    parser.add_argument('--accounts', type=int, default=50, help="合成公众号数量")
+    parser.add_argument('--workers', type=int, default=1, help="并行爬取的公众号数量(account_workers)")
+    parser.add_argument('--days-back', type=int, default=30, help="抓取窗口天数")
+    parser.add_argument('--max-pages', type=int, default=0, help="每个公众号最多翻页数（0 = 使用配置）")
+    parser.add_argument('--time-scale', type=float, default=0.01, help="等待时间缩放系数")
+    parser.add_argument('--capture-delay', type=float, default=0.0, help="模拟每次凭证获取耗时（秒）")
+    parser.add_argument('--workdir', default=None, help="工作目录（默认新建临时目录）")
+    parser.add_argument('--db', action='store_true', help="同时写入数据库（使用 config.yaml 中的数据库配置）")
+    parser.add_argument('--db-table', default=None, help="写入的数据库表（建议使用单独的基准表）")
+    parser.add_argument('--set', action='append', metavar='KEY=VALUE',
+                        help="覆盖爬虫配置项（可多次指定），如 --set key_expiry_classifier_enabled=true")
+    parser.add_argument('--json', default=None, help="报告另存为 JSON 文件")
+    parser.add_argument('--verbose', action='store_true', help="爬虫输出直接打印到终端（默认写入工作目录下 bench.log）")
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0 if report['ok'] and not report['state_problems'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
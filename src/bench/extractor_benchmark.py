@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+页面解析器微基准：在文章 HTML 语料上测量 BatchReadnumSpider 各提取函数的耗时、内存与输出一致性
+
+被测函数：extract_article_content / extract_publish_time / extract_account_name / clean_html_content /
+extract_stats（阅读、点赞、历史点赞、分享数正则）
+
+- 耗时：每个文件预热 1 次后重复 --repeat 次，报告每次调用的 p50/p90/p99/max（微秒），
+  并按页面大小分档给出 p50；测量期间临时把 spider 日志级别提高到 CRITICAL，提取函数的日志
+  （如“未找到发布时间”）不输出、也不做格式化，耗时只包含提取本身
+- 内存：单独用 tracemalloc 再跑一遍（避免干扰计时），报告每次调用的峰值分配与调用结束、垃圾回收后仍未释放的内存
+- 一致性：与语料目录下 golden.json 中的期望输出逐项比较（长文本按 sha1 + 长度比较），
+  --update-golden 以当前实现重写期望输出
+- 回归门限：--baseline 指定之前保存的报告，任一函数 p50/p90 变慢超过 --threshold 或一致率低于 100% 时退出码为 1
+
+语料目录中放任意 *.html（如抓取时保存的真实页面）；--generate N 生成 N 个大小从数 KB 到数 MB 的合成页面，
+其中一部分去掉 createTime/昵称/统计脚本，以覆盖各提取函数的回退正则。
+
+用法:
+    python -m src.bench.extractor_benchmark --generate 40 --update-golden
+    python -m src.bench.extractor_benchmark --save-baseline data/bench/extractor_baseline.json
+    python -m src.bench.extractor_benchmark --baseline data/bench/extractor_baseline.json --threshold 0.2
+"""
+import argparse
+import contextlib
+import gc
+import glob
+import hashlib
+import json
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from src.bench.fake_mp_server import ARTICLE_TEMPLATE, STATS_TEMPLATE, BEIJING_TZ
+
+DEFAULT_CORPUS = 'data/bench/extractor_corpus'
+EXTRACTORS = ('content', 'publish_time', 'account_name', 'clean_html', 'stats')
+# 页面大小分档（字节）
+SIZE_BUCKETS = ((50_000, '<50KB'), (200_000, '50-200KB'), (1_000_000, '200KB-1MB'), (float('inf'), '>1MB'))
+# 合成页面的发布时间以此为基准（固定值，同一 seed 生成的语料完全一致）
+GENERATE_EPOCH = 1750000000
+# 超过该长度的输出按摘要比较
+DIGEST_MIN_LEN = 200
+
+
+def _bucket(size: int) -> str:
+    return next(label for limit, label in SIZE_BUCKETS if size < limit)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[pos]
+
+
+@contextlib.contextmanager
+def quiet_spider_logs():
+    """临时提高 spider 日志级别，屏蔽提取函数在回退正则落空时输出的错误日志"""
+    spider_logger = logging.getLogger('src.crawler.batch_readnum_spider')
+    level = spider_logger.level
+    spider_logger.setLevel(logging.CRITICAL)
+    try:
+        yield
+    finally:
+        spider_logger.setLevel(level)
+
+
+def fingerprint(value):
+    """golden 中保存的输出形式：短文本/数字/字典原样保存，长文本保存 sha1 与长度"""
+    if isinstance(value, str) and len(value) > DIGEST_MIN_LEN:
+        return f"sha1:{hashlib.sha1(value.encode('utf-8')).hexdigest()}:{len(value)}"
+    return value
+
+
+def build_extractors() -> Dict[str, Callable[[str], object]]:
+    # 延迟导入：spider 模块导入较重，--generate 时不需要
+    from config.config_manager import get_crawler_config
+    from src.crawler.batch_readnum_spider import BatchReadnumSpider
+    with quiet_spider_logs():
+        spider = BatchReadnumSpider(crawler_config=get_crawler_config())
+    return {
+        'content': spider.extract_article_content,
+        'publish_time': spider.extract_publish_time,
+        'account_name': spider.extract_account_name,
+        'clean_html': spider.clean_html_content,
+        'stats': spider.extract_stats,
+    }
+
+
+# --------------- 合成语料 ---------------
+def generate_corpus(corpus_dir: str, count: int, seed: int = 0) -> List[str]:
+    """生成大小按对数均匀分布（约 5KB ~ 3MB）的合成页面"""
+    rng = random.Random(seed)
+    os.makedirs(corpus_dir, exist_ok=True)
+    paths = []
+    for i in range(count):
+        target_size = int(5_000 * (600 ** rng.random()))
+        ct = GENERATE_EPOCH - rng.randint(0, 180 * 86400)
+        title = f"合成测试文章 {i:03d}"
+        paragraphs = []
+        size = 0
+        while size < target_size * 0.8:
+            text = ''.join(chr(rng.randint(0x4e00, 0x9fa5)) for _ in range(rng.randint(40, 400)))
+            para = f'<p style="margin: 0 8px;"><span data-i="{len(paragraphs)}">{text}</span></p>'
+            if rng.random() < 0.05:
+                para += f'<script>var lazy_{len(paragraphs)} = {{"src": "img_{rng.getrandbits(32):x}.png"}};</script>'
+            paragraphs.append(para)
+            size += len(para.encode('utf-8'))
+        variant = i % 4
+        stats = '' if variant == 3 else STATS_TEMPLATE.format(
+            title=title, read_num=rng.randint(0, 100000), like_count=rng.randint(0, 500),
+            old_like_count=rng.randint(0, 500), share_count=rng.randint(0, 300))
+        html = ARTICLE_TEMPLATE.format(
+            title=title, uin='MTIzNDU2', appmsg_token='bench_token', ct=ct,
+            create_time=datetime.fromtimestamp(ct, BEIJING_TZ).strftime('%Y-%m-%d %H:%M'),
+            stats=stats, nickname=f"合成公众号{i % 7}", body='</p>' + '\n'.join(paragraphs) + '<p>')
+        if variant == 1:
+            # 无 createTime：走发布时间回退正则
+            html = html.replace("var createTime = ", "var createTimeHidden = ")
+            html = html.replace('<div class="wx_follow_nickname">', '<div class="wx_follow_nickname_v2">')
+            html += f'<em class="rich_media_meta rich_media_meta_text">{datetime.fromtimestamp(ct).strftime("%Y-%m-%d")}</em>'
+        elif variant == 2:
+            # 无任何可识别的时间/昵称：回退正则全部落空
+            html = html.replace("var createTime = ", "var createTimeHidden = ").replace('var ct = ', 'var c_t = ')
+            html = html.replace('class="wx_follow_nickname"', 'class="wx_nick"')
+        path = os.path.join(corpus_dir, f"synthetic_{i:03d}.html")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        paths.append(path)
+    return paths
+
+
+def load_corpus(corpus_dir: str) -> Dict[str, str]:
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(corpus_dir, '*.html'))):
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            pages[os.path.basename(path)] = f.read()
+    return pages
+
+
+# --------------- 测量 ---------------
+def run_benchmark(pages: Dict[str, str], extractors: Dict[str, Callable], repeat: int = 5,
+                  golden: Dict[str, Dict] = None, measure_memory: bool = True) -> Dict:
+    timings = {name: [] for name in extractors}
+    bucket_timings = {name: {} for name in extractors}
+    outputs: Dict[str, Dict] = {}
+    with quiet_spider_logs():
+        for filename, html in pages.items():
+            bucket = _bucket(len(html.encode('utf-8')))
+            outputs[filename] = {}
+            for name, fn in extractors.items():
+                outputs[filename][name] = fingerprint(fn(html))
+                for _ in range(repeat):
+                    started = time.perf_counter_ns()
+                    fn(html)
+                    elapsed_us = (time.perf_counter_ns() - started) / 1000
+                    timings[name].append(elapsed_us)
+                    bucket_timings[name].setdefault(bucket, []).append(elapsed_us)
+
+        memory = {name: {'peak': [], 'retained': []} for name in extractors}
+        if measure_memory:
+            tracemalloc.start()
+            for html in pages.values():
+                for name, fn in extractors.items():
+                    tracemalloc.reset_peak()
+                    base, _ = tracemalloc.get_traced_memory()
+                    fn(html)
+                    _, peak = tracemalloc.get_traced_memory()
+                    gc.collect()
+                    current, _ = tracemalloc.get_traced_memory()
+                    memory[name]['peak'].append(peak - base)
+                    memory[name]['retained'].append(max(0, current - base))
+            tracemalloc.stop()
+
+    report = {'files': len(pages), 'repeat': repeat, 'extractors': {}}
+    for name in extractors:
+        values = timings[name]
+        agree = total = 0
+        mismatches = []
+        if golden:
+            for filename, outs in outputs.items():
+                if filename not in golden or name not in golden[filename]:
+                    continue
+                total += 1
+                if golden[filename][name] == outs[name]:
+                    agree += 1
+                else:
+                    mismatches.append(filename)
+        report['extractors'][name] = {
+            'p50_us': round(_percentile(values, 0.5), 1),
+            'p90_us': round(_percentile(values, 0.9), 1),
+            'p99_us': round(_percentile(values, 0.99), 1),
+            'max_us': round(max(values, default=0.0), 1),
+            'p50_by_size_us': {b: round(_percentile(v, 0.5), 1) for b, v in bucket_timings[name].items()},
+            'peak_alloc_p50_kb': round(_percentile(memory[name]['peak'], 0.5) / 1024, 1),
+            'peak_alloc_max_kb': round(max(memory[name]['peak'], default=0) / 1024, 1),
+            'retained_max_kb': round(max(memory[name]['retained'], default=0) / 1024, 1),
+            'agreement': round(agree / total, 4) if total else None,
+            'mismatches': mismatches,
+        }
+    report['outputs'] = outputs
+    return report
+
+
+def compare_baseline(report: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """返回回归项说明；空列表表示通过"""
+    regressions = []
+    for name, current in report['extractors'].items():
+        if current['agreement'] is not None and current['agreement'] < 1.0:
+            regressions.append(f"{name}: 输出一致率 {current['agreement']:.2%}（{len(current['mismatches'])} 个文件不一致）")
+        base = baseline.get('extractors', {}).get(name)
+        if not base:
+            continue
+        for key in ('p50_us', 'p90_us'):
+            if base.get(key) and current[key] > base[key] * (1 + threshold):
+                regressions.append(f"{name}: {key} {base[key]} -> {current[key]} (+{current[key] / base[key] - 1:.0%})")
+    return regressions
+
+
+def print_report(report: Dict):
+    print(f"📊 {report['files']} 个页面 × {report['repeat']} 次")
+    print(f"{'extractor':<14}{'p50(us)':>10}{'p90(us)':>10}{'p99(us)':>10}{'max(us)':>11}{'peak KB':>10}{'kept KB':>9}{'agree':>8}")
+    for name, r in report['extractors'].items():
+        agree = f"{r['agreement']:.0%}" if r['agreement'] is not None else 'n/a'
+        print(f"{name:<14}{r['p50_us']:>10}{r['p90_us']:>10}{r['p99_us']:>10}{r['max_us']:>11}"
+              f"{r['peak_alloc_p50_kb']:>10}{r['retained_max_kb']:>9}{agree:>8}")
+    for name, r in report['extractors'].items():
+        buckets = ', '.join(f"{b} {v}us" for b, v in r['p50_by_size_us'].items())
+        print(f"   {name} 按页面大小 p50: {buckets}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="页面解析器微基准")
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help="HTML 语料目录")
+    parser.add_argument('--generate', type=int, default=0, metavar='N', help="先生成 N 个合成页面到语料目录")
+    parser.add_argument('--seed', type=int, default=0, help="合成语料随机种子")
+    parser.add_argument('--repeat', type=int, default=5, help="每个页面每个函数的计时次数")
+    parser.add_argument('--no-memory', action='store_true', help="跳过 tracemalloc 内存测量")
+    parser.add_argument('--update-golden', action='store_true', help="以当前输出重写 golden.json")
+    parser.add_argument('--baseline', default=None, help="对比的基线报告（JSON）")
+    parser.add_argument('--threshold', type=float, default=0.2, help="耗时回归门限（相对基线的增幅）")
+    parser.add_argument('--save-baseline', default=None, help="将本次报告保存为基线")
+    parser.add_argument('--only', action='append', choices=EXTRACTORS, help="只测指定函数（可多次指定）")
+    args = parser.parse_args(argv)
+
+    if args.generate:
+        generate_corpus(args.corpus, args.generate, args.seed)
+        print(f"🧪 已生成 {args.generate} 个合成页面: {args.corpus}")
+    pages = load_corpus(args.corpus)
+    if not pages:
+        print(f"❌ 语料目录中没有 HTML 文件: {args.corpus}（可用 --generate N 生成合成页面）")
+        return 1
+
+    extractors = build_extractors()
+    if args.only:
+        extractors = {k: v for k, v in extractors.items() if k in args.only}
+    golden_path = os.path.join(args.corpus, 'golden.json')
+    golden = None
+    if os.path.exists(golden_path) and not args.update_golden:
+        with open(golden_path, 'r', encoding='utf-8') as f:
+            golden = json.load(f)
+
+    report = run_benchmark(pages, extractors, repeat=max(1, args.repeat), golden=golden,
+                           measure_memory=not args.no_memory)
+    print_report(report)
+
+    if args.update_golden:
+        merged = {}
+        if os.path.exists(golden_path):
+            with open(golden_path, 'r', encoding='utf-8') as f:
+                merged = json.load(f)
+        for filename, outs in report['outputs'].items():
+            merged.setdefault(filename, {}).update(outs)
+        with open(golden_path, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, ensure_ascii=False, indent=2)
+        print(f"📝 已更新期望输出: {golden_path}")
+    elif golden is None:
+        print(f"ℹ️ 未找到 {golden_path}，跳过一致性比较（可用 --update-golden 生成）")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.save_baseline) or '.', exist_ok=True)
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump({k: v for k, v in report.items() if k != 'outputs'}, f, ensure_ascii=False, indent=2)
+        print(f"💾 基线已保存: {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_baseline(report, baseline, args.threshold)
+        if regressions:
+            print(f"❌ 相对基线出现回归（门限 +{args.threshold:.0%}）:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print(f"✅ 未超过回归门限（+{args.threshold:.0%}）")
+    elif any(r['agreement'] is not None and r['agreement'] < 1.0 for r in report['extractors'].values()):
+        print("❌ 存在与期望输出不一致的结果")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地假 mp.weixin.qq.com：回放录制的列表 JSON 与文章 HTML，供离线回放与端到端基准测试
+
+爬虫配置 mp_base_url 指向本服务（如 http://127.0.0.1:8765）即可在无微信环境下跑通完整流程。
+
+数据来源（按 biz 区分）：
+- 录制目录 corpus_dir：
+    <corpus_dir>/<biz>/profile_ext_<offset>.json   列表接口 profile_ext?action=getmsg 的原始响应
+    <corpus_dir>/<biz>/<mid>_<idx>.html            文章页面 /s 的原始 HTML
+  未录制的 offset/文章回退为合成数据
+- 合成数据：按 (seed, biz) 确定性生成 history_days 天的推送，每次推送 1~max_articles_per_push 篇
+
+故障注入（按请求独立抽样，seed 固定时可复现）：
+- latency_ms / latency_jitter_ms：每个请求的响应延迟
+- freq_control_rate：列表返回 base_resp.err_msg = "freq control"
+- ret3_rate：列表返回 ret=-3（凭证失效）
+- captcha_rate：文章返回验证码页面
+- zero_read_rate：文章 cgiData 中 read_num 为 0（key 有效、阅读数隐藏）
+- expired_key_rate：appmsg_token/uin 为空、统计字段仍在但全为 0（key 已过期的页面形态）
+
+用法:
+    python -m src.bench.fake_mp_server --port 8765 [--corpus DIR] [--captcha-rate 0.01 --latency-ms 50 ...]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+BEIJING_TZ = timezone(timedelta(hours=8))
+
+FAULT_KEYS = ('freq_control_rate', 'ret3_rate', 'captcha_rate', 'zero_read_rate', 'expired_key_rate')
+
+CAPTCHA_HTML = """<!DOCTYPE html><html><head><title>验证</title></head><body>
+<div class="weui-msg"><h2>环境异常</h2><p>当前环境异常，完成验证后即可继续访问。</p>
+<a href="https://mp.weixin.qq.com/mp/secitptpage/verify?ticket=bench">去验证</a></div></body></html>"""
+
+ARTICLE_TEMPLATE = """<!DOCTYPE html><html><head>
+<meta property="og:title" content="{title}" />
+<script>
+var uin = "{uin}";
+window.appmsg_token = "{appmsg_token}";
+var ct = "{ct}";
+var createTime = '{create_time}';
+var item_show_type = "0";
+{stats}
+</script></head><body>
+<div class="wx_follow_nickname">{nickname}</div>
+<div class="rich_media_content" id="js_content"><p>{body}</p></div>
+</body></html>"""
+
+STATS_TEMPLATE = """var cgiData = {{ title: '{title}', read_num: '{read_num}', ori_article_type: '' }};
+window.appmsg_bar_data = {{ like_count: '{like_count}', old_like_count: '{old_like_count}', share_count: '{share_count}' }};"""
+
+
+class SyntheticAccount:
+    """按 (seed, biz) 确定性生成的公众号历史：推送从新到旧排列，与列表接口顺序一致"""
+
+    def __init__(self, biz: str, seed: int, now: float, history_days: int = 120,
+                 posts_per_day: float = 1.2, max_articles_per_push: int = 3):
+        self.biz = biz
+        self.nickname = f"合成公众号{biz[-6:]}"
+        rng = random.Random(f"{seed}:{biz}")
+        self.pushes: List[Dict] = []
+        self.articles: Dict[tuple, Dict] = {}
+        ts = now - rng.uniform(0.1, 0.9) * 86400 / max(posts_per_day, 0.01)
+        mid = 2247480000 + rng.randint(0, 9999) * 100
+        while ts > now - history_days * 86400:
+            n = rng.randint(1, max(1, max_articles_per_push))
+            items = []
+            for idx in range(1, n + 1):
+                read_num = int(rng.lognormvariate(7, 1.2))
+                article = {
+                    'mid': str(mid), 'idx': str(idx), 'create_time': int(ts),
+                    'title': f"{self.nickname} 第{mid % 100000}期 文章{idx}",
+                    'sn': f"{rng.getrandbits(64):016x}",
+                    'read_num': read_num,
+                    'like_count': read_num // 50,
+                    'old_like_count': read_num // 80,
+                    'share_count': read_num // 30,
+                }
+                self.articles[(article['mid'], article['idx'])] = article
+                items.append(article)
+            self.pushes.append({'datetime': int(ts), 'id': mid, 'items': items})
+            mid -= rng.randint(1, 5)
+            ts -= rng.expovariate(max(posts_per_day, 0.01)) * 86400
+
+    @staticmethod
+    def content_url(biz: str, article: Dict) -> str:
+        # 与真实响应一致：mp.weixin.qq.com 域名、HTML 转义的 &amp;（爬虫按 mp_base_url 改写请求地址）
+        return (f"http://mp.weixin.qq.com/s?__biz={biz}&amp;mid={article['mid']}&amp;idx={article['idx']}"
+                f"&amp;sn={article['sn']}&amp;chksm=bench#rd")
+
+    def listing(self, offset: int, count: int) -> Dict:
+        page = self.pushes[offset:offset + count]
+        msgs = []
+        for push in page:
+            main, subs = push['items'][0], push['items'][1:]
+
+            def ext(a):
+                return {'title': a['title'], 'digest': '', 'content_url': self.content_url(self.biz, a),
+                        'author': '', 'cover': '', 'fileid': 0}
+            info = ext(main)
+            info['is_multi'] = 1 if subs else 0
+            info['multi_app_msg_item_list'] = [ext(a) for a in subs]
+            msgs.append({
+                'comm_msg_info': {'id': push['id'], 'type': 49, 'datetime': push['datetime'],
+                                  'fakeid': '0', 'status': 2, 'content': ''},
+                'app_msg_ext_info': info,
+            })
+        more = offset + count < len(self.pushes)
+        return {
+            'ret': 0, 'errmsg': 'ok', 'msg_count': len(msgs),
+            'can_msg_continue': 1 if more else 0,
+            'general_msg_list': json.dumps({'list': msgs}, ensure_ascii=False),
+            'next_offset': offset + len(msgs),
+            'video_count': 0, 'use_video_tab': 0, 'real_type': 0,
+        }
+
+
+class FakeMpServer:
+    """线程化 HTTP 服务；start() 后台运行，stop() 关闭；stats() 返回请求与故障计数"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, corpus_dir: str = None, seed: int = 0,
+                 history_days: int = 120, posts_per_day: float = 1.2, max_articles_per_push: int = 3,
+                 latency_ms: float = 0, latency_jitter_ms: float = 0, faults: Dict[str, float] = None):
+        self.corpus_dir = corpus_dir
+        self.seed = seed
+        self.history_days = history_days
+        self.posts_per_day = posts_per_day
+        self.max_articles_per_push = max_articles_per_push
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.faults = {k: float((faults or {}).get(k, 0) or 0) for k in FAULT_KEYS}
+        self.now = time.time()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._accounts: Dict[str, SyntheticAccount] = {}
+        self._requests = Counter()
+        self._injected = Counter()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeMpServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='fake-mp', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'requests': dict(self._requests), 'injected': dict(self._injected)}
+
+    # --------------- 数据 ---------------
+    def account(self, biz: str) -> SyntheticAccount:
+        with self._lock:
+            if biz not in self._accounts:
+                self._accounts[biz] = SyntheticAccount(biz, self.seed, self.now, self.history_days,
+                                                       self.posts_per_day, self.max_articles_per_push)
+            return self._accounts[biz]
+
+    def _recorded(self, biz: str, name: str) -> Optional[str]:
+        if not self.corpus_dir or not biz:
+            return None
+        path = os.path.join(self.corpus_dir, biz, name)
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            return f.read()
+
+    def _roll(self, fault: str) -> bool:
+        rate = self.faults.get(fault, 0)
+        with self._lock:
+            hit = rate > 0 and self._rng.random() < rate
+            if hit:
+                self._injected[fault] += 1
+        return hit
+
+    def _count(self, kind: str):
+        with self._lock:
+            self._requests[kind] += 1
+
+    def _delay(self):
+        if self.latency_ms or self.latency_jitter_ms:
+            with self._lock:
+                jitter = self._rng.uniform(-self.latency_jitter_ms, self.latency_jitter_ms)
+            time.sleep(max(0.0, self.latency_ms + jitter) / 1000.0)
+
+    # --------------- 响应 ---------------
+    def profile_ext(self, query: Dict[str, str]) -> str:
+        self._count('list')
+        if self._roll('freq_control_rate'):
+            return json.dumps({'base_resp': {'ret': 200013, 'err_msg': 'freq control'}})
+        if self._roll('ret3_rate'):
+            return json.dumps({'ret': -3, 'errmsg': 'no session', 'cookie_count': 0})
+        biz = query.get('__biz', '')
+        offset = int(query.get('offset') or 0)
+        count = int(query.get('count') or 10)
+        recorded = self._recorded(biz, f"profile_ext_{offset}.json")
+        if recorded is not None:
+            return recorded
+        return json.dumps(self.account(biz).listing(offset, count), ensure_ascii=False)
+
+    def article(self, query: Dict[str, str]) -> str:
+        self._count('article')
+        if self._roll('captcha_rate'):
+            return CAPTCHA_HTML
+        biz, mid, idx = query.get('__biz', ''), query.get('mid', ''), query.get('idx', '1')
+        recorded = self._recorded(biz, f"{mid}_{idx}.html")
+        if recorded is not None:
+            return recorded
+        account = self.account(biz)
+        article = account.articles.get((mid, idx))
+        if article is None:
+            self._count('not_found')
+            return "<html><body><p>该内容已被发布者删除</p></body></html>"
+        expired = self._roll('expired_key_rate')
+        read_num = 0 if expired or self._roll('zero_read_rate') else article['read_num']
+        stats = STATS_TEMPLATE.format(
+            title=article['title'], read_num=read_num, like_count=0 if expired else article['like_count'],
+            old_like_count=0 if expired else article['old_like_count'],
+            share_count=0 if expired else article['share_count'])
+        create_time = datetime.fromtimestamp(article['create_time'], BEIJING_TZ).strftime('%Y-%m-%d %H:%M')
+        return ARTICLE_TEMPLATE.format(
+            title=article['title'], uin='' if expired else 'MTIzNDU2', appmsg_token='' if expired else 'bench_token',
+            ct=article['create_time'], create_time=create_time, stats=stats, nickname=account.nickname,
+            body=f"{article['title']} 正文（离线回放合成内容）")
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                server._delay()
+                if parsed.path == '/mp/profile_ext':
+                    body, ctype = server.profile_ext(query), 'application/json; charset=UTF-8'
+                elif parsed.path == '/s':
+                    body, ctype = server.article(query), 'text/html; charset=UTF-8'
+                else:
+                    server._count('other')
+                    self.send_error(404)
+                    return
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', ctype)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser):
+    """故障注入与数据生成参数（基准测试脚本共用）"""
+    parser.add_argument('--corpus', default=None, help="录制数据目录（<biz>/profile_ext_<offset>.json, <biz>/<mid>_<idx>.html）")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--history-days', type=int, default=120, help="合成数据的历史天数")
+    parser.add_argument('--posts-per-day', type=float, default=1.2, help="合成数据的日均推送次数")
+    parser.add_argument('--latency-ms', type=float, default=0, help="响应延迟（毫秒）")
+    parser.add_argument('--latency-jitter-ms', type=float, default=0, help="响应延迟抖动（毫秒）")
+    for key in FAULT_KEYS:
+        parser.add_argument('--' + key.replace('_', '-'), dest=key, type=float, default=0.0,
+                            help=f"故障注入概率 {key}")
+
+
+def server_from_args(args, port: int = 0) -> FakeMpServer:
+    return FakeMpServer(
+        port=port, corpus_dir=args.corpus, seed=args.seed, history_days=args.history_days,
+        posts_per_day=args.posts_per_day, latency_ms=args.latency_ms, latency_jitter_ms=args.latency_jitter_ms,
+        faults={k: getattr(args, k) for k in FAULT_KEYS}
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="本地假 mp.weixin.qq.com（离线回放）")
+    parser.add_argument('--port', type=int, default=8765, help="监听端口")
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = server_from_args(args, args.port).start()
+    print(f"🧪 假公众号平台已启动: {server.base_url}（配置 crawler.mp_base_url 指向该地址）")
+    try:
+        while True:
+            time.sleep(60)
+            print(f"📊 {server.stats()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
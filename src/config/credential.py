@@ -1,94 +1,364 @@
-import mitmproxy.http
+"""
+本地凭证代理服务（credential broker）
+
+作为 mitmproxy 插件运行：mitmdump -s src/config/credential.py
+- ExtractSetCookie：拦截公众号文章请求/响应，把凭证（请求 Cookie、关键请求头、响应 Set-Cookie）写入内存存储
+- CredentialBroker：按 biz/uin 索引的内存凭证存储；向爬虫 worker 发放租约(lease)，
+  worker 报告 ret=-3 时使对应凭证失效；变更以追加方式写入日志文件，启动时回放
+- HTTP 服务（默认 :8088）：在插件加载完成(running)后才启动，而不是导入时
+- BrokerClient：爬虫进程侧的客户端（见 src/core/broker_provider.py 的 BrokerCredentialProvider）
+
+所有接口需在 Authorization 头中携带会话密钥；密钥与端口写入 data/runtime/credential_broker.json，
+同一台机器上的多个爬取进程据此共享凭证，无需各自抓包。
+"""
 import json
-import threading
-from http.server import SimpleHTTPRequestHandler, HTTPServer
-from urllib.parse import urlparse, parse_qs
+import os
 import random
+import re
 import string
+import threading
 import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import urlparse, parse_qs
 
+BROKER_DISCOVERY_FILE = "data/runtime/credential_broker.json"
+BROKER_JOURNAL_FILE = "data/runtime/credential_broker.jsonl"
+BROKER_PORT = 8088
+DEFAULT_LEASE_TTL_SEC = 900
 
-class ExtractSetCookie:
-    def __init__(self):
-        self.cookies = {}
 
-    def response(self, flow: mitmproxy.http.HTTPFlow):
-        # 检查请求的 URL 是否符合过滤器
-        if flow.request.url.startswith("https://mp.weixin.qq.com/s?__biz="):
-            # 提取 __biz 参数
-            parsed_url = urlparse(flow.request.url)
-            query_params = parse_qs(parsed_url.query)
-            biz = query_params.get('__biz', [None])[0]
-            if biz:
-                # 提取响应头中的 Set-Cookie 数据
-                set_cookie_header = flow.response.headers.get("Set-Cookie")
-                if set_cookie_header:
-                    timestamp = int(time.time() * 1000)
-                    self.cookies[biz] = {
-                        "url": flow.request.url,
-                        "set_cookie": set_cookie_header,
-                        "timestamp": timestamp,
-                    }
-                    # 将 cookies 数据保存到文件中
-                    with open("credentials.json", "w") as file:
-                        json.dump(list(self.cookies.values()), file, indent=4)
+class CredentialBroker:
+    """
+    内存凭证存储 + 租约
 
+    entries: "biz|uin" -> {biz, uin, url, set_cookie, auth_info, captured_at, generation, invalidated_at}
+    leases:  lease_id -> {key, generation, worker, expires_at}
+    每条凭证有单调递增的 generation；失效报告只对租约对应的 generation 生效，
+    避免旧 worker 的迟到报告把刚抓到的新凭证标记为失效。
+    """
 
-addons = [
-    ExtractSetCookie(),
-]
+    # 日志超过该行数时压缩为当前快照
+    COMPACT_EVERY = 500
+
+    def __init__(self, journal_file: str = BROKER_JOURNAL_FILE):
+        self.journal_file = journal_file
+        self.entries: Dict[str, Dict] = {}
+        self.leases: Dict[str, Dict] = {}
+        self._generation = 0
+        self._journal_lines = 0
+        self._lock = threading.RLock()
+        self._replay()
+
+    @staticmethod
+    def _key(biz: str, uin: str) -> str:
+        return f"{biz}|{uin or ''}"
 
-# 生成一个长度为36的随机字符串作为会话密钥
-session_key = ''.join(random.choices(string.ascii_letters + string.digits, k=32))
-print(f"本次会话的密钥: {session_key}")
+    # --------------- 持久化（追加日志） ---------------
+    def _replay(self):
+        if not os.path.exists(self.journal_file):
+            return
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    continue
+                self._journal_lines += 1
+                self._apply(op)
 
+    def _apply(self, op: Dict):
+        if op.get('op') == 'put':
+            entry = op['entry']
+            self.entries[self._key(entry['biz'], entry.get('uin'))] = entry
+            self._generation = max(self._generation, entry.get('generation', 0))
+        elif op.get('op') == 'invalidate':
+            entry = self.entries.get(op['key'])
+            if entry and entry.get('generation') == op.get('generation'):
+                entry['invalidated_at'] = op.get('ts')
 
-# 创建一个简单的 HTTP 服务器来提供 credentials.json 文件
-def start_http_server():
-    class CustomHandler(SimpleHTTPRequestHandler):
+    def _append(self, op: Dict):
+        try:
+            os.makedirs(os.path.dirname(self.journal_file) or '.', exist_ok=True)
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(op, ensure_ascii=False) + "\n")
+            self._journal_lines += 1
+            if self._journal_lines >= self.COMPACT_EVERY:
+                self._compact()
+        except Exception as e:
+            print(f"⚠️ 写入凭证日志失败: {e}")
+
+    def _compact(self):
+        tmp_file = self.journal_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps({'op': 'put', 'entry': entry}, ensure_ascii=False) + "\n")
+        os.replace(tmp_file, self.journal_file)
+        self._journal_lines = len(self.entries)
+
+    # --------------- 写入 ---------------
+    def put(self, biz: str, uin: Optional[str], auth_info: Dict, url: str = "", set_cookie: str = None) -> Dict:
+        with self._lock:
+            self._generation += 1
+            entry = {
+                'biz': biz,
+                'uin': uin,
+                'url': url,
+                'set_cookie': set_cookie,
+                'auth_info': auth_info,
+                'captured_at': time.time(),
+                'generation': self._generation,
+                'invalidated_at': None,
+            }
+            self.entries[self._key(biz, uin)] = entry
+            self._append({'op': 'put', 'entry': entry})
+            return dict(entry)
+
+    # --------------- 租约 ---------------
+    def _expire_leases(self, now: float):
+        for lease_id in [k for k, v in self.leases.items() if v['expires_at'] <= now]:
+            del self.leases[lease_id]
+
+    def lease(self, biz: str = None, uin: str = None, worker: str = "", ttl: float = DEFAULT_LEASE_TTL_SEC,
+              min_generation: int = 0) -> Optional[Dict]:
+        """
+        发放一份最新的有效凭证
+        :param min_generation: 只接受比该值更新的凭证（worker 报告失效后等待重新抓到的新凭证）
+        """
+        now = time.time()
+        with self._lock:
+            self._expire_leases(now)
+            candidates = [
+                e for e in self.entries.values()
+                if not e.get('invalidated_at') and e['generation'] > min_generation
+                and (biz is None or e['biz'] == biz) and (uin is None or e.get('uin') == uin)
+            ]
+            if not candidates:
+                return None
+            entry = max(candidates, key=lambda e: e['captured_at'])
+            lease_id = uuid.uuid4().hex
+            self.leases[lease_id] = {
+                'key': self._key(entry['biz'], entry.get('uin')),
+                'generation': entry['generation'],
+                'worker': worker,
+                'expires_at': now + ttl,
+            }
+            return {
+                'lease_id': lease_id,
+                'key': self._key(entry['biz'], entry.get('uin')),
+                'generation': entry['generation'],
+                'expires_at': now + ttl,
+                'captured_at': entry['captured_at'],
+                'auth_info': entry['auth_info'],
+            }
+
+    def release(self, lease_id: str) -> bool:
+        with self._lock:
+            return self.leases.pop(lease_id, None) is not None
+
+    def invalidate(self, lease_id: str, reason: str = "", key: str = None, generation: int = None) -> bool:
+        """
+        worker 报告凭证失效（ret=-3）：使该租约对应版本的凭证失效，并收回其上的全部租约
+        一次公众号爬取可能超过租约有效期，租约已过期时按 worker 提供的 key + generation 定位凭证
+        """
+        with self._lock:
+            lease = self.leases.pop(lease_id, None)
+            if not lease:
+                if not key or generation is None:
+                    return False
+                lease = {'key': key, 'generation': int(generation)}
+            entry = self.entries.get(lease['key'])
+            if not entry or entry['generation'] != lease['generation'] or entry.get('invalidated_at'):
+                return False
+            ts = time.time()
+            entry['invalidated_at'] = ts
+            for other in [k for k, v in self.leases.items()
+                          if v['key'] == lease['key'] and v['generation'] == lease['generation']]:
+                del self.leases[other]
+            self._append({'op': 'invalidate', 'key': lease['key'], 'generation': lease['generation'],
+                          'reason': reason, 'ts': ts})
+            print(f"🚫 凭证已失效: {lease['key']} (generation {lease['generation']}, {reason})")
+            return True
+
+    def status(self) -> Dict:
+        with self._lock:
+            self._expire_leases(time.time())
+            return {
+                'entries': len(self.entries),
+                'valid': sum(1 for e in self.entries.values() if not e.get('invalidated_at')),
+                'leases': len(self.leases),
+                'generation': self._generation,
+            }
+
+    def legacy_credentials(self) -> list:
+        """兼容原 /credentials 接口：每个 biz 一条 {url, set_cookie, timestamp(ms)}"""
+        with self._lock:
+            return [
+                {'url': e['url'], 'set_cookie': e.get('set_cookie'), 'timestamp': int(e['captured_at'] * 1000)}
+                for e in self.entries.values()
+            ]
+
+
+# --------------- HTTP 服务 ---------------
+def _make_handler(broker: CredentialBroker, session_key: str):
+    class BrokerHandler(BaseHTTPRequestHandler):
         def end_headers(self):
-            # 添加 CORS 头
             self.send_header("Cache-Control", "no-store, no-cache, must-revalidate")
-            self.send_header("Pragma", "no-cache")
-            self.send_header("Expires", "0")
             self.send_header("Access-Control-Allow-Origin", "*")
-            self.send_header("Access-Control-Allow-Methods", "GET, OPTIONS")
+            self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
             self.send_header("Access-Control-Allow-Headers", "Content-Type, Authorization")
             super().end_headers()
 
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, code: int, payload=None):
+            body = json.dumps(payload if payload is not None else {}, ensure_ascii=False).encode('utf-8')
+            self.send_response(code)
+            self.send_header("Content-type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _authorized(self) -> bool:
+            if self.headers.get("Authorization") != session_key:
+                self._reply(401, {'error': 'Unauthorized'})
+                return False
+            return True
+
         def do_OPTIONS(self):
             self.send_response(200)
             self.end_headers()
 
         def do_GET(self):
-            print(self.path)
-            auth_header = self.headers.get("Authorization")
-            if auth_header != session_key:
-                self.send_response(401)
-                self.send_header("Content-type", "text/html")
-                self.end_headers()
-                self.wfile.write(b"Unauthorized")
+            if not self._authorized():
                 return
-
             if self.path == "/authorize":
-                self.send_response(200)
-                self.end_headers()
-                return
+                self._reply(200)
             elif self.path == "/credentials":
-                self.path = "/credentials.json"
-                return SimpleHTTPRequestHandler.do_GET(self)
+                self._reply(200, broker.legacy_credentials())
+            elif self.path == "/status":
+                self._reply(200, broker.status())
             else:
-                self.send_response(403)
-                self.send_header("Content-type", "text/html")
-                self.end_headers()
-                self.wfile.write(b"Forbidden")
+                self._reply(403, {'error': 'Forbidden'})
+
+        def do_POST(self):
+            if not self._authorized():
                 return
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._reply(400, {'error': 'invalid json'})
+                return
+            if self.path == "/lease":
+                lease = broker.lease(body.get('biz'), body.get('uin'), body.get('worker', ''),
+                                     float(body.get('ttl', DEFAULT_LEASE_TTL_SEC)),
+                                     int(body.get('min_generation', 0)))
+                self._reply(200 if lease else 404, lease or {'error': 'no credential'})
+            elif self.path == "/release":
+                self._reply(200, {'ok': broker.release(body.get('lease_id', ''))})
+            elif self.path == "/invalidate":
+                self._reply(200, {'ok': broker.invalidate(body.get('lease_id', ''), body.get('reason', ''),
+                                                          body.get('key'), body.get('generation'))})
+            else:
+                self._reply(403, {'error': 'Forbidden'})
+
+    return BrokerHandler
+
+
+def start_broker_server(broker: CredentialBroker, port: int = BROKER_PORT, session_key: str = None,
+                        discovery_file: str = BROKER_DISCOVERY_FILE) -> ThreadingHTTPServer:
+    """在后台线程启动 HTTP 服务，并写入发现文件 {url, session_key}"""
+    session_key = session_key or os.environ.get('WECHAT_BROKER_KEY') or \
+        ''.join(random.choices(string.ascii_letters + string.digits, k=32))
+    httpd = ThreadingHTTPServer(('127.0.0.1', port), _make_handler(broker, session_key))
+    threading.Thread(target=httpd.serve_forever, name="credential-broker", daemon=True).start()
+    port = httpd.server_address[1]
+    os.makedirs(os.path.dirname(discovery_file) or '.', exist_ok=True)
+    with open(discovery_file, 'w', encoding='utf-8') as f:
+        json.dump({'url': f"http://127.0.0.1:{port}", 'session_key': session_key}, f)
+    print(f"🔐 凭证代理服务已启动: http://127.0.0.1:{port} (会话密钥已写入 {discovery_file})")
+    return httpd
+
+
+# --------------- 客户端 ---------------
+class BrokerClient:
+    """爬虫进程侧的凭证代理客户端"""
+
+    def __init__(self, base_url: str = None, session_key: str = None, discovery_file: str = BROKER_DISCOVERY_FILE,
+                 timeout: float = 5):
+        if not (base_url and session_key) and os.path.exists(discovery_file):
+            with open(discovery_file, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+            base_url = base_url or info.get('url')
+            session_key = session_key or info.get('session_key')
+        self.base_url = (base_url or f"http://127.0.0.1:{BROKER_PORT}").rstrip('/')
+        self.session_key = session_key or ""
+        self.timeout = timeout
+
+    def _post(self, path: str, payload: Dict) -> Optional[Dict]:
+        import requests
+        try:
+            response = requests.post(self.base_url + path, json=payload, timeout=self.timeout,
+                                     headers={'Authorization': self.session_key},
+                                     proxies={'http': None, 'https': None})
+        except requests.RequestException:
+            return None
+        return response.json() if response.status_code == 200 else None
 
-    server_address = ('', 8088)
-    httpd = HTTPServer(server_address, CustomHandler)
-    # print("API server listening *:8088")
-    httpd.serve_forever()
+    def lease(self, biz: str = None, uin: str = None, worker: str = "", ttl: float = DEFAULT_LEASE_TTL_SEC,
+              min_generation: int = 0) -> Optional[Dict]:
+        return self._post("/lease", {'biz': biz, 'uin': uin, 'worker': worker, 'ttl': ttl,
+                                     'min_generation': min_generation})
 
+    def release(self, lease_id: str) -> bool:
+        return bool((self._post("/release", {'lease_id': lease_id}) or {}).get('ok'))
 
-# 在一个单独的线程中启动 HTTP 服务器
-threading.Thread(target=start_http_server, daemon=True).start()
+    def invalidate(self, lease_id: str, reason: str = "ret=-3", key: str = None, generation: int = None) -> bool:
+        return bool((self._post("/invalidate", {'lease_id': lease_id, 'reason': reason, 'key': key,
+                                                'generation': generation}) or {}).get('ok'))
+
+
+# --------------- mitmproxy 插件 ---------------
+class ExtractSetCookie:
+    KEY_HEADERS = ('x-wechat-key', 'x-wechat-uin', 'exportkey', 'user-agent', 'accept', 'accept-language')
+
+    def __init__(self, broker: CredentialBroker = None):
+        self.broker = broker
+        self.httpd = None
+
+    def running(self):
+        # 插件加载完成后再回放日志、启动 HTTP 服务；导入本模块（如客户端）没有副作用
+        if self.broker is None:
+            self.broker = CredentialBroker()
+        if self.httpd is None:
+            self.httpd = start_broker_server(self.broker)
+
+    def response(self, flow):
+        # 检查请求的 URL 是否符合过滤器
+        if self.broker is None or not flow.request.url.startswith("https://mp.weixin.qq.com/s?__biz="):
+            return
+        biz = parse_qs(urlparse(flow.request.url).query).get('__biz', [None])[0]
+        if not biz:
+            return
+        cookie_str = "; ".join(f"{k}={v}" for k, v in flow.request.cookies.items())
+        token_match = re.search(r'appmsg_token=([^;]+)', cookie_str)
+        headers = {h: flow.request.headers[h] for h in self.KEY_HEADERS if h in flow.request.headers}
+        set_cookie = flow.response.headers.get("Set-Cookie")
+        # 缺少 appmsg_token 或 Cookie 的凭证无法用于请求，不放入 broker（否则会被租给 worker）
+        if not cookie_str or not token_match:
+            return
+        auth_info = {
+            'appmsg_token': token_match.group(1) if token_match else None,
+            'biz': biz,
+            'cookie_str': cookie_str,
+            'headers': headers,
+        }
+        self.broker.put(biz, headers.get('x-wechat-uin'), auth_info, url=flow.request.url, set_cookie=set_cookie)
+
+
+addons = [
+    ExtractSetCookie(),
+]
@@ -0,0 +1,224 @@
+"""
+本地文章索引：把每次 get_article_list 的响应按公众号(biz)增量记入 SQLite，供后续运行查询而不必重新翻页
+
+每篇文章一行 (biz, mid, idx) -> create_time, offset_seen, seen_at, title_hash, url，
+另记录最近一次获取统计数据的时间与数值（阅读/点赞/分享）：
+- 窗口规划：按日期估算列表 offset（分段回填时直接跳过比阶段上界更新的页）
+- 去重预检：发布足够久之后已获取过阅读量的文章不再重复请求，直接使用索引中的数值
+- 刷新计划：仍在增长期的文章距上次获取不足 min_interval_sec 时同样不再请求（爬取时按文章查询，
+  命令行列出某公众号待刷新的文章）
+
+offset_seen 为文章所在推送在列表中的 offset（以推送为单位），随着新推送发布会整体后移，
+估算时按 seen_at 之后新增的推送数修正。
+
+用法（查看某公众号的索引与待刷新文章）:
+    python -m src.core.article_index --biz MzI... [--settle-days 7 --min-interval-hours 24]
+"""
+import argparse
+import hashlib
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    biz TEXT NOT NULL,
+    mid TEXT NOT NULL,
+    idx TEXT NOT NULL,
+    create_time INTEGER NOT NULL,
+    offset_seen INTEGER NOT NULL,
+    seen_at REAL NOT NULL,
+    title_hash TEXT,
+    url TEXT,
+    stats_at REAL,
+    read_count INTEGER,
+    like_count INTEGER,
+    share_count INTEGER,
+    PRIMARY KEY (biz, mid, idx)
+);
+CREATE INDEX IF NOT EXISTS idx_articles_biz_time ON articles (biz, create_time);
+"""
+# 旧版索引文件缺少的列
+ADDED_COLUMNS = (('like_count', 'INTEGER'), ('share_count', 'INTEGER'))
+# 需要（重新）获取统计数据：从未获取过，或尚未稳定且距上次获取已超过最小间隔
+REFRESH_DUE_SQL = "(stats_at IS NULL OR (stats_at - create_time < ? AND ? - stats_at >= ?))"
+
+
+def article_key(url: str) -> Optional[Tuple[str, str]]:
+    """从文章链接解析 (mid, idx)；非标准链接返回 None"""
+    if not url:
+        return None
+    import html
+    query = parse_qs(urlparse(html.unescape(url)).query)
+    mid = (query.get('mid') or query.get('appmsgid') or [None])[0]
+    idx = (query.get('idx') or query.get('itemidx') or ['1'])[0]
+    return (mid, idx) if mid else None
+
+
+def title_hash(title: str) -> str:
+    return hashlib.sha1((title or '').strip().encode('utf-8')).hexdigest()[:16]
+
+
+class ArticleIndex:
+    """线程安全；同一文件在进程内共享一个实例（见 shared）"""
+
+    _instances: Dict[str, 'ArticleIndex'] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: str = 'data/runtime/article_index.db'):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(articles)')}
+        for name, kind in ADDED_COLUMNS:
+            if name not in columns:
+                self._conn.execute(f'ALTER TABLE articles ADD COLUMN {name} {kind}')
+
+    @classmethod
+    def shared(cls, path: str = 'data/runtime/article_index.db') -> 'ArticleIndex':
+        with cls._instances_lock:
+            if path not in cls._instances:
+                cls._instances[path] = cls(path)
+            return cls._instances[path]
+
+    # --------------- 写入 ---------------
+    def record_listing(self, biz: str, rows: List[Dict], seen_at: float = None):
+        """
+        记录一次列表响应
+        :param rows: [{'url', 'title', 'create_time', 'offset'}]，offset 为所在推送的列表 offset
+        """
+        if not biz or not rows:
+            return
+        seen_at = seen_at or time.time()
+        values = []
+        for row in rows:
+            key = article_key(row.get('url'))
+            if not key or not row.get('create_time'):
+                continue
+            values.append((biz, key[0], key[1], int(row['create_time']), int(row.get('offset', 0)), seen_at,
+                           title_hash(row.get('title')), row.get('url')))
+        if not values:
+            return
+        try:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    """INSERT INTO articles (biz, mid, idx, create_time, offset_seen, seen_at, title_hash, url)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (biz, mid, idx) DO UPDATE SET
+                           offset_seen = excluded.offset_seen, seen_at = excluded.seen_at,
+                           title_hash = excluded.title_hash, url = excluded.url""",
+                    values
+                )
+        except sqlite3.Error as e:
+            self.logger.warning(f"⚠️ 写入文章索引失败: {e}")
+
+    def mark_stats(self, biz: str, url: str, read_count: int, like_count: int = 0, share_count: int = 0):
+        """记录文章统计数据及获取时间"""
+        key = article_key(url)
+        if not biz or not key:
+            return
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    """UPDATE articles SET stats_at = ?, read_count = ?, like_count = ?, share_count = ?
+                       WHERE biz = ? AND mid = ? AND idx = ?""",
+                    (time.time(), int(read_count or 0), int(like_count or 0), int(share_count or 0),
+                     biz, key[0], key[1])
+                )
+        except sqlite3.Error as e:
+            self.logger.warning(f"⚠️ 更新文章索引失败: {e}")
+
+    # --------------- 查询 ---------------
+    def _query(self, sql: str, params: tuple) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def count(self, biz: str) -> int:
+        return self._query("SELECT COUNT(*) FROM articles WHERE biz = ?", (biz,))[0][0]
+
+    def estimate_offset(self, biz: str, before_ts: float) -> Optional[int]:
+        """
+        估算当前列表中第一条早于 before_ts 的推送所在的 offset（以推送为单位）
+        索引中没有早于 before_ts 的记录时返回 None
+        """
+        rows = self._query(
+            """SELECT create_time, offset_seen, seen_at FROM articles
+               WHERE biz = ? AND create_time < ? ORDER BY create_time DESC LIMIT 1""",
+            (biz, int(before_ts))
+        )
+        if not rows:
+            return None
+        _, offset_seen, seen_at = rows[0]
+        # 记录之后发布的推送会把它往后推
+        newer = self._query(
+            "SELECT COUNT(DISTINCT create_time) FROM articles WHERE biz = ? AND create_time > ?",
+            (biz, int(seen_at))
+        )[0][0]
+        return offset_seen + newer
+
+    def reusable_stats(self, biz: str, url: str, settle_sec: float, min_interval_sec: float = 0) -> Optional[Dict]:
+        """
+        文章本次无需请求时返回索引中的统计数据 {read_count, like_count, share_count, stats_at}，否则 None：
+        发布 settle_sec 之后已获取过（数值基本稳定），或尚未稳定但距上次获取不足 min_interval_sec（与 due_for_refresh 互补）
+        """
+        key = article_key(url)
+        if not biz or not key:
+            return None
+        rows = self._query(
+            f"""SELECT read_count, like_count, share_count, stats_at FROM articles
+                WHERE biz = ? AND mid = ? AND idx = ? AND NOT {REFRESH_DUE_SQL}""",
+            (biz, key[0], key[1], settle_sec, time.time(), min_interval_sec)
+        )
+        if not rows:
+            return None
+        read_count, like_count, share_count, stats_at = rows[0]
+        return {'read_count': read_count or 0, 'like_count': like_count or 0,
+                'share_count': share_count or 0, 'stats_at': stats_at}
+
+    def is_settled(self, biz: str, url: str, settle_sec: float) -> bool:
+        """文章发布 settle_sec 之后已获取过阅读量：数值基本稳定，无需再次请求"""
+        return self.reusable_stats(biz, url, settle_sec) is not None
+
+    def due_for_refresh(self, biz: str, settle_sec: float, min_interval_sec: float,
+                        since_ts: float = 0, limit: int = 200) -> List[str]:
+        """
+        需要重新获取阅读量的文章链接（从新到旧）：尚未稳定，且距上次获取已超过 min_interval_sec
+        """
+        now = time.time()
+        rows = self._query(
+            f"""SELECT url FROM articles
+                WHERE biz = ? AND create_time >= ? AND {REFRESH_DUE_SQL}
+                ORDER BY create_time DESC LIMIT ?""",
+            (biz, int(since_ts), settle_sec, now, min_interval_sec, limit)
+        )
+        return [r[0] for r in rows]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="本地文章索引查询")
+    parser.add_argument('--db', default='data/runtime/article_index.db', help="索引文件")
+    parser.add_argument('--biz', required=True, help="公众号 __biz")
+    parser.add_argument('--settle-days', type=float, default=7, help="发布多少天后阅读量视为稳定")
+    parser.add_argument('--min-interval-hours', type=float, default=24, help="未稳定文章两次获取的最小间隔")
+    args = parser.parse_args(argv)
+
+    index = ArticleIndex(args.db)
+    due = index.due_for_refresh(args.biz, args.settle_days * 86400, args.min_interval_hours * 3600)
+    print(f"🗂️ {args.biz}: 索引 {index.count(args.biz)} 篇，待刷新阅读量 {len(due)} 篇")
+    for url in due:
+        print(f"   {url}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,15 +7,64 @@ import time
 import os
 import json
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 
-from src.proxy.read_cookie import ReadCookie
 from src.crawler.batch_readnum_spider import BatchReadnumSpider
-from src.ui.excel_auto_crawler import ExcelAutoCrawler
 from src.database.database_manager import DatabaseManager
 from src.database.database_config import get_database_config
-from src.ui.wechat_browser_automation import WeChatBrowserAutomation, UI_AUTOMATION_AVAILABLE
 from config.config_manager import get_crawler_config
 from src.core.backfill_manager import BackfillManager, BackfillStageInfo
+from src.core.rate_controller import GlobalRequestBudget
+from src.core.credential_pipeline import CredentialPipeline
+from src.core.credential_store import CredentialStore, CachedCredentialProvider
+from src.core.circuit_breaker import CaptchaCircuitBreaker, ParkedWorkQueue
+from src.core.crawl_journal import CrawlJournal
+from src.core.run_metrics import RunMetrics
+from src.core.request_ledger import RequestLedger
+from src.core.run_planner import RunEta
+from src.utils import utils
+
+
+def read_targets_from_excel(excel_path: str, logger: logging.Logger = None) -> list:
+    """
+    从Excel文件中读取所有有效的公众号链接
+    :return: 包含所有有效链接和公众号名称的列表
+    """
+    logger = logger or logging.getLogger()
+    logger.info(f"正在从 {excel_path} 读取所有目标URL...")
+    if not os.path.exists(excel_path):
+        logger.error(f"Excel文件未找到: {excel_path}")
+        return []
+
+    try:
+        df = pd.read_excel(excel_path)
+        url_column = '文章链接' if '文章链接' in df.columns else 'url'
+        name_column = '公众号名称' if '公众号名称' in df.columns else 'name'
+
+        if url_column not in df.columns:
+            logger.error("Excel中未找到 '文章链接' 或 'url' 列。")
+            return []
+
+        valid_targets = []
+        for index, row in df.iterrows():
+            url = row[url_column]
+            name = row.get(name_column, f"公众号_{index+1}") if name_column in df.columns else f"公众号_{index+1}"
+
+            if pd.notna(url) and 'mp.weixin.qq.com' in str(url):
+                valid_targets.append({
+                    'name': str(name),
+                    'url': str(url),
+                    'index': index + 1
+                })
+                logger.info(f"找到有效目标 {index+1}: {name} - {str(url)[:50]}...")
+
+        logger.info(f"共找到 {len(valid_targets)} 个有效的公众号目标")
+        return valid_targets
+
+    except Exception as e:
+        logger.error(f"读取Excel文件失败: {e}")
+        return []
+
 
 class AutomatedCrawler:
     """
@@ -28,8 +77,13 @@ class AutomatedCrawler:
        - 停止 mitmproxy 抓取器 (会自动关闭代理)
        - 使用获取到的 Cookie 运行批量爬虫
     3. 汇总所有公众号的抓取结果
+
+    account_workers > 1 时先串行完成各账号抓包，再由 worker 池并行爬取，
+    所有 worker 共享全局请求预算（global_max_requests_per_minute）。
+    capture_lookahead > 0 时抓包阶段在后台为后续账号预先准备凭证，与爬取阶段重叠执行。
     """
-    def __init__(self, excel_path="target_articles.xlsx", save_to_db=True, db_config=None, crawler_config=None):
+    def __init__(self, excel_path="target_articles.xlsx", save_to_db=True, db_config=None, crawler_config=None,
+                 credential_provider=None):
         self.logger = logging.getLogger()
         # 若未显式传入 excel_path 则使用配置中的 excel_file
         cfg_excel = (crawler_config or get_crawler_config()).get('excel_file', 'target_articles.xlsx')
@@ -38,9 +92,48 @@ class AutomatedCrawler:
         self.crawler_config = crawler_config or get_crawler_config()
         self.cookie_wait_timeout = self.crawler_config.get('cookie_wait_timeout', 120)
         self.account_delay = self.crawler_config.get('account_delay', 15)
+        # 所有等待时间的缩放系数（离线回放/基准测试时缩短等待，正式抓取为 1.0）
+        self.delay_scale = float(self.crawler_config.get('delay_scale', 1.0))
+        # 运行指标：各阶段耗时/结果与刻意等待，导出 Prometheus 文本文件与 JSON 运行报告
+        self.metrics = RunMetrics(self.crawler_config)
+        # 请求台账：逐条记录对外请求（时间/凭证/耗时/结果/前置等待），供离线分析限流规律
+        self.request_ledger = RequestLedger(self.crawler_config)
+        # 运行 ETA（run() 中按本次待处理的公众号创建）
+        self.eta = RunEta(self.crawler_config, [])
         self.days_back = self.crawler_config.get('days_back', 90)
         self.max_pages = self.crawler_config.get('max_pages', 200)
         self.articles_per_page = self.crawler_config.get('articles_per_page', 5)
+        # 多账号并行
+        self.account_workers = max(1, int(self.crawler_config.get('account_workers', 1) or 1))
+        self.global_max_requests_per_minute = self.crawler_config.get('global_max_requests_per_minute', 0)
+        self.request_budget = GlobalRequestBudget(self.global_max_requests_per_minute) \
+            if self.account_workers > 1 and self.global_max_requests_per_minute else None
+        # 抓包/爬取流水线：抓包阶段最多领先爬取阶段 capture_lookahead 个公众号（0 = 不重叠）
+        self.capture_lookahead = max(0, int(self.crawler_config.get('capture_lookahead', 0) or 0))
+        if credential_provider is None and self.crawler_config.get('credential_broker_enabled'):
+            # 从本地凭证代理服务租用凭证，多个爬取进程共享同一份抓包结果
+            from src.core.broker_provider import BrokerCredentialProvider
+            credential_provider = BrokerCredentialProvider(self.crawler_config)
+        if credential_provider is None:
+            from src.core.capture_provider import MitmCredentialProvider
+            credential_provider = MitmCredentialProvider(self.crawler_config)
+        # 凭证缓存：仍在有效期内的凭证经一次列表探测验证后直接复用，跳过抓包
+        if self.crawler_config.get('credential_cache_enabled'):
+            store = CredentialStore.shared(
+                self.crawler_config.get('credential_cache_file', 'data/runtime/credential_cache.json'),
+                max_age_sec=self.crawler_config.get('credential_cache_max_age_sec', 7200)
+            )
+            credential_provider = CachedCredentialProvider(
+                credential_provider, store, probe=self._probe_credential,
+                reuse_enabled=self.crawler_config.get('credential_reuse_enabled', False)
+            )
+        self.credential_provider = credential_provider
+        # 验证码熔断：同一微信会话遇到验证码后所有账号暂停，剩余工作暂存，冷却后从中断处恢复
+        self.circuit_breaker = CaptchaCircuitBreaker(self.crawler_config)
+        self.parked = ParkedWorkQueue()
+        # 最近一次 run() 各公众号的结果（含停止原因），供基准测试等调用方检查
+        self.outcomes = []
+        self.captcha_breaker_max_wait = float(self.crawler_config.get('captcha_breaker_max_wait_sec', 3600))
         # 数据库
         self.save_to_db = save_to_db
         self.db_config = db_config or get_database_config()
@@ -55,43 +148,8 @@ class AutomatedCrawler:
                 self.save_to_db = False
 
     def _get_all_target_urls_from_excel(self) -> list:
-        """
-        从Excel文件中读取所有有效的公众号链接
-        :return: 包含所有有效链接和公众号名称的列表
-        """
-        self.logger.info(f"正在从 {self.excel_path} 读取所有目标URL...")
-        if not os.path.exists(self.excel_path):
-            self.logger.error(f"Excel文件未找到: {self.excel_path}")
-            return []
-
-        try:
-            df = pd.read_excel(self.excel_path)
-            url_column = '文章链接' if '文章链接' in df.columns else 'url'
-            name_column = '公众号名称' if '公众号名称' in df.columns else 'name'
-
-            if url_column not in df.columns:
-                self.logger.error("Excel中未找到 '文章链接' 或 'url' 列。")
-                return []
-
-            valid_targets = []
-            for index, row in df.iterrows():
-                url = row[url_column]
-                name = row.get(name_column, f"公众号_{index+1}") if name_column in df.columns else f"公众号_{index+1}"
-
-                if pd.notna(url) and 'mp.weixin.qq.com' in str(url):
-                    valid_targets.append({
-                        'name': str(name),
-                        'url': str(url),
-                        'index': index + 1
-                    })
-                    self.logger.info(f"找到有效目标 {index+1}: {name} - {str(url)[:50]}...")
-
-            self.logger.info(f"共找到 {len(valid_targets)} 个有效的公众号目标")
-            return valid_targets
-
-        except Exception as e:
-            self.logger.error(f"读取Excel文件失败: {e}")
-            return []
+        """从Excel文件中读取所有有效的公众号链接"""
+        return read_targets_from_excel(self.excel_path, self.logger)
 
     def run(self):
         """执行完整的多公众号自动化流程"""
@@ -99,19 +157,12 @@ class AutomatedCrawler:
         self.logger.info("🚀 多公众号全新自动化流程启动 🚀")
         self.logger.info("="*80)
 
-        # 分段回填阶段决策
+        # 分段回填：每个公众号按自身进度选择阶段（见 _account_window）
         backfill_mgr = BackfillManager(self.crawler_config)
-        stage_info = backfill_mgr.decide_stage()
-        lower_dt = upper_dt = None
-        stage_label = None
+        staged = backfill_mgr.is_active()
         adaptive_est_pages = 0
-        if stage_info:
-            lower_dt, upper_dt = backfill_mgr.compute_bounds(stage_info)
-            stage_label = f"{stage_info.index}/{stage_info.total} {stage_info.lower_days}->{stage_info.upper_days}d"
-            self.logger.info(f"🧩 检测到分段回填阶段: {stage_label} 时间窗口 {lower_dt} -> {upper_dt}")
-            adaptive_est_pages = backfill_mgr.decide_max_pages("__GLOBAL__", stage_info, self.articles_per_page)
-            if adaptive_est_pages:
-                self.logger.info(f"🧠 自适应估算 max_pages = {adaptive_est_pages} (全局配置 {self.max_pages})")
+        if staged:
+            self.logger.info("🧩 分段回填已启用，各公众号按自身进度抓取未完成的阶段")
         else:
             self.logger.info("🧩 分段回填未启用或已完成，使用常规 days_back 窗口")
             if self.crawler_config.get('adaptive_max_pages_enabled'):
@@ -123,255 +174,70 @@ class AutomatedCrawler:
                 except Exception as e:
                     self.logger.warning(f"⚠️ 非分段自适应估算失败: {e}")
 
+        # 本次运行的公共上下文，供各账号抓取使用
+        run_ctx = {
+            'backfill_mgr': backfill_mgr,
+            'adaptive_est_pages': adaptive_est_pages,
+        }
+
         # 获取所有目标公众号
         all_targets = self._get_all_target_urls_from_excel()
         if not all_targets:
             self.logger.error("❌ 未找到任何有效的公众号链接，流程中止。")
             return False
 
-        self.logger.info(f"📋 共找到 {len(all_targets)} 个公众号，开始逐个处理...")
+        # 运行日志：上次运行中途退出时，跳过已完成的公众号，其余从中断处继续
+        journal = CrawlJournal(self.crawler_config)
+        # run_key 含运行日期：只续跑当天中断的运行，次日的定时运行不会沿用旧日志而跳过已“完成”的公众号
+        journal.begin(f"{time.strftime('%Y-%m-%d')}|days_back={self.days_back}" + ("|staged" if staged else ""))
+        run_ctx['journal'] = journal
+        outcomes = []
+        pending_targets = []
+        for target in all_targets:
+            if journal.is_done(target['name']):
+                self.logger.info(f"📒 公众号 '{target['name']}' 已在上次运行中完成，跳过")
+                outcomes.append({'target': target, 'status': 'success', 'articles': []})
+            else:
+                pending_targets.append(target)
 
-        # 用于存储所有公众号的抓取结果
-        all_results = []
-        successful_count = 0
-        failed_count = 0
+        self.logger.info(f"📋 共找到 {len(all_targets)} 个公众号，开始逐个处理...")
+        # 运行 ETA：按规划预测剩余耗时，每个公众号结束后更新 data/runtime/eta.json
+        self.eta = RunEta(self.crawler_config, pending_targets)
 
         try:
-            for i, target in enumerate(all_targets, 1):
-                self.logger.info("="*60)
-                self.logger.info(f"📍 处理第 {i}/{len(all_targets)} 个公众号: {target['name']}")
-                self.logger.info("="*60)
-
-                # 为每个公众号创建独立的Cookie抓取器
-                cookie_reader = None
-                try:
-                    # 步骤1: 为每个公众号创建独立的Cookie抓取器
-                    self.logger.info(f"[步骤 1/5] 为 '{target['name']}' 创建独立的 Cookie 抓取器...")
-                    cookie_reader = ReadCookie()  # 每个公众号独立创建，会删除旧文件
-
-                    if not cookie_reader.start_cookie_extractor():
-                        self.logger.error(f"❌ 公众号 '{target['name']}' Cookie 抓取器启动失败，跳过此公众号")
-                        failed_count += 1
-                        continue
-                    self.logger.info("✅ Cookie 抓取器已在后台运行。")
-
-                    # 步骤2: 运行 UI 自动化触发抓取
-                    self.logger.info(f"[步骤 2/5] 为 '{target['name']}' 启动 UI 自动化...")
-                    try:
-                        ui_crawler = ExcelAutoCrawler()
-                        # 直接传递当前公众号的URL，并传递cookie_reader以启用智能刷新停止
-                        success = ui_crawler.automation.send_and_open_latest_link(target['url'], cookie_reader=cookie_reader)
-                        if not success:
-                            self.logger.error(f"❌ 公众号 '{target['name']}' UI 自动化触发失败，跳过此公众号")
-                            cookie_reader.stop_cookie_extractor()
-                            failed_count += 1
-                            continue
-                    except Exception as e:
-                        self.logger.error(f"❌ 公众号 '{target['name']}' UI 自动化过程中发生错误: {e}")
-                        cookie_reader.stop_cookie_extractor()
-                        failed_count += 1
-                        continue
-                    self.logger.info("✅ UI 自动化已成功触发链接打开。")
-
-                    # 步骤3: 等待并验证 Cookie
-                    self.logger.info(f"[步骤 3/5] 等待 '{target['name']}' 的 Cookie 数据...")
-                    if not cookie_reader.wait_for_new_cookie(timeout=self.cookie_wait_timeout):
-                        self.logger.error(f"❌ 公众号 '{target['name']}' 等待 Cookie 超时，跳过此公众号")
-                        cookie_reader.stop_cookie_extractor()
-                        failed_count += 1
-                        continue
-
-                    # 验证cookie是否有效
-                    auth_info = cookie_reader.get_latest_cookies()
-                    if not auth_info:
-                        self.logger.error(f"❌ 公众号 '{target['name']}' Cookie 解析失败")
-                        self.logger.error("💡 可能的原因:")
-                        self.logger.error("   1. mitmproxy 没有成功抓取到微信请求")
-                        self.logger.error("   2. 微信内置浏览器没有正确打开链接")
-                        self.logger.error("   3. 网络连接问题或代理设置问题")
-                        self.logger.error("💡 建议:")
-                        self.logger.error("   1. 检查微信是否正常打开了文章链接")
-                        self.logger.error("   2. 手动在微信中刷新文章页面")
-                        self.logger.error("   3. 确保网络连接正常")
-                        cookie_reader.stop_cookie_extractor()
-                        failed_count += 1
-                        continue
-                    self.logger.info("✅ 成功获取并验证了新的 Cookie。")
-
-                    # 步骤4: 停止 mitmproxy 抓取器
-                    self.logger.info(f"[步骤 4/5] 停止 '{target['name']}' 的 Cookie 抓取器...")
-                    cookie_reader.stop_cookie_extractor()
-                    time.sleep(3)  # 等待代理完全关闭
-                    self.logger.info("✅ Cookie 抓取器已停止，系统代理已恢复。")
-
-                    # 步骤5: 运行批量爬虫（带Cookie重新抓取机制）
-                    self.logger.info(f"[步骤 5/5] 开始爬取 '{target['name']}' 的文章...")
-
-                    max_attempts = 2  # 最多尝试2次（第一次失败后重新抓取Cookie再试一次）
-                    batch_spider = None
-
-                    for attempt in range(max_attempts):
-                        try:
-                            self.logger.info(f"🔄 第 {attempt + 1}/{max_attempts} 次尝试爬取...")
-                            batch_spider = BatchReadnumSpider(
-                                auth_info=auth_info,
-                                save_to_db=self.save_to_db,
-                                db_config=self.db_config,
-                                unit_name=target['name']
-                            )
-
-                            # 先验证Cookie
-                            if not batch_spider.validate_cookie():
-                                if attempt < max_attempts - 1:
-                                    self.logger.warning("⚠️ Cookie验证失败（ret=-3），准备仅刷新文章页面以重新抓包...")
-
-                                    # 重新抓取Cookie（仅启动抓取器，不重复粘贴点击）
-                                    self.logger.info("🔄 重新启动Cookie抓取器...")
-                                    fresh_cookie_reader = ReadCookie()
-                                    if not fresh_cookie_reader.start_cookie_extractor():
-                                        self.logger.error("❌ 重新启动Cookie抓取器失败")
-                                        break
-
-                                    # 仅刷新当前文章页面
-                                    try:
-                                        if not UI_AUTOMATION_AVAILABLE:
-                                            self.logger.error("❌ UI自动化不可用，无法执行刷新")
-                                        else:
-                                            self.logger.info("🔁 不重新粘贴链接，直接刷新已打开的文章页面以触发新请求…")
-                                            refresher = WeChatBrowserAutomation()
-                                            # 刷新次数适当增加，提高触发概率
-                                            refresher.auto_refresh_browser(refresh_count=self.crawler_config.get('refresh_count', 3),
-                                                                           refresh_delay=self.crawler_config.get('refresh_delay', 3.0),
-                                                                           cookie_reader=fresh_cookie_reader)
-                                    except Exception as e:
-                                        self.logger.warning(f"刷新文章页面时出错: {e}")
-
-                                    # 等待新Cookie
-                                    if not fresh_cookie_reader.wait_for_new_cookie(timeout=self.cookie_wait_timeout):
-                                        self.logger.error("❌ 重新等待Cookie超时")
-                                        fresh_cookie_reader.stop_cookie_extractor()
-                                        break
-
-                                    # 获取新的认证信息
-                                    auth_info = fresh_cookie_reader.get_latest_cookies()
-                                    fresh_cookie_reader.stop_cookie_extractor()
-                                    time.sleep(3)
-
-                                    if not auth_info:
-                                        self.logger.error("❌ 重新获取Cookie失败")
-                                        break
-
-                                    self.logger.info("✅ 成功通过刷新重新获取Cookie，继续尝试...")
-                                    continue
-                                else:
-                                    self.logger.error("❌ 多次尝试后Cookie仍然无效")
-                                    break
-
-                            # Cookie有效，开始正式爬取
-                            self.logger.info("✅ Cookie验证成功，开始正式爬取...")
-                            # 针对该账号的自适应估算（优先使用阶段/虚拟阶段窗口天数）
-                            per_account_est = 0
-                            if self.crawler_config.get('adaptive_max_pages_enabled'):
-                                try:
-                                    # 复用 stage_info 或构造虚拟阶段
-                                    if stage_info:
-                                        acct_stage = stage_info
-                                    else:
-                                        from src.core.backfill_manager import BackfillStageInfo
-                                        acct_stage = BackfillStageInfo(0, self.days_back, 1, 1)
-                                    per_account_est = BackfillManager(self.crawler_config).decide_max_pages(target['name'], acct_stage, self.articles_per_page)
-                                    if per_account_est:
-                                        self.logger.info(f"🧠 账号 {target['name']} 自适应估算 max_pages = {per_account_est}")
-                                except Exception as e:
-                                    self.logger.warning(f"⚠️ 账号级自适应估算失败: {e}")
-                            effective_max_pages = per_account_est or adaptive_est_pages or self.max_pages
-                            batch_spider.batch_crawl_readnum(
-                                max_pages=effective_max_pages,
-                                articles_per_page=self.articles_per_page,
-                                days_back=self.days_back,
-                                lower_bound_dt=lower_dt,
-                                upper_bound_dt=upper_dt,
-                                stage_label=stage_label
-                            )
-                            # 爬取后更新自适应统计
-                            try:
-                                if self.crawler_config.get('adaptive_max_pages_enabled') and hasattr(batch_spider, 'crawl_stats'):
-                                    stats = batch_spider.crawl_stats
-                                    if stage_info:
-                                        update_stage = stage_info
-                                    else:
-                                        from src.core.backfill_manager import BackfillStageInfo
-                                        update_stage = BackfillStageInfo(0, self.days_back, 1, 1)
-                                    backfill_mgr.update_account_stats(
-                                        account=target['name'],
-                                        stage=update_stage,
-                                        used_pages=stats.get('used_pages', 0),
-                                        effective_articles=stats.get('effective_articles', 0),
-                                        last_page_effective=stats.get('last_page_effective', 0),
-                                        last_page_total=stats.get('last_page_total', 0),
-                                        est_pages=effective_max_pages
-                                    )
-                                    # 漏抓预警：若未到下界且已用完估算页数
-                                    if not stats.get('reached_lower_bound') and stats.get('used_pages') >= effective_max_pages:
-                                        self.logger.warning(f"⚠️ 账号 {target['name']} 可能未触达时间下界，建议提升估算或增量翻页 (used_pages={stats.get('used_pages')}, est={effective_max_pages})")
-                            except Exception as e:
-                                self.logger.warning(f"⚠️ 更新自适应统计失败: {e}")
-                            break  # 成功完成，跳出重试循环
-
-                        except Exception as e:
-                            self.logger.error(f"❌ 第 {attempt + 1} 次尝试时发生异常: {e}")
-                            if attempt < max_attempts - 1:
-                                self.logger.info("🔄 准备重试...")
-                                time.sleep(5)
-                            else:
-                                self.logger.error("❌ 所有尝试都失败了")
-
-                    if not batch_spider or not batch_spider.articles_data:
-                        self.logger.error(f"❌ 公众号 '{target['name']}' 爬取失败")
-                        failed_count += 1
-                        continue
-
-                    if batch_spider.articles_data:
-                        # 为每篇文章添加公众号信息
-                        for article in batch_spider.articles_data:
-                            article['公众号名称'] = target['name']
-                            article['公众号序号'] = i
-
-                        all_results.extend(batch_spider.articles_data)
-
-                        # 保存当前公众号的数据
-                        timestamp = time.strftime("%Y%m%d_%H%M%S")
-                        excel_file = batch_spider.save_to_excel(f"./data/readnum_batch/readnum_{target['name']}_{timestamp}.xlsx")
-                        json_file = batch_spider.save_to_json(f"./data/readnum_batch/readnum_{target['name']}_{timestamp}.json")
-
-                        self.logger.info(f"✅ 公众号 '{target['name']}' 爬取完成！获取 {len(batch_spider.articles_data)} 篇文章")
-                        self.logger.info(f"📊 数据已保存到: {excel_file}")
-                        successful_count += 1
-                    else:
-                        self.logger.warning(f"⚠️ 公众号 '{target['name']}' 未获取到任何文章数据")
-                        failed_count += 1
-
-                    # 公众号间延迟，避免频繁请求
-                    if i < len(all_targets):
-                        self.logger.info(f"⏳ 公众号间延迟 {self.account_delay} 秒...")
-                        time.sleep(self.account_delay)
-
-                except Exception as e:
-                    self.logger.error(f"❌ 处理公众号 '{target['name']}' 时发生错误: {e}")
-                    # 确保停止抓取器
-                    if cookie_reader:
-                        try:
-                            cookie_reader.stop_cookie_extractor()
-                        except:
-                            pass
-                    failed_count += 1
-                    continue
-
+            if self.account_workers > 1:
+                outcomes += self._run_parallel(pending_targets, run_ctx)
+            else:
+                outcomes += self._run_serial(pending_targets, run_ctx)
+            self._drain_parked(outcomes, run_ctx)
+            # 全部完成才结束日志；有失败/暂停（含熔断等待超时被放弃）或未翻完窗口的公众号时保留其恢复位置，下次运行继续
+            unfinished = [o['target']['name'] for o in outcomes
+                          if o.get('status') in ('parked', 'failed') or not o.get('finished', True)]
+            if unfinished:
+                self.logger.info(f"📒 {len(unfinished)} 个公众号未完成（{', '.join(unfinished)}），"
+                                 f"保留运行日志，下次运行从中断处继续")
+            else:
+                journal.end()
         except Exception as e:
             self.logger.error(f"❌ 自动化流程发生未知严重错误: {e}")
             import traceback
             self.logger.error(traceback.format_exc())
             return False
+        finally:
+            # 释放抓包资源（如常驻抓包守护进程）
+            self.credential_provider.close()
+            journal.close()
+            self.metrics.close()
+            self.request_ledger.close()
+            self.eta.finish()
+
+        self.outcomes = outcomes
+        # 用于存储所有公众号的抓取结果
+        all_results = []
+        for outcome in outcomes:
+            all_results.extend(outcome.get('articles') or [])
+        successful_count = sum(1 for o in outcomes if o.get('status') == 'success')
+        failed_count = len(outcomes) - successful_count
 
         # 汇总结果
         self.logger.info("="*80)
@@ -381,12 +247,6 @@ class AutomatedCrawler:
         self.logger.info(f"❌ 失败处理: {failed_count} 个公众号")
         self.logger.info(f"📄 总计文章: {len(all_results)} 篇")
 
-        # 若分段阶段成功且至少一个公众号有数据，则标记完成阶段
-        if stage_info and successful_count > 0:
-            # 粗略统计：使用的页数 = 最后一篇文章所在的页面估计（无法精确，后续可在 spider 内返回）
-            backfill_mgr.mark_completed(stage_info)
-            self.logger.info(f"🧩 已标记阶段完成: {stage_label}")
-
         # 汇总数据保存功能已移除
 
         self.logger.info("="*80)
@@ -394,3 +254,386 @@ class AutomatedCrawler:
         self.logger.info("="*80)
 
         return successful_count > 0  # 只要有一个成功就算成功
+
+    def _run_serial(self, all_targets: list, run_ctx: dict) -> list:
+        """串行模式：逐个账号 抓包 -> 爬取 -> 公众号间延迟（启用流水线时下一个账号的抓包与当前爬取重叠）"""
+        outcomes = []
+        pipeline = CredentialPipeline(self.credential_provider, all_targets, self.capture_lookahead,
+                                      metrics=self.metrics)
+        for i, target, auth_info in pipeline:
+            self.logger.info("="*60)
+            self.logger.info(f"📍 处理第 {i}/{len(all_targets)} 个公众号: {target['name']}")
+            self.logger.info("="*60)
+
+            if not auth_info:
+                outcomes.append({'target': target, 'status': 'failed', 'articles': []})
+                continue
+
+            outcome = self._crawl_account(target, i, auth_info, run_ctx)
+            outcomes.append(outcome)
+
+            # 公众号间延迟，避免频繁请求
+            if outcome['status'] == 'success' and i < len(all_targets):
+                self.logger.info(f"⏳ 公众号间延迟 {self.account_delay} 秒...")
+                time.sleep(self.account_delay * self.delay_scale)
+                self.metrics.record_sleep(target['name'], 'account_delay', self.account_delay * self.delay_scale)
+        return outcomes
+
+    def _run_parallel(self, all_targets: list, run_ctx: dict) -> list:
+        """
+        并行模式：
+        1. 串行完成所有账号的抓包（抓包器与微信UI为单例资源）
+        2. worker 池并行爬取，每个 worker 独占一个账号的凭证与 spider，
+           所有 worker 共享全局请求预算，单个账号失败不影响其他账号
+        """
+        self.logger.info(f"🧵 并行模式：{self.account_workers} 个 worker，全局请求上限 "
+                         f"{self.global_max_requests_per_minute or '不限'} 次/分钟")
+        if self.capture_lookahead > 0:
+            return self._run_parallel_pipelined(all_targets, run_ctx)
+        outcomes = []
+        ready = []
+        for i, target in enumerate(all_targets, 1):
+            self.logger.info("="*60)
+            self.logger.info(f"📍 抓包第 {i}/{len(all_targets)} 个公众号: {target['name']}")
+            self.logger.info("="*60)
+            auth_info = self._safe_capture(target)
+            if auth_info:
+                ready.append((i, target, auth_info))
+            else:
+                outcomes.append({'target': target, 'status': 'failed', 'articles': []})
+
+        self.logger.info(f"🧵 抓包阶段完成：{len(ready)}/{len(all_targets)} 个公众号获得凭证，开始并行爬取...")
+        with ThreadPoolExecutor(max_workers=self.account_workers, thread_name_prefix="account") as pool:
+            futures = {
+                pool.submit(self._crawl_account, target, i, auth_info, run_ctx): target
+                for i, target, auth_info in ready
+            }
+            for future in as_completed(futures):
+                target = futures[future]
+                try:
+                    outcomes.append(future.result())
+                except Exception as e:
+                    self.logger.error(f"❌ 公众号 '{target['name']}' worker 异常: {e}")
+                    outcomes.append({'target': target, 'status': 'failed', 'articles': []})
+        return outcomes
+
+    def _run_parallel_pipelined(self, all_targets: list, run_ctx: dict) -> list:
+        """并行 + 流水线：凭证就绪即提交给 worker，抓包阶段最多领先空闲 worker capture_lookahead 个账号"""
+        outcomes = []
+        pending = {}
+
+        def collect(done_futures):
+            for future in done_futures:
+                target = pending.pop(future)
+                try:
+                    outcomes.append(future.result())
+                except Exception as e:
+                    self.logger.error(f"❌ 公众号 '{target['name']}' worker 异常: {e}")
+                    outcomes.append({'target': target, 'status': 'failed', 'articles': []})
+
+        pipeline = CredentialPipeline(self.credential_provider, all_targets, self.capture_lookahead,
+                                      metrics=self.metrics)
+        with ThreadPoolExecutor(max_workers=self.account_workers, thread_name_prefix="account") as pool:
+            for i, target, auth_info in pipeline:
+                if not auth_info:
+                    outcomes.append({'target': target, 'status': 'failed', 'articles': []})
+                    continue
+                # worker 全忙时等待，避免凭证在队列中积压过期
+                while len(pending) >= self.account_workers:
+                    done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                    collect(done)
+                self.logger.info(f"🧵 第 {i}/{len(all_targets)} 个公众号 '{target['name']}' 凭证就绪，提交爬取")
+                pending[pool.submit(self._crawl_account, target, i, auth_info, run_ctx)] = target
+            while pending:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                collect(done)
+        return outcomes
+
+    def _drain_parked(self, outcomes: list, run_ctx: dict):
+        """等待熔断冷却，依次从中断位置恢复被暂存的公众号，结果合并进原 outcome"""
+        if not len(self.parked):
+            return
+        self.logger.info(f"🔌 {len(self.parked)} 个公众号因验证码熔断暂停，等待冷却后恢复...")
+        by_name = {o['target']['name']: o for o in outcomes}
+        deadline = time.time() + self.captcha_breaker_max_wait
+        while len(self.parked):
+            item = self.parked.pop_ready(self.circuit_breaker)
+            if item is None:
+                wait_sec = self.parked.next_wait(self.circuit_breaker)
+                if time.time() + wait_sec > deadline:
+                    self.logger.warning(f"⚠️ 熔断冷却超过最长等待 {int(self.captcha_breaker_max_wait)} 秒，"
+                                        f"放弃 {len(self.parked)} 个暂停的公众号")
+                    break
+                self.logger.info(f"⏳ 熔断冷却中，{int(wait_sec)} 秒后恢复...")
+                time.sleep(max(self.delay_scale, wait_sec))
+                self.metrics.record_sleep('', 'breaker_cooldown', max(self.delay_scale, wait_sec))
+                continue
+
+            target = item['target']
+            item['attempts'] = item.get('attempts', 0) + 1
+            if item['attempts'] > 3:
+                self.logger.warning(f"⚠️ 公众号 '{target['name']}' 多次恢复均被熔断，放弃")
+                continue
+            self.logger.info(f"🔌 恢复公众号 '{target['name']}'：第 {item['resume']['page'] + 1} 页"
+                             f"第 {item['resume']['article_index'] + 1} 篇起")
+            resumed = self._crawl_account(target, item['index'], item['auth_info'], run_ctx,
+                                          resume=item['resume'], attempts=item['attempts'])
+            previous = by_name.get(target['name'])
+            if previous is None:
+                outcomes.append(resumed)
+                by_name[target['name']] = resumed
+                continue
+            previous['articles'] = (previous.get('articles') or []) + (resumed.get('articles') or [])
+            previous['stop_reason'] = resumed.get('stop_reason')
+            previous['finished'] = resumed.get('finished')
+            if 'success' in (previous['status'], resumed['status']):
+                previous['status'] = 'success'
+            elif resumed['status'] == 'parked':
+                previous['status'] = 'parked'
+            else:
+                previous['status'] = resumed['status']
+
+    def _park(self, target: dict, index: int, auth_info: dict, resume: dict, attempts: int = 0):
+        self.parked.park({
+            'target': target,
+            'index': index,
+            'auth_info': auth_info,
+            'key': utils.credential_id(auth_info),
+            'resume': resume,
+            'attempts': attempts,
+        })
+        self.logger.warning(f"🔌 公众号 '{target['name']}' 已暂存，冷却后从第 {resume['page'] + 1} 页"
+                            f"第 {resume['article_index'] + 1} 篇继续")
+
+    def _account_window(self, target: dict, backfill_mgr: BackfillManager) -> dict:
+        """公众号本次抓取的时间窗口：分段回填时为其第一个未完成的阶段，否则为常规 days_back 窗口"""
+        window = {'stage_info': None, 'lower_dt': None, 'upper_dt': None, 'stage_label': None}
+        stage_info = backfill_mgr.decide_stage(target['name'])
+        if stage_info:
+            lower_dt, upper_dt = backfill_mgr.compute_bounds(stage_info)
+            window.update(
+                stage_info=stage_info,
+                lower_dt=lower_dt,
+                upper_dt=upper_dt,
+                stage_label=f"{stage_info.index}/{stage_info.total} {stage_info.lower_days}->{stage_info.upper_days}d"
+            )
+            self.logger.info(f"🧩 公众号 '{target['name']}' 回填阶段: {window['stage_label']} 时间窗口 {lower_dt} -> {upper_dt}")
+        return window
+
+    def _probe_credential(self, auth_info: dict) -> bool:
+        """
+        用一次列表请求（count=1）验证凭证是否仍然有效
+        探测失败（ret=-3）是预期内的结果而非限流，不反馈给 AIMD 速率控制，避免压低该 uin 学到的速率
+        """
+        probe_spider = BatchReadnumSpider(
+            auth_info=auth_info,
+            save_to_db=False,
+            crawler_config={**self.crawler_config, 'adaptive_rate_enabled': False},
+            request_budget=self.request_budget,
+            bypass_system_proxy=self.capture_lookahead > 0,
+            request_ledger=self.request_ledger
+        )
+        return probe_spider.validate_cookie()
+
+    def _safe_capture(self, target: dict):
+        """调用凭证提供者抓包，异常时返回 None"""
+        with self.metrics.phase('capture', target['name'], outcome='failed') as timer:
+            try:
+                auth_info = self.credential_provider.capture(target)
+                if auth_info:
+                    timer.outcome = 'ok'
+                return auth_info
+            except Exception as e:
+                self.logger.error(f"❌ 处理公众号 '{target['name']}' 时发生错误: {e}")
+                return None
+
+    def _crawl_account(self, target: dict, index: int, auth_info: dict, run_ctx: dict,
+                       resume: dict = None, attempts: int = 0) -> dict:
+        """
+        步骤5：使用认证信息爬取单个公众号并保存结果（带Cookie重新抓取机制）
+        :param resume: 熔断恢复位置 {'page', 'article_index'}，None 表示从头开始
+        :return: {'target': 目标, 'status': 'success'|'failed'|'parked', 'articles': 文章列表}
+        """
+        backfill_mgr = run_ctx['backfill_mgr']
+        window = self._account_window(target, backfill_mgr)
+        stage_info = window['stage_info']
+        outcome = {'target': target, 'status': 'failed', 'articles': []}
+        journal = run_ctx.get('journal')
+        if resume is None and journal:
+            resume = journal.resume_point(target['name'])
+            if resume:
+                self.logger.info(f"📒 公众号 '{target['name']}' 从运行日志恢复：第 {resume['page'] + 1} 页"
+                                 f"第 {resume['article_index'] + 1} 篇起")
+        resume = resume or {'page': 0, 'article_index': 0}
+        account_journal = journal.account(target['name']) if journal else None
+        # 会话处于熔断冷却期：不发任何请求，直接暂存
+        if self.circuit_breaker.enabled and self.circuit_breaker.wait_time(utils.credential_id(auth_info)) > 0:
+            self._park(target, index, auth_info, resume, attempts)
+            outcome['status'] = 'parked'
+            return outcome
+        account_timer = self.metrics.timer('account', target['name'])
+        try:
+            self.logger.info(f"[步骤 5/5] 开始爬取 '{target['name']}' 的文章...")
+
+            max_attempts = 2  # 最多尝试2次（第一次失败后重新抓取Cookie再试一次）
+            batch_spider = None
+
+            for attempt in range(max_attempts):
+                try:
+                    self.logger.info(f"🔄 第 {attempt + 1}/{max_attempts} 次尝试爬取...")
+                    batch_spider = BatchReadnumSpider(
+                        auth_info=auth_info,
+                        save_to_db=self.save_to_db,
+                        db_config=self.db_config,
+                        unit_name=target['name'],
+                        crawler_config=self.crawler_config,
+                        request_budget=self.request_budget,
+                        # 流水线模式下抓包（系统代理指向 mitmproxy）与爬取同时进行，爬虫请求需绕过系统代理
+                        bypass_system_proxy=self.capture_lookahead > 0,
+                        on_credential_invalid=lambda info, t=target: self.credential_provider.report_invalid(t, info),
+                        circuit_breaker=self.circuit_breaker if self.circuit_breaker.enabled else None,
+                        journal=account_journal,
+                        metrics=self.metrics,
+                        request_ledger=self.request_ledger,
+                        key_refresher=(lambda url, t=target: self.credential_provider.recapture(t))
+                        if getattr(self.credential_provider, 'handles_rekey', False) else None
+                    )
+
+                    # 先验证Cookie
+                    if not batch_spider.validate_cookie():
+                        self.credential_provider.report_invalid(target, auth_info)
+                        if attempt < max_attempts - 1:
+                            self.logger.warning("⚠️ Cookie验证失败（ret=-3），准备仅刷新文章页面以重新抓包...")
+                            with self.metrics.phase('recapture', target['name'], outcome='failed') as timer:
+                                auth_info = self.credential_provider.recapture(target)
+                                if auth_info:
+                                    timer.outcome = 'ok'
+                            if not auth_info:
+                                break
+                            self.logger.info("✅ 成功通过刷新重新获取Cookie，继续尝试...")
+                            continue
+                        else:
+                            self.logger.error("❌ 多次尝试后Cookie仍然无效")
+                            break
+
+                    # Cookie有效，开始正式爬取
+                    self.logger.info("✅ Cookie验证成功，开始正式爬取...")
+                    # 针对该账号的自适应估算（优先使用阶段/虚拟阶段窗口天数）
+                    per_account_est = 0
+                    if self.crawler_config.get('adaptive_max_pages_enabled'):
+                        try:
+                            # 复用 stage_info 或构造虚拟阶段
+                            acct_stage = stage_info or BackfillStageInfo(0, self.days_back, 1, 1)
+                            per_account_est = BackfillManager(self.crawler_config).decide_max_pages(target['name'], acct_stage, self.articles_per_page)
+                            if per_account_est:
+                                self.logger.info(f"🧠 账号 {target['name']} 自适应估算 max_pages = {per_account_est}")
+                        except Exception as e:
+                            self.logger.warning(f"⚠️ 账号级自适应估算失败: {e}")
+                    effective_max_pages = per_account_est or run_ctx['adaptive_est_pages'] or self.max_pages
+                    # 估算可能偏少（发文节奏模型约 1.4% 的情况）：未触达下界时继续翻页，直到硬上限
+                    hard_max_pages = min(self.max_pages, backfill_mgr.adaptive_hard_cap) \
+                        if effective_max_pages != self.max_pages else None
+                    batch_spider.batch_crawl_readnum(
+                        max_pages=effective_max_pages,
+                        articles_per_page=self.articles_per_page,
+                        days_back=self.days_back,
+                        lower_bound_dt=window['lower_dt'],
+                        upper_bound_dt=window['upper_dt'],
+                        stage_label=window['stage_label'],
+                        start_page=resume['page'],
+                        start_article_index=resume['article_index'],
+                        hard_max_pages=hard_max_pages
+                    )
+                    # 爬取后更新自适应统计
+                    try:
+                        # 中断（列表失败/验证码，见 crawl_finished）或从中途恢复的抓取只覆盖部分窗口，不参与学习
+                        full_crawl = batch_spider.crawl_finished and resume == {'page': 0, 'article_index': 0} \
+                            and not batch_spider.crawl_stats.get('planned_start_page')
+                        if full_crawl:
+                            backfill_mgr.record_listing(target['name'], batch_spider.listing_pushes,
+                                                        batch_spider.crawl_stats['started_at'])
+                        if self.crawler_config.get('adaptive_max_pages_enabled') and full_crawl:
+                            stats = batch_spider.crawl_stats
+                            update_stage = stage_info or BackfillStageInfo(0, self.days_back, 1, 1)
+                            backfill_mgr.update_account_stats(
+                                account=target['name'],
+                                stage=update_stage,
+                                used_pages=stats.get('used_pages', 0),
+                                effective_articles=stats.get('effective_articles', 0),
+                                last_page_effective=stats.get('last_page_effective', 0),
+                                last_page_total=stats.get('last_page_total', 0),
+                                est_pages=effective_max_pages
+                            )
+                            # 漏抓预警：若未到下界且已用完估算页数（及其后继续翻页的硬上限）
+                            if not stats.get('reached_lower_bound') and stats.get('used_pages') >= (hard_max_pages or effective_max_pages):
+                                self.logger.warning(f"⚠️ 账号 {target['name']} 可能未触达时间下界，建议提升估算或增量翻页 (used_pages={stats.get('used_pages')}, est={effective_max_pages})")
+                    except Exception as e:
+                        self.logger.warning(f"⚠️ 更新自适应统计失败: {e}")
+                    break  # 成功完成，跳出重试循环
+
+                except Exception as e:
+                    self.logger.error(f"❌ 第 {attempt + 1} 次尝试时发生异常: {e}")
+                    if attempt < max_attempts - 1:
+                        self.logger.info("🔄 准备重试...")
+                        time.sleep(5 * self.delay_scale)
+                        self.metrics.record_sleep(target['name'], 'retry_backoff', 5 * self.delay_scale)
+                    else:
+                        self.logger.error("❌ 所有尝试都失败了")
+
+            # 因验证码中断：剩余工作暂存，冷却后从中断处继续
+            if batch_spider and batch_spider.captcha_resume and self.circuit_breaker.enabled:
+                self._park(target, index, batch_spider.auth_info, batch_spider.captcha_resume, attempts)
+                outcome['status'] = 'parked'
+
+            if batch_spider:
+                outcome['stop_reason'] = batch_spider.crawl_stats.get('stop_reason')
+                outcome['finished'] = batch_spider.crawl_finished
+            # 完整跑完（未因验证码/列表失败/异常中断）才推进该公众号自己的回填阶段；阶段内无文章同样视为完成
+            if batch_spider and batch_spider.crawl_finished and stage_info:
+                backfill_mgr.mark_completed(stage_info, account=target['name'])
+                self.logger.info(f"🧩 公众号 '{target['name']}' 已完成回填阶段: {window['stage_label']}")
+
+            if not batch_spider or not batch_spider.articles_data:
+                if batch_spider and batch_spider.crawl_finished:
+                    # 完整翻完时间窗口但没有（尚未处理过的）文章：同样视为完成
+                    if account_journal:
+                        account_journal.done()
+                    self.credential_provider.report_valid(target, batch_spider.auth_info)
+                    self.logger.info(f"✅ 公众号 '{target['name']}' 爬取完成，时间窗口内没有新文章")
+                    outcome['status'] = 'success'
+                elif outcome['status'] != 'parked':
+                    self.logger.error(f"❌ 公众号 '{target['name']}' 爬取失败")
+                return outcome
+
+            # 为每篇文章添加公众号信息
+            for article in batch_spider.articles_data:
+                article['公众号名称'] = target['name']
+                article['公众号序号'] = index
+
+            # 保存当前公众号的数据
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
+            excel_file = batch_spider.save_to_excel(f"./data/readnum_batch/readnum_{target['name']}_{timestamp}.xlsx")
+            json_file = batch_spider.save_to_json(f"./data/readnum_batch/readnum_{target['name']}_{timestamp}.json")
+
+            # 反馈当前（可能已在爬取中刷新过的）凭证仍然有效，供缓存记录有效期
+            self.credential_provider.report_valid(target, batch_spider.auth_info)
+            if outcome['status'] == 'parked':
+                # 已暂存的公众号保持 parked，只带回暂停前获取的文章，由 _drain_parked 恢复后合并
+                self.logger.info(f"🔌 公众号 '{target['name']}' 暂停前获取 {len(batch_spider.articles_data)} 篇文章")
+            else:
+                # 列表失败等中途停止（未启用熔断时的验证码同样如此）不标记完成，下次运行从游标处继续
+                if account_journal and batch_spider.crawl_finished:
+                    account_journal.done()
+                self.logger.info(f"✅ 公众号 '{target['name']}' 爬取完成！获取 {len(batch_spider.articles_data)} 篇文章")
+                outcome['status'] = 'success'
+            self.logger.info(f"📊 数据已保存到: {excel_file}")
+            outcome['articles'] = batch_spider.articles_data
+            return outcome
+
+        except Exception as e:
+            self.logger.error(f"❌ 处理公众号 '{target['name']}' 时发生错误: {e}")
+            return outcome
+        finally:
+            account_timer.outcome = outcome['status']
+            account_timer.finish()
+            self.eta.account_done(target['name'], account_timer.elapsed)
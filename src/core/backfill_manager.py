@@ -1,8 +1,11 @@
 import json
 import os
+import threading
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional, Dict, Tuple
 
+from src.core.posting_model import PostingHistoryStore
+
 BEIJING_TZ = timezone(timedelta(hours=8))
 
 class BackfillStageInfo:
@@ -16,7 +19,12 @@ class BackfillStageInfo:
         return f"BackfillStage({self.index}/{self.total}: {self.lower_days}->{self.upper_days})"
 
 class BackfillManager:
-    """分段历史回填 + 自适应翻页管理"""
+    """
+    分段历史回填 + 自适应翻页管理
+
+    回填进度按公众号分别记录（state['accounts'][name]['completed_stages']），
+    每个公众号独立推进自己的阶段；旧版全局 completed_stages 仅作为尚无记录的公众号的初始进度。
+    """
 
     def __init__(self, config: Dict):
         crawler_cfg = config or {}
@@ -32,6 +40,17 @@ class BackfillManager:
         self.adaptive_base_daily = crawler_cfg.get('adaptive_base_daily_posts', 2)
         self.adaptive_min_pages = crawler_cfg.get('adaptive_min_pages', 5)
         self.stats_file = 'data/runtime/max_pages_stats.json'
+        # 发文节奏模型：按星期几的推送频率 + 置信余量预测越过下界的页数（历史不足时回退到原估算）
+        self.posting_model_enabled = crawler_cfg.get('posting_model_enabled', False)
+        self.posting_alpha = float(crawler_cfg.get('posting_model_alpha', 0.3))
+        self.posting_z = float(crawler_cfg.get('posting_model_confidence_z', 1.28))
+        self.posting_min_days = int(crawler_cfg.get('posting_model_min_history_days', 14))
+        self.posting_history = PostingHistoryStore(
+            crawler_cfg.get('posting_model_file', 'data/runtime/posting_model.json'),
+            history_days=int(crawler_cfg.get('posting_model_history_days', 180))
+        ) if self.posting_model_enabled else None
+        # 多账号并行时保护统计更新
+        self._lock = threading.Lock()
 
         # 状态容器
         self.state: Dict = {}
@@ -50,11 +69,20 @@ class BackfillManager:
         except Exception:
             self.state = {}
 
+    @staticmethod
+    def _atomic_dump(path: str, data: Dict):
+        """先写临时文件再替换，进程中途退出时不会留下写了一半的状态文件"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_file = path + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, path)
+
     def _save_state(self):
-        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
         try:
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(self.state, f, ensure_ascii=False, indent=2)
+            self._atomic_dump(self.state_file, self.state)
         except Exception as e:
             print(f"⚠️ 写入回填状态文件失败: {e}")
 
@@ -69,50 +97,91 @@ class BackfillManager:
             self.stats = {}
 
     def _save_stats(self):
-        os.makedirs(os.path.dirname(self.stats_file), exist_ok=True)
         try:
-            with open(self.stats_file, 'w', encoding='utf-8') as f:
-                json.dump(self.stats, f, ensure_ascii=False, indent=2)
+            self._atomic_dump(self.stats_file, self.stats)
         except Exception as e:
             print(f"⚠️ 写入自适应统计文件失败: {e}")
 
     # --------------- stage decision ---------------
-    def decide_stage(self) -> Optional[BackfillStageInfo]:
+    def _stage_uppers(self) -> List[int]:
+        """各阶段的上界天数（递增，最后一个等于 days_back）；分段回填不生效时为空"""
         if not self.enabled:
-            return None
+            return []
         if self.target_days < self.min_threshold:
-            return None
+            return []
         if not self.stages:
-            return None
+            return []
         stages = sorted({int(s) for s in self.stages if isinstance(s, int) and s > 0})
         stages = [s for s in stages if s <= self.target_days]
         if not stages:
-            return None
+            return []
         if stages[-1] != self.target_days:
             stages.append(self.target_days)
-        completed: List[int] = self.state.get('completed_stages', [])
+        return stages
+
+    def is_active(self) -> bool:
+        return bool(self._stage_uppers())
+
+    def completed_stages(self, account: str = None) -> List[int]:
+        """公众号已完成的阶段；无记录时继承旧版全局 completed_stages"""
+        legacy: List[int] = self.state.get('completed_stages', [])
+        if account is None:
+            return legacy
+        acc_state = self.state.get('accounts', {}).get(account)
+        return acc_state['completed_stages'] if acc_state else list(legacy)
+
+    def decide_stage(self, account: str = None) -> Optional[BackfillStageInfo]:
+        """返回公众号（None 为全局）第一个未完成的阶段，全部完成或未启用时返回 None"""
+        stages = self._stage_uppers()
+        with self._lock:
+            completed = self.completed_stages(account)
         for idx, upper in enumerate(stages):
             if upper not in completed:
                 lower = 0 if idx == 0 else stages[idx-1]
                 return BackfillStageInfo(lower, upper, idx + 1, len(stages))
         return None
 
-    def mark_completed(self, stage: BackfillStageInfo):
-        completed: List[int] = self.state.get('completed_stages', [])
-        if stage.upper_days not in completed:
-            completed.append(stage.upper_days)
-            completed = sorted(set(completed))
-            self.state['completed_stages'] = completed
+    def mark_completed(self, stage: BackfillStageInfo, account: str = None):
+        """标记公众号（None 为全局）完成某阶段"""
+        with self._lock:
+            completed = list(self.completed_stages(account))
+            if stage.upper_days in completed:
+                return
+            completed = sorted(set(completed + [stage.upper_days]))
+            now_str = datetime.now(BEIJING_TZ).strftime('%Y-%m-%d %H:%M:%S')
+            if account is None:
+                self.state['completed_stages'] = completed
+            else:
+                self.state.setdefault('accounts', {})[account] = {
+                    'completed_stages': completed,
+                    'last_run_time': now_str,
+                }
             self.state['target_days_back'] = self.target_days
-            self.state['last_run_time'] = datetime.now(BEIJING_TZ).strftime('%Y-%m-%d %H:%M:%S')
+            self.state['last_run_time'] = now_str
             self._save_state()
 
     # --------------- adaptive max pages ---------------
+    def account_stats(self, account: str) -> Dict:
+        """
+        公众号的自适应统计；一页列表都没取到的记录不含任何信息
+        （旧版本会把列表请求失败的抓取记为 0 篇），视为无记录
+        """
+        acc_stat = self.stats.get(account) or {}
+        return acc_stat if acc_stat.get('last_used_pages') else {}
+
     def decide_max_pages(self, account: str, stage: BackfillStageInfo, articles_per_page: int) -> int:
         if not self.adaptive_enabled or not stage:
             return 0
+        if self.posting_history:
+            # 列表总是从最新开始翻，需越过的是阶段上界对应的那一天（更新的阶段同样要翻过）
+            pages_est = self.posting_history.predict_pages(
+                account, stage.upper_days, articles_per_page,
+                alpha=self.posting_alpha, z=self.posting_z, min_days=self.posting_min_days
+            )
+            if pages_est:
+                return min(self.adaptive_hard_cap, max(self.adaptive_min_pages, pages_est))
         span_days = stage.upper_days - stage.lower_days
-        acc_stat = self.stats.get(account, {})
+        acc_stat = self.account_stats(account)
         daily_avg = acc_stat.get('recent_avg_daily', self.adaptive_base_daily)
         pages_est = int((daily_avg * span_days) / max(1, articles_per_page) + 0.999)
         pages_est = int(pages_est * 1.2) if pages_est > 0 else self.adaptive_min_pages
@@ -136,14 +205,21 @@ class BackfillManager:
         span_days = stage.upper_days - stage.lower_days
         recent_avg = effective_articles / span_days if span_days > 0 else effective_articles
         last_ratio = (last_page_effective / last_page_total) if last_page_total > 0 else 0.0
-        self.stats[account] = {
-            'recent_avg_daily': round(recent_avg, 3),
-            'last_page_effective_ratio': round(last_ratio, 3),
-            'last_used_pages': used_pages,
-            'last_est_pages': est_pages,
-            'ts': datetime.now(BEIJING_TZ).strftime('%Y-%m-%d %H:%M:%S')
-        }
-        self._save_stats()
+        with self._lock:
+            self.stats[account] = {
+                'recent_avg_daily': round(recent_avg, 3),
+                'last_page_effective_ratio': round(last_ratio, 3),
+                'last_used_pages': used_pages,
+                'last_est_pages': est_pages,
+                'ts': datetime.now(BEIJING_TZ).strftime('%Y-%m-%d %H:%M:%S')
+            }
+            self._save_stats()
+
+    def record_listing(self, account: str, pushes: Dict[int, int], crawl_started_at: float):
+        """记录一次完整抓取看到的推送（从最新一直到最旧一条均已连续翻过），用于拟合发文节奏模型"""
+        if not self.posting_history or not pushes:
+            return
+        self.posting_history.record(account, list(pushes.items()), min(pushes), crawl_started_at)
 
     # --------------- time bounds ---------------
     def compute_bounds(self, stage: BackfillStageInfo) -> Tuple[datetime, datetime]:
@@ -0,0 +1,79 @@
+"""
+基于本地凭证代理服务（src/config/credential.py）的凭证提供者：
+多个爬取进程从同一个 broker 租用凭证，无需各自运行 mitmproxy 抓包
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from src.config.credential import BrokerClient
+from src.core.credential_pipeline import CredentialProvider
+from src.core.credential_store import biz_from_url
+
+
+class BrokerCredentialProvider(CredentialProvider):
+    """
+    capture：向 broker 租用目标 biz 的最新凭证，暂无时轮询等待（由 broker 侧抓包补充）
+    report_invalid：worker 遇到 ret=-3 时通知 broker 使该凭证失效（附带 key + generation，租约过期后仍然有效）
+    recapture：通知 broker 当前凭证已失效，并等待出现比它更新的版本；
+    爬取中途 key 过期同样经由 recapture 获取（handles_rekey），不在本进程启动抓包、与 broker 侧的代理争用
+    """
+
+    POLL_INTERVAL = 2.0
+    handles_rekey = True
+
+    def __init__(self, crawler_config: dict, client: BrokerClient = None):
+        self.crawler_config = crawler_config or {}
+        self.client = client or BrokerClient(self.crawler_config.get('credential_broker_url') or None)
+        self.lease_ttl = float(self.crawler_config.get('credential_broker_lease_ttl_sec', 900))
+        self.wait_sec = float(self.crawler_config.get('credential_broker_wait_sec', 120))
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # 公众号名称 -> 当前租约
+        self._leases: Dict[str, Dict] = {}
+
+    def _lease(self, target: dict, min_generation: int = 0) -> Optional[dict]:
+        name = target.get('name', '')
+        biz = biz_from_url(target.get('url'))
+        deadline = time.time() + self.wait_sec
+        while True:
+            lease = self.client.lease(biz=biz, worker=name, ttl=self.lease_ttl, min_generation=min_generation)
+            if lease:
+                with self._lock:
+                    self._leases[name] = lease
+                self.logger.info(f"🔐 '{name}' 已从凭证代理租用凭证 (generation {lease['generation']})")
+                return dict(lease['auth_info'])
+            if time.time() >= deadline:
+                self.logger.error(f"❌ '{name}' {int(self.wait_sec)}s 内凭证代理中没有可用凭证")
+                return None
+            time.sleep(self.POLL_INTERVAL)
+
+    def capture(self, target: dict) -> Optional[dict]:
+        return self._lease(target)
+
+    def recapture(self, target: dict) -> Optional[dict]:
+        self._invalidate(target, reason="key_expired")
+        with self._lock:
+            lease = self._leases.get(target.get('name', ''))
+        return self._lease(target, min_generation=lease['generation'] if lease else 0)
+
+    def report_invalid(self, target: dict, auth_info: dict):
+        self._invalidate(target, reason="ret=-3")
+
+    def _invalidate(self, target: dict, reason: str):
+        """每份租约只报告一次（Cookie 验证失败时 report_invalid 之后紧接着 recapture）"""
+        with self._lock:
+            lease = self._leases.get(target.get('name', ''))
+            if not lease or lease.get('reported'):
+                return
+            lease['reported'] = True
+        self.client.invalidate(lease['lease_id'], reason=reason,
+                               key=lease.get('key'), generation=lease.get('generation'))
+
+    def close(self):
+        with self._lock:
+            leases = list(self._leases.values())
+            self._leases.clear()
+        for lease in leases:
+            self.client.release(lease['lease_id'])
@@ -0,0 +1,154 @@
+"""
+基于 mitmproxy + 微信PC版UI自动化 的凭证提供者
+"""
+import logging
+import time
+
+from src.proxy.read_cookie import ReadCookie, CAPTURE_LOCK
+from src.proxy.capture_daemon import CaptureDaemon
+from src.proxy.proxy_manager import ProxyManager
+from src.core.credential_store import biz_from_url
+from src.ui.excel_auto_crawler import ExcelAutoCrawler
+from src.ui.wechat_browser_automation import WeChatBrowserAutomation, UI_AUTOMATION_AVAILABLE
+from src.core.credential_pipeline import CredentialProvider
+
+
+class MitmCredentialProvider(CredentialProvider):
+    """
+    原 AutomatedCrawler 步骤1-4 的抓包流程：
+    启动 mitmproxy 抓取器 -> UI 自动化打开文章 -> 等待并解析 Cookie -> 停止抓取器
+    所有抓包操作串行持有 CAPTURE_LOCK（抓包器与微信UI均为单例资源）
+    启用 capture_daemon_enabled 时 mitmdump 在整个运行期间常驻，每个公众号只 arm/disarm
+    """
+
+    def __init__(self, crawler_config: dict):
+        self.logger = logging.getLogger()
+        self.crawler_config = crawler_config or {}
+        self.cookie_wait_timeout = self.crawler_config.get('cookie_wait_timeout', 120)
+        self.daemon = None
+        if self.crawler_config.get('capture_daemon_enabled', False):
+            self.daemon = CaptureDaemon(proxy_manager=ProxyManager())
+
+    def _new_reader(self) -> ReadCookie:
+        return ReadCookie(daemon=self.daemon)
+
+    def capture(self, target: dict):
+        """
+        步骤1-4：启动抓包器、UI自动化打开文章、等待并解析 Cookie、停止抓包器
+        :return: 认证信息字典，失败返回 None
+        """
+        with CAPTURE_LOCK:
+            # 为每个公众号创建独立的Cookie抓取器
+            cookie_reader = None
+            try:
+                # 步骤1: 为每个公众号创建独立的Cookie抓取器
+                self.logger.info(f"[步骤 1/5] 为 '{target['name']}' 创建独立的 Cookie 抓取器...")
+                cookie_reader = self._new_reader()  # 每个公众号独立创建，会删除旧文件
+
+                if not cookie_reader.start_cookie_extractor(biz=biz_from_url(target.get('url'))):
+                    self.logger.error(f"❌ 公众号 '{target['name']}' Cookie 抓取器启动失败，跳过此公众号")
+                    return None
+                self.logger.info("✅ Cookie 抓取器已在后台运行。")
+
+                # 步骤2: 运行 UI 自动化触发抓取
+                self.logger.info(f"[步骤 2/5] 为 '{target['name']}' 启动 UI 自动化...")
+                try:
+                    ui_crawler = ExcelAutoCrawler()
+                    # 直接传递当前公众号的URL，并传递cookie_reader以启用智能刷新停止
+                    success = ui_crawler.automation.send_and_open_latest_link(target['url'], cookie_reader=cookie_reader)
+                    if not success:
+                        self.logger.error(f"❌ 公众号 '{target['name']}' UI 自动化触发失败，跳过此公众号")
+                        cookie_reader.stop_cookie_extractor()
+                        return None
+                except Exception as e:
+                    self.logger.error(f"❌ 公众号 '{target['name']}' UI 自动化过程中发生错误: {e}")
+                    cookie_reader.stop_cookie_extractor()
+                    return None
+                self.logger.info("✅ UI 自动化已成功触发链接打开。")
+
+                # 步骤3: 等待并验证 Cookie
+                self.logger.info(f"[步骤 3/5] 等待 '{target['name']}' 的 Cookie 数据...")
+                if not cookie_reader.wait_for_new_cookie(timeout=self.cookie_wait_timeout):
+                    self.logger.error(f"❌ 公众号 '{target['name']}' 等待 Cookie 超时，跳过此公众号")
+                    cookie_reader.stop_cookie_extractor()
+                    return None
+
+                # 验证cookie是否有效
+                auth_info = cookie_reader.get_latest_cookies()
+                if not auth_info:
+                    self.logger.error(f"❌ 公众号 '{target['name']}' Cookie 解析失败")
+                    self.logger.error("💡 可能的原因:")
+                    self.logger.error("   1. mitmproxy 没有成功抓取到微信请求")
+                    self.logger.error("   2. 微信内置浏览器没有正确打开链接")
+                    self.logger.error("   3. 网络连接问题或代理设置问题")
+                    self.logger.error("💡 建议:")
+                    self.logger.error("   1. 检查微信是否正常打开了文章链接")
+                    self.logger.error("   2. 手动在微信中刷新文章页面")
+                    self.logger.error("   3. 确保网络连接正常")
+                    cookie_reader.stop_cookie_extractor()
+                    return None
+                self.logger.info("✅ 成功获取并验证了新的 Cookie。")
+
+                # 步骤4: 停止 mitmproxy 抓取器
+                self.logger.info(f"[步骤 4/5] 停止 '{target['name']}' 的 Cookie 抓取器...")
+                cookie_reader.stop_cookie_extractor()
+                if not self.daemon:
+                    time.sleep(3)  # 等待代理完全关闭
+                self.logger.info("✅ Cookie 抓取器已停止，系统代理已恢复。")
+                return auth_info
+
+            except Exception as e:
+                self.logger.error(f"❌ 处理公众号 '{target['name']}' 时发生错误: {e}")
+                # 确保停止抓取器
+                if cookie_reader:
+                    try:
+                        cookie_reader.stop_cookie_extractor()
+                    except:
+                        pass
+                return None
+
+    def recapture(self, target: dict):
+        """Cookie 验证失败（ret=-3）时，不重复粘贴链接，仅刷新已打开的文章页面以重新抓包"""
+        with CAPTURE_LOCK:
+            # 重新抓取Cookie（仅启动抓取器，不重复粘贴点击）
+            self.logger.info("🔄 重新启动Cookie抓取器...")
+            fresh_cookie_reader = self._new_reader()
+            if not fresh_cookie_reader.start_cookie_extractor(biz=biz_from_url(target.get('url'))):
+                self.logger.error("❌ 重新启动Cookie抓取器失败")
+                return None
+
+            # 仅刷新当前文章页面
+            try:
+                if not UI_AUTOMATION_AVAILABLE:
+                    self.logger.error("❌ UI自动化不可用，无法执行刷新")
+                else:
+                    self.logger.info("🔁 不重新粘贴链接，直接刷新已打开的文章页面以触发新请求…")
+                    refresher = WeChatBrowserAutomation()
+                    # 刷新次数适当增加，提高触发概率
+                    refresher.auto_refresh_browser(refresh_count=self.crawler_config.get('refresh_count', 3),
+                                                   refresh_delay=self.crawler_config.get('refresh_delay', 3.0),
+                                                   cookie_reader=fresh_cookie_reader)
+            except Exception as e:
+                self.logger.warning(f"刷新文章页面时出错: {e}")
+
+            # 等待新Cookie
+            if not fresh_cookie_reader.wait_for_new_cookie(timeout=self.cookie_wait_timeout):
+                self.logger.error("❌ 重新等待Cookie超时")
+                fresh_cookie_reader.stop_cookie_extractor()
+                return None
+
+            # 获取新的认证信息
+            auth_info = fresh_cookie_reader.get_latest_cookies()
+            fresh_cookie_reader.stop_cookie_extractor()
+            if not self.daemon:
+                time.sleep(3)
+
+            if not auth_info:
+                self.logger.error("❌ 重新获取Cookie失败")
+                return None
+            return auth_info
+
+    def close(self):
+        """运行结束时停止常驻抓包守护进程"""
+        if self.daemon:
+            self.daemon.stop()
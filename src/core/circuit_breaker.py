@@ -0,0 +1,170 @@
+"""
+验证码熔断器：按微信用户会话(uin)熔断，冷却期内暂停所有使用该会话的抓取
+
+- closed：正常放行
+- open：某个账号遇到验证码后打开，冷却期内所有使用同一 uin 的 spider 停止请求，
+  剩余工作（公众号 + 恢复位置）放入 ParkedWorkQueue
+- half_open：冷却期结束后只放行一个探测者（持有探测权的 spider），
+  其下一次请求成功则关闭熔断，再次遇到验证码则重新打开并加倍冷却时间
+
+冷却时长按 uin 学习并持久化：探测成功后以本次冷却时长的 0.75 倍作为下次起点，失败则加倍。
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CaptchaCircuitBreaker:
+    """线程安全，由 AutomatedCrawler 创建并在所有 spider 间共享"""
+
+    def __init__(self, config: Dict = None):
+        config = config or {}
+        self.enabled = config.get('captcha_breaker_enabled', False)
+        self.min_cooldown = float(config.get('captcha_breaker_min_cooldown_sec', 300))
+        self.max_cooldown = float(config.get('captcha_breaker_max_cooldown_sec', 3600))
+        self.state_file = config.get('captcha_breaker_state_file', 'data/runtime/captcha_breaker.json')
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # key -> {state, opened_at, cooldown, probe_owner}
+        self._circuits: Dict[str, Dict] = {}
+        self._learned: Dict[str, float] = {}
+        if self.enabled:
+            self._load()
+
+    # --------------- persistence ---------------
+    def _load(self):
+        try:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    self._learned = json.load(f).get('cooldowns', {})
+        except Exception:
+            self._learned = {}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+            tmp_file = self.state_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'cooldowns': self._learned}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            self.logger.warning(f"⚠️ 写入熔断状态文件失败: {e}")
+
+    def _clamp(self, cooldown: float) -> float:
+        return max(self.min_cooldown, min(self.max_cooldown, cooldown))
+
+    # --------------- 状态查询 ---------------
+    def state(self, key: str) -> str:
+        with self._lock:
+            circuit = self._circuits.get(key)
+            return circuit['state'] if circuit else CLOSED
+
+    def wait_time(self, key: str) -> float:
+        """距离可以探测还需等待的秒数（未熔断时为 0）"""
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if not circuit or circuit['state'] != OPEN:
+                return 0.0
+            return max(0.0, circuit['opened_at'] + circuit['cooldown'] - time.time())
+
+    def allow(self, key: str, owner: str) -> bool:
+        """
+        owner 是否可以用该会话发出请求
+        冷却结束后第一个询问的 owner 获得探测权，在其报告结果前其他 owner 一律不放行
+        """
+        if not self.enabled or not key:
+            return True
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if not circuit or circuit['state'] == CLOSED:
+                return True
+            if circuit['state'] == OPEN:
+                if time.time() < circuit['opened_at'] + circuit['cooldown']:
+                    return False
+                circuit['state'] = HALF_OPEN
+                circuit['probe_owner'] = owner
+                self.logger.info(f"🔌 熔断半开：{owner} 获得会话 {key} 的探测权")
+                return True
+            return circuit.get('probe_owner') == owner
+
+    # --------------- 结果反馈 ---------------
+    def record_captcha(self, key: str):
+        """遇到验证码：打开熔断（半开探测失败时冷却加倍）"""
+        if not self.enabled or not key:
+            return
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if circuit and circuit['state'] == HALF_OPEN:
+                cooldown = self._clamp(circuit['cooldown'] * 2)
+            elif circuit and circuit['state'] == OPEN:
+                return
+            else:
+                cooldown = self._clamp(self._learned.get(key, self.min_cooldown))
+            self._circuits[key] = {'state': OPEN, 'opened_at': time.time(), 'cooldown': cooldown, 'probe_owner': None}
+            self._learned[key] = cooldown
+            self._save()
+        self.logger.warning(f"🔌 会话 {key} 遇到验证码，熔断 {int(cooldown)} 秒")
+
+    def record_success(self, key: str):
+        """请求正常：半开状态下关闭熔断，并记住这次足够的冷却时长"""
+        if not self.enabled or not key:
+            return
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if not circuit or circuit['state'] != HALF_OPEN:
+                return
+            self._learned[key] = self._clamp(circuit['cooldown'] * 0.75)
+            del self._circuits[key]
+            self._save()
+        self.logger.info(f"🔌 会话 {key} 探测成功，熔断关闭")
+
+    def release_probe(self, key: str, owner: str):
+        """探测者未发出请求就结束时交还探测权，下一个询问者可立即接手探测"""
+        if not self.enabled or not key:
+            return
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if circuit and circuit['state'] == HALF_OPEN and circuit.get('probe_owner') == owner:
+                circuit['state'] = OPEN
+                circuit['opened_at'] = time.time() - circuit['cooldown']
+                circuit['probe_owner'] = None
+
+
+class ParkedWorkQueue:
+    """
+    因熔断暂停的工作：{target, index, auth_info, key, resume: {page, article_index}}
+    熔断可探测后按入队顺序取出继续
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: List[Dict] = []
+
+    def park(self, item: Dict):
+        with self._lock:
+            self._items.append(item)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def pop_ready(self, breaker: CaptchaCircuitBreaker) -> Optional[Dict]:
+        """取出一个熔断已不再阻塞（冷却期已过）的工作项"""
+        with self._lock:
+            for i, item in enumerate(self._items):
+                if breaker.wait_time(item['key']) <= 0:
+                    return self._items.pop(i)
+        return None
+
+    def next_wait(self, breaker: CaptchaCircuitBreaker) -> float:
+        """最早可恢复的工作项还需等待的秒数"""
+        with self._lock:
+            keys = [item['key'] for item in self._items]
+        return min((breaker.wait_time(k) for k in keys), default=0.0)
@@ -0,0 +1,183 @@
+"""
+爬取运行日志（crash-safe）：只追加的 JSONL，记录每个公众号的翻页游标、已处理文章与完成状态
+
+进程中途退出（重启、mitmproxy 崩溃、数据库异常）后，下一次运行回放日志：
+- 已完成的公众号直接跳过（数据已入库/落盘）
+- 未完成的公众号从最后记录的页/文章处继续，已处理过的文章按 key 跳过
+
+记录格式（每行一条）：
+    {"type": "run_start", "run_key": ..., "t": ...}
+    {"type": "cursor", "account": ..., "page": 3, "article_index": 2, "t": ...}
+    {"type": "article", "account": ..., "key": url, "t": ...}
+    {"type": "done", "account": ..., "t": ...}
+    {"type": "run_end", "t": ...}
+
+写入在内存中攒批，每 batch_size 条或每 fsync_interval_sec 秒才 write + fsync 一次，
+完成/结束等关键记录立即落盘；崩溃时最多丢失最近一个间隔内的游标，恢复时重做这几篇文章。
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+
+class AccountJournal:
+    """单个公众号的日志句柄，由 spider 在抓取循环中调用"""
+
+    def __init__(self, journal: 'CrawlJournal', account: str, processed: Set[str] = None):
+        self.journal = journal
+        self.account = account
+        self.processed: Set[str] = set(processed or ())
+
+    def is_processed(self, key: str) -> bool:
+        return bool(key) and key in self.processed
+
+    def cursor(self, page: int, article_index: int):
+        """即将处理 page 页第 article_index 篇（之前的文章已处理完）"""
+        self.journal.append({'type': 'cursor', 'account': self.account,
+                             'page': page, 'article_index': article_index})
+
+    def processed_article(self, key: str):
+        if not key:
+            return
+        self.processed.add(key)
+        self.journal.append({'type': 'article', 'account': self.account, 'key': key})
+
+    def done(self):
+        self.journal.append({'type': 'done', 'account': self.account}, sync=True)
+
+
+class CrawlJournal:
+    """线程安全，由 AutomatedCrawler 创建，在并行 worker 间共享"""
+
+    def __init__(self, config: Dict = None):
+        config = config or {}
+        self.enabled = config.get('crawl_journal_enabled', False)
+        self.path = config.get('crawl_journal_file', 'data/runtime/crawl_journal.jsonl')
+        self.batch_size = max(1, int(config.get('crawl_journal_batch_size', 20)))
+        self.fsync_interval = float(config.get('crawl_journal_fsync_interval_sec', 2.0))
+        self.max_age_sec = float(config.get('crawl_journal_max_age_sec', 86400))
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._buffer: List[str] = []
+        self._last_sync = time.time()
+        self._fh = None
+        # 回放得到的公众号状态：name -> {'done', 'page', 'article_index', 'processed'}
+        self.accounts: Dict[str, Dict] = {}
+
+    # --------------- 回放 ---------------
+    @staticmethod
+    def _read_records(path: str) -> List[Dict]:
+        records = []
+        if not os.path.exists(path):
+            return records
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # 崩溃时写了一半的最后一行
+                    continue
+        return records
+
+    @staticmethod
+    def replay(records: List[Dict]) -> Dict[str, Dict]:
+        accounts: Dict[str, Dict] = {}
+        for rec in records:
+            name = rec.get('account')
+            if not name:
+                continue
+            state = accounts.setdefault(name, {'done': False, 'page': 0, 'article_index': 0, 'processed': set()})
+            kind = rec.get('type')
+            if kind == 'cursor':
+                state['page'] = int(rec.get('page', 0))
+                state['article_index'] = int(rec.get('article_index', 0))
+            elif kind == 'article':
+                state['processed'].add(rec.get('key'))
+            elif kind == 'done':
+                state['done'] = True
+        return accounts
+
+    def begin(self, run_key: str) -> Dict[str, Dict]:
+        """
+        开始一次运行：上一次同一 run_key 的运行未正常结束且未过期时继续追加并返回回放状态，
+        否则清空日志重新开始
+        """
+        if not self.enabled:
+            return {}
+        records = self._read_records(self.path)
+        start = next((r for r in reversed(records) if r.get('type') == 'run_start'), None)
+        resumable = (
+            start is not None
+            and start.get('run_key') == run_key
+            and records[-1].get('type') != 'run_end'
+            and time.time() - float(start.get('t', 0)) <= self.max_age_sec
+        )
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        if resumable:
+            self.accounts = self.replay(records[records.index(start):])
+            self._fh = open(self.path, 'a', encoding='utf-8')
+            self.append({'type': 'run_resume', 'run_key': run_key}, sync=True)
+            done = sum(1 for s in self.accounts.values() if s['done'])
+            self.logger.info(f"📒 发现未完成的运行日志：{done} 个公众号已完成，"
+                             f"{len(self.accounts) - done} 个将从中断处继续")
+        else:
+            self.accounts = {}
+            self._fh = open(self.path, 'w', encoding='utf-8')
+            self.append({'type': 'run_start', 'run_key': run_key}, sync=True)
+        return self.accounts
+
+    # --------------- 查询 ---------------
+    def is_done(self, account: str) -> bool:
+        state = self.accounts.get(account)
+        return bool(state and state['done'])
+
+    def resume_point(self, account: str) -> Optional[Dict]:
+        state = self.accounts.get(account)
+        if not state or state['done'] or (state['page'] == 0 and state['article_index'] == 0):
+            return None
+        return {'page': state['page'], 'article_index': state['article_index']}
+
+    def account(self, name: str) -> Optional[AccountJournal]:
+        if not self.enabled:
+            return None
+        state = self.accounts.get(name) or {}
+        return AccountJournal(self, name, state.get('processed'))
+
+    # --------------- 写入 ---------------
+    def append(self, record: Dict, sync: bool = False):
+        if not self.enabled or self._fh is None:
+            return
+        record = {**record, 't': time.time()}
+        with self._lock:
+            self._buffer.append(json.dumps(record, ensure_ascii=False))
+            if sync or len(self._buffer) >= self.batch_size or time.time() - self._last_sync >= self.fsync_interval:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer or self._fh is None:
+            return
+        try:
+            self._fh.write('\n'.join(self._buffer) + '\n')
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+        except Exception as e:
+            self.logger.warning(f"⚠️ 写入运行日志失败: {e}")
+        self._buffer = []
+        self._last_sync = time.time()
+
+    def end(self):
+        """本次运行所有公众号均已完成：写入 run_end，下次运行重新开始"""
+        self.append({'type': 'run_end'}, sync=True)
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
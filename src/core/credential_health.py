@@ -0,0 +1,142 @@
+"""
+凭证健康度模型：跟踪当前 x-wechat-key 的年龄与成功率，预测过期时间，
+在页面间延迟等空闲窗口内提前刷新 key，而不是等文章返回阅读量 0 后才被动刷新
+"""
+import logging
+import time
+from collections import deque
+from typing import Optional
+
+from src.core.credential_store import CredentialStore
+
+
+class CredentialHealth:
+    """
+    单个爬取实例当前凭证的健康度
+
+    - 预期存活时长：凭证缓存中历史观测值的中位数（被动失效时由 CredentialStore 学习），
+      无观测时使用 credential_default_lifetime_sec
+    - 剩余寿命 = 预期存活时长 - 年龄；最近窗口内出现 key_expired 视为已失效
+    - refresh_due(next_busy_sec)：若剩余寿命撑不过下一段连续请求（加安全余量），应在当前空闲窗口刷新
+    - 主动刷新失败后按 proactive_rekey_retry_sec 退避（连续失败翻倍，上限 min_rekey_interval_sec），
+      且只有在上次刷新尝试之后新出现的失效才会再次触发
+    未启用时各方法为空操作，refresh_due 恒为 False。
+    """
+
+    # 成功率统计窗口（最近多少次文章请求）
+    WINDOW = 20
+    # 两次写回 last_ok_at 的最短间隔（秒）
+    MARK_OK_EVERY_SEC = 60
+    # 页面耗时的 EWMA 平滑系数
+    BUSY_ALPHA = 0.3
+
+    def __init__(self, config: dict, auth_info: dict = None):
+        config = config or {}
+        self.enabled = config.get('proactive_rekey_enabled', False)
+        self.margin_sec = float(config.get('proactive_rekey_margin_sec', 120))
+        self.retry_sec = float(config.get('proactive_rekey_retry_sec', 300))
+        self.max_retry_sec = max(self.retry_sec, float(config.get('min_rekey_interval_sec', 1500)))
+        self.default_lifetime = float(config.get('credential_default_lifetime_sec', 1800))
+        self.logger = logging.getLogger(__name__)
+        self.store: Optional[CredentialStore] = None
+        if self.enabled:
+            self.store = CredentialStore.shared(
+                config.get('credential_cache_file', 'data/runtime/credential_cache.json'),
+                max_age_sec=config.get('credential_cache_max_age_sec', 7200)
+            )
+        self.auth_info = None
+        self.captured_at = time.time()
+        self.outcomes = deque(maxlen=self.WINDOW)
+        self.busy_sec: Optional[float] = None
+        self._last_mark_ok = 0.0
+        self._last_expired_at = 0.0
+        self._last_attempt_at = 0.0
+        self._failed_attempts = 0
+        if auth_info:
+            self.track(auth_info)
+
+    def track(self, auth_info: dict, fresh: bool = False):
+        """开始跟踪一份凭证；fresh=True 表示刚抓到（写入缓存并从 0 计龄）"""
+        self.auth_info = auth_info
+        self.outcomes.clear()
+        self.captured_at = time.time()
+        if not self.enabled:
+            return
+        entry = None if fresh else self.store.find(auth_info)
+        if entry:
+            # 复用的缓存凭证按原抓取时间计龄
+            self.captured_at = entry['captured_at']
+        else:
+            self.store.put(auth_info, source='rekey' if fresh else 'capture')
+
+    # --------------- 观测 ---------------
+    def expected_lifetime(self) -> float:
+        learned = self.store.expected_lifetime() if self.store else None
+        return learned or self.default_lifetime
+
+    def age(self) -> float:
+        return time.time() - self.captured_at
+
+    def seconds_left(self) -> float:
+        """预测剩余寿命（秒）"""
+        return self.expected_lifetime() - self.age()
+
+    def success_rate(self) -> float:
+        if not self.outcomes:
+            return 1.0
+        return sum(self.outcomes) / len(self.outcomes)
+
+    def on_ok(self):
+        if not self.enabled:
+            return
+        self.outcomes.append(1)
+        now = time.time()
+        if now - self._last_mark_ok >= self.MARK_OK_EVERY_SEC:
+            self._last_mark_ok = now
+            self.store.mark_ok(self.auth_info)
+
+    def on_expired(self):
+        """出现 key_expired / ret=-3：记录失效，供缓存学习存活时长"""
+        if not self.enabled:
+            return
+        self.outcomes.append(0)
+        self._last_expired_at = time.time()
+        self.store.mark_invalid(self.auth_info)
+
+    def on_refresh_attempt(self, ok: bool):
+        """记录一次主动刷新的结果；失败时进入退避"""
+        self._last_attempt_at = time.time()
+        self._failed_attempts = 0 if ok else self._failed_attempts + 1
+
+    def retry_wait(self) -> float:
+        """上次主动刷新失败后，距离允许再次尝试还需等待的秒数"""
+        if not self._failed_attempts:
+            return 0.0
+        backoff = min(self.max_retry_sec, self.retry_sec * 2 ** (self._failed_attempts - 1))
+        return max(0.0, self._last_attempt_at + backoff - time.time())
+
+    def observe_busy(self, seconds: float):
+        """记录一段连续请求（一页）的耗时，用于估计下一个空闲窗口前还需要多久"""
+        if seconds <= 0:
+            return
+        self.busy_sec = seconds if self.busy_sec is None else (
+            self.BUSY_ALPHA * seconds + (1 - self.BUSY_ALPHA) * self.busy_sec)
+
+    # --------------- 决策 ---------------
+    def refresh_due(self, next_busy_sec: float = None) -> bool:
+        """当前空闲窗口内是否应主动刷新 key"""
+        if not self.enabled or not self.auth_info:
+            return False
+        if self.retry_wait() > 0:
+            return False
+        if self.outcomes and self.outcomes[-1] == 0 and self._last_expired_at > self._last_attempt_at:
+            return True
+        busy = next_busy_sec if next_busy_sec is not None else (self.busy_sec or 0)
+        left = self.seconds_left()
+        if left < busy + self.margin_sec:
+            self.logger.info(
+                f"🩺 凭证已使用 {int(self.age())}s，预计剩余 {int(left)}s，"
+                f"不足以撑过下一页（约 {int(busy)}s + 余量 {int(self.margin_sec)}s），安排提前刷新"
+            )
+            return True
+        return False
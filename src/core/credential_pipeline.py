@@ -0,0 +1,144 @@
+"""
+凭证准备流水线：抓包阶段与爬取阶段重叠执行
+
+- CredentialProvider：凭证提供者接口（真实实现为 mitmproxy + 微信UI 抓包，
+  见 src/core/capture_provider.py；测试/离线场景可使用 StaticCredentialProvider）
+- CredentialPipeline：抓包阶段在后台线程中为后续公众号预先准备 auth_info，
+  放入容量为 lookahead 的缓冲区；爬取阶段按目标顺序消费已就绪的凭证
+"""
+import logging
+import queue
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.core.run_metrics import RunMetrics
+
+
+class CredentialProvider:
+    """凭证提供者接口"""
+
+    # 爬取中途刷新 key 时是否改由 recapture 获取（否则 spider 自行启动抓包并操作微信窗口）
+    handles_rekey = False
+
+    def capture(self, target: dict) -> Optional[dict]:
+        """为目标公众号获取认证信息，失败返回 None"""
+        raise NotImplementedError
+
+    def recapture(self, target: dict) -> Optional[dict]:
+        """凭证验证失败后重新获取（默认与 capture 相同）"""
+        return self.capture(target)
+
+    def report_valid(self, target: dict, auth_info: dict):
+        """爬取阶段反馈：凭证可用"""
+        pass
+
+    def report_invalid(self, target: dict, auth_info: dict):
+        """爬取阶段反馈：凭证已失效（ret=-3 等）"""
+        pass
+
+    def close(self):
+        """释放提供者持有的资源"""
+        pass
+
+
+class StaticCredentialProvider(CredentialProvider):
+    """
+    静态凭证提供者：按公众号名称返回预先准备的认证信息
+    用于 Linux 下测试调度器或离线回放，不依赖 mitmproxy/微信UI
+    """
+
+    def __init__(self, credentials: Dict[str, dict] = None, default: dict = None, delay: float = 0.0):
+        self.credentials = credentials or {}
+        self.default = default
+        self.delay = delay
+        self.captured: List[str] = []
+
+    def capture(self, target: dict) -> Optional[dict]:
+        if self.delay:
+            threading.Event().wait(self.delay)
+        self.captured.append(target.get('name', ''))
+        auth_info = self.credentials.get(target.get('name'), self.default)
+        return dict(auth_info) if auth_info else None
+
+
+class CredentialPipeline:
+    """
+    两阶段调度：抓包阶段（生产者线程）领先爬取阶段（消费者）最多 lookahead 个公众号
+
+    迭代产出 (序号, 目标, auth_info)，顺序与 targets 一致；抓包失败时 auth_info 为 None。
+    lookahead <= 0 时不启用后台线程，迭代时同步抓包（与原串行流程一致）。
+    """
+
+    _DONE = object()
+
+    def __init__(self, provider: CredentialProvider, targets: List[dict], lookahead: int = 1,
+                 metrics: Optional[RunMetrics] = None):
+        self.provider = provider
+        self.metrics = metrics or RunMetrics()
+        self.targets = list(targets)
+        self.lookahead = int(lookahead or 0)
+        self.logger = logging.getLogger(__name__)
+        self._buffer: Optional[queue.Queue] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __iter__(self) -> Iterator[Tuple[int, dict, Optional[dict]]]:
+        if self.lookahead <= 0:
+            for index, target in enumerate(self.targets, 1):
+                if self._stop.is_set():
+                    return
+                yield index, target, self._safe_capture(target)
+            return
+
+        self._buffer = queue.Queue(maxsize=self.lookahead)
+        self._thread = threading.Thread(target=self._produce, name="credential-capture", daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                item = self._buffer.get()
+                if item is self._DONE:
+                    return
+                yield item
+        finally:
+            self.close()
+
+    def _safe_capture(self, target: dict) -> Optional[dict]:
+        timer = self.metrics.timer('capture', target.get('name'), outcome='failed')
+        try:
+            auth_info = self.provider.capture(target)
+            if auth_info:
+                timer.outcome = 'ok'
+            return auth_info
+        except Exception as e:
+            self.logger.error(f"❌ 公众号 '{target.get('name')}' 抓包阶段异常: {e}")
+            return None
+        finally:
+            timer.finish()
+
+    def _produce(self):
+        try:
+            for index, target in enumerate(self.targets, 1):
+                if self._stop.is_set():
+                    break
+                auth_info = self._safe_capture(target)
+                if auth_info:
+                    self.logger.info(f"📦 已为 '{target.get('name')}' 准备好凭证，放入预备缓冲区")
+                if not self._put((index, target, auth_info)):
+                    break
+        finally:
+            self._put(self._DONE)
+
+    def _put(self, item) -> bool:
+        # 缓冲区满时阻塞，消费者停止后及时退出
+        while not self._stop.is_set() or item is self._DONE:
+            try:
+                self._buffer.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                if item is self._DONE and self._stop.is_set():
+                    return False
+        return False
+
+    def close(self):
+        """停止抓包阶段（已在进行中的一次抓包会执行完毕）"""
+        self._stop.set()
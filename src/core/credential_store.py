@@ -0,0 +1,377 @@
+"""
+凭证持久化缓存：按 biz + uin 记录抓包得到的认证信息、抓取时间与观测到的有效期，
+供后续公众号/后续运行在凭证仍有效时跳过 mitmproxy + 微信UI 抓包
+
+x-wechat-key、wap_sid2、pass_ticket 属于微信用户会话而非某个公众号，
+因此同一 uin 的凭证还可尝试用于其他公众号（凭证池复用），只替换 biz 相关部分
+"""
+import json
+import os
+import re
+import threading
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+
+from src.core.credential_pipeline import CredentialProvider
+
+
+def credential_uin(auth_info: dict) -> str:
+    """从认证信息中取微信用户标识（x-wechat-uin 请求头）"""
+    headers = (auth_info or {}).get('headers') or {}
+    return headers.get('x-wechat-uin', '') or ''
+
+
+def biz_from_url(url: str) -> Optional[str]:
+    """从文章长链接中解析 __biz 参数（短链接 /s/xxxx 不含 biz，返回 None）"""
+    match = re.search(r'__biz=([^&#]+)', url or '')
+    return match.group(1) if match else None
+
+
+class CredentialStore:
+    """
+    凭证缓存（JSON 文件，原子写入，线程安全）
+
+    entries: "biz|uin" -> {auth_info, biz, uin, captured_at, last_ok_at, invalidated_at}
+    targets: 公众号名称 -> biz（短链接目标在首次抓包后才能得知 biz）
+    lifetimes: 最近观测到的凭证存活时长（秒）
+    reuse: 跨公众号复用组合 -> {ok, fail}，学习哪种替换方式可被接口接受
+    """
+
+    MAX_LIFETIME_SAMPLES = 50
+    # 最后一次有效与发现失效之间的间隔不超过该值（或存活时长的 25%）时才记录存活时长
+    LIFETIME_GAP_SEC = 600
+
+    # 同一进程内按状态文件共享实例，避免多个实例各自写回时互相覆盖
+    _shared: Dict[str, 'CredentialStore'] = {}
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, state_file: str = 'data/runtime/credential_cache.json', max_age_sec: int = 7200) -> 'CredentialStore':
+        with cls._shared_lock:
+            store = cls._shared.get(os.path.abspath(state_file))
+            if store is None:
+                store = cls(state_file, max_age_sec)
+                cls._shared[os.path.abspath(state_file)] = store
+            return store
+
+    def __init__(self, state_file: str = 'data/runtime/credential_cache.json', max_age_sec: int = 7200):
+        self.state_file = state_file
+        self.max_age_sec = max_age_sec
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self.state: Dict = {}
+        self._load()
+
+    # --------------- persistence ---------------
+    def _load(self):
+        try:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    self.state = json.load(f)
+            else:
+                self.state = {}
+        except Exception:
+            self.state = {}
+        self.state.setdefault('entries', {})
+        self.state.setdefault('targets', {})
+        self.state.setdefault('lifetimes', [])
+        self.state.setdefault('reuse', {})
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+            tmp_file = self.state_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            self.logger.warning(f"⚠️ 写入凭证缓存文件失败: {e}")
+
+    @staticmethod
+    def _key(biz: str, uin: str) -> str:
+        return f"{biz}|{uin}"
+
+    # --------------- lookup ---------------
+    def biz_for_target(self, target: dict) -> Optional[str]:
+        """目标公众号对应的 biz：优先从链接解析，其次使用历史抓包记录"""
+        with self._lock:
+            return biz_from_url(target.get('url', '')) or self.state['targets'].get(target.get('name', ''))
+
+    def get(self, biz: str) -> Optional[Dict]:
+        """取该 biz 下最新、未失效且未超过最大缓存时长的凭证记录"""
+        if not biz:
+            return None
+        now = time.time()
+        with self._lock:
+            candidates = [
+                e for e in self.state['entries'].values()
+                if e.get('biz') == biz and not e.get('invalidated_at')
+                and now - e.get('captured_at', 0) < self.max_age_sec
+            ]
+            if not candidates:
+                return None
+            return dict(max(candidates, key=lambda e: e.get('captured_at', 0)))
+
+    def find(self, auth_info: dict) -> Optional[Dict]:
+        """取与该认证信息对应（同 biz、uin 且 appmsg_token 一致）的缓存记录"""
+        biz = (auth_info or {}).get('biz')
+        if not biz:
+            return None
+        with self._lock:
+            entry = self.state['entries'].get(self._key(biz, credential_uin(auth_info)))
+            if not entry or entry['auth_info'].get('appmsg_token') != auth_info.get('appmsg_token'):
+                return None
+            return dict(entry)
+
+    def expected_lifetime(self) -> Optional[float]:
+        """凭证预期存活时长：历史观测值的中位数（无记录时为 None）"""
+        with self._lock:
+            samples = sorted(self.state['lifetimes'])
+        if not samples:
+            return None
+        return float(samples[len(samples) // 2])
+
+    def user_credentials(self, exclude_biz: str = None) -> List[Dict]:
+        """每个 uin 最新的一份未失效凭证（可作为其他公众号的复用来源），按抓取时间倒序"""
+        now = time.time()
+        latest: Dict[str, Dict] = {}
+        with self._lock:
+            for e in self.state['entries'].values():
+                if not e.get('uin') or e.get('invalidated_at') or e.get('biz') == exclude_biz:
+                    continue
+                if now - e.get('captured_at', 0) >= self.max_age_sec:
+                    continue
+                if e['uin'] not in latest or e['captured_at'] > latest[e['uin']]['captured_at']:
+                    latest[e['uin']] = e
+        return sorted((dict(e) for e in latest.values()), key=lambda e: e['captured_at'], reverse=True)
+
+    def last_token_for_biz(self, biz: str, uin: str) -> Optional[str]:
+        """该 biz + uin 最近一次抓到的 appmsg_token（即使已失效，也可用于替换 biz 相关部分）"""
+        with self._lock:
+            entry = self.state['entries'].get(self._key(biz, uin))
+            return entry['auth_info'].get('appmsg_token') if entry else None
+
+    def reuse_stats(self, combo: str) -> Dict:
+        with self._lock:
+            return dict(self.state['reuse'].get(combo, {'ok': 0, 'fail': 0}))
+
+    def record_reuse(self, combo: str, ok: bool):
+        """记录一次跨公众号复用尝试的结果"""
+        with self._lock:
+            stat = self.state['reuse'].setdefault(combo, {'ok': 0, 'fail': 0})
+            stat['ok' if ok else 'fail'] += 1
+            self._save()
+
+    def age(self, entry: Dict) -> float:
+        return time.time() - entry.get('captured_at', time.time())
+
+    # --------------- updates ---------------
+    def put(self, auth_info: dict, target_name: str = None, source: str = 'capture',
+            captured_at: float = None) -> Optional[Dict]:
+        """
+        记录一次新抓到（或复用得到）的凭证
+        :param captured_at: 凭证实际抓取时间；复用其他公众号的凭证时沿用来源凭证的时间，缺省为当前时间
+        """
+        biz = (auth_info or {}).get('biz')
+        if not biz:
+            return None
+        uin = credential_uin(auth_info)
+        now = time.time()
+        entry = {
+            'auth_info': auth_info,
+            'biz': biz,
+            'uin': uin,
+            'captured_at': captured_at or now,
+            'last_ok_at': None,
+            'invalidated_at': None,
+            'source': source,
+        }
+        with self._lock:
+            self.state['entries'][self._key(biz, uin)] = entry
+            if target_name:
+                self.state['targets'][target_name] = biz
+            self._prune(now)
+            self._save()
+        return dict(entry)
+
+    def mark_ok(self, auth_info: dict):
+        """凭证刚刚验证/使用成功"""
+        self._update(auth_info, ok=True)
+
+    def mark_invalid(self, auth_info: dict):
+        """凭证已失效（ret=-3 等），记录一次存活时长观测"""
+        self._update(auth_info, ok=False)
+
+    def _update(self, auth_info: dict, ok: bool):
+        biz = (auth_info or {}).get('biz')
+        if not biz:
+            return
+        key = self._key(biz, credential_uin(auth_info))
+        now = time.time()
+        with self._lock:
+            entry = self.state['entries'].get(key)
+            if not entry or entry['auth_info'].get('appmsg_token') != auth_info.get('appmsg_token'):
+                return
+            if ok:
+                entry['last_ok_at'] = now
+            elif not entry.get('invalidated_at'):
+                entry['invalidated_at'] = now
+                # 真实失效时刻落在 (last_ok_at, invalidated_at] 之间，区间足够窄时才作为一次有效观测
+                last_ok = entry.get('last_ok_at')
+                if last_ok:
+                    lower = last_ok - entry['captured_at']
+                    gap = now - last_ok
+                    if lower > 0 and gap <= max(self.LIFETIME_GAP_SEC, 0.25 * lower):
+                        lifetimes: List[float] = self.state['lifetimes']
+                        lifetimes.append(round(lower + gap / 2, 1))
+                        del lifetimes[:-self.MAX_LIFETIME_SAMPLES]
+            self._save()
+
+    def _prune(self, now: float):
+        expired = [k for k, e in self.state['entries'].items()
+                   if now - e.get('captured_at', 0) >= self.max_age_sec]
+        for k in expired:
+            del self.state['entries'][k]
+
+
+class CachedCredentialProvider(CredentialProvider):
+    """
+    带缓存的凭证提供者：
+    1. 目标 biz 已有缓存凭证且未超过预期有效期 -> 用一次列表探测请求验证，通过则直接复用
+    2. （reuse_enabled）取其他公众号的同一用户会话凭证，替换 biz 相关部分后探测，通过则复用
+    3. 否则回退到内部提供者（mitmproxy + 微信UI）抓包，并写入缓存
+    """
+
+    # 跨公众号复用的替换方式
+    # biz_swap:   仅替换 __biz，沿用来源凭证的 appmsg_token
+    # token_swap: 替换 __biz，并换回目标公众号历史抓到的 appmsg_token
+    REUSE_COMBOS = ('biz_swap', 'token_swap')
+    # 某组合尝试次数达到该值且成功率低于 REUSE_MIN_SUCCESS_RATE 时不再尝试
+    REUSE_MIN_TRIALS = 3
+    REUSE_MIN_SUCCESS_RATE = 0.2
+
+    def __init__(self, inner: CredentialProvider, store: CredentialStore,
+                 probe: Callable[[dict], bool], ttl_margin: float = 0.9, reuse_enabled: bool = False):
+        self.inner = inner
+        self.store = store
+        self.probe = probe
+        self.ttl_margin = ttl_margin
+        self.reuse_enabled = reuse_enabled
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def handles_rekey(self) -> bool:
+        return getattr(self.inner, 'handles_rekey', False)
+
+    def capture(self, target: dict) -> Optional[dict]:
+        auth_info = self._try_cached(target)
+        if auth_info:
+            return auth_info
+        if self.reuse_enabled:
+            auth_info = self._try_pool(target)
+            if auth_info:
+                return auth_info
+        auth_info = self.inner.capture(target)
+        if auth_info:
+            self.store.put(auth_info, target.get('name'))
+        return auth_info
+
+    def recapture(self, target: dict) -> Optional[dict]:
+        auth_info = self.inner.recapture(target)
+        if auth_info:
+            self.store.put(auth_info, target.get('name'))
+        return auth_info
+
+    def report_valid(self, target: dict, auth_info: dict):
+        self.store.mark_ok(auth_info)
+
+    def report_invalid(self, target: dict, auth_info: dict):
+        self.store.mark_invalid(auth_info)
+
+    def close(self):
+        self.inner.close()
+
+    def _expired_by_ttl(self, entry: Dict) -> bool:
+        lifetime = self.store.expected_lifetime()
+        return bool(lifetime and self.store.age(entry) >= lifetime * self.ttl_margin)
+
+    def _safe_probe(self, auth_info: dict) -> bool:
+        try:
+            return bool(self.probe(auth_info))
+        except Exception as e:
+            self.logger.warning(f"⚠️ 缓存凭证探测异常: {e}")
+            return False
+
+    def _reuse_combos(self) -> List[str]:
+        """按历史成功率排序、剔除已证明不可行的复用组合"""
+        combos = []
+        for combo in self.REUSE_COMBOS:
+            stat = self.store.reuse_stats(combo)
+            trials = stat['ok'] + stat['fail']
+            rate = stat['ok'] / trials if trials else 1.0
+            if trials >= self.REUSE_MIN_TRIALS and rate < self.REUSE_MIN_SUCCESS_RATE:
+                continue
+            combos.append((rate, combo))
+        return [c for _, c in sorted(combos, key=lambda x: -x[0])]
+
+    @staticmethod
+    def _build_reused(donor: dict, biz: str, token: Optional[str]) -> dict:
+        auth_info = dict(donor)
+        auth_info['headers'] = dict(donor.get('headers') or {})
+        auth_info['biz'] = biz
+        if token and token != donor.get('appmsg_token'):
+            auth_info['appmsg_token'] = token
+            auth_info['cookie_str'] = re.sub(r'appmsg_token=[^;]*', f'appmsg_token={token}',
+                                             donor.get('cookie_str') or '')
+        return auth_info
+
+    def _try_pool(self, target: dict) -> Optional[dict]:
+        name = target.get('name')
+        biz = self.store.biz_for_target(target)
+        if not biz:
+            self.logger.info(f"🔑 '{name}' 目标 biz 未知（短链接且无历史记录），无法复用凭证池")
+            return None
+        for donor_entry in self.store.user_credentials(exclude_biz=biz):
+            if self._expired_by_ttl(donor_entry):
+                continue
+            donor = donor_entry['auth_info']
+            for combo in self._reuse_combos():
+                token = None
+                if combo == 'token_swap':
+                    token = self.store.last_token_for_biz(biz, donor_entry['uin'])
+                    if not token:
+                        continue
+                candidate = self._build_reused(donor, biz, token)
+                self.logger.info(f"🔑 '{name}' 尝试复用 uin 凭证（来源 biz={donor_entry['biz'][:12]}…，方式 {combo}）")
+                ok = self._safe_probe(candidate)
+                self.store.record_reuse(combo, ok)
+                if ok:
+                    # 沿用来源凭证的抓取时间：复用不会延长 key 的真实寿命
+                    self.store.put(candidate, name, source=f"reuse:{combo}",
+                                   captured_at=donor_entry.get('captured_at'))
+                    self.store.mark_ok(candidate)
+                    self.logger.info(f"✅ '{name}' 复用凭证成功，跳过抓包")
+                    return candidate
+            # 只尝试最新的一个用户会话，避免为单个公众号发出过多探测请求
+            break
+        return None
+
+    def _try_cached(self, target: dict) -> Optional[dict]:
+        name = target.get('name')
+        entry = self.store.get(self.store.biz_for_target(target))
+        if not entry:
+            return None
+        age = self.store.age(entry)
+        if self._expired_by_ttl(entry):
+            self.logger.info(f"🗄️ '{name}' 缓存凭证已 {int(age)}s，超过预期有效期 {int(self.store.expected_lifetime())}s，不再复用")
+            return None
+        auth_info = entry['auth_info']
+        self.logger.info(f"🗄️ '{name}' 命中缓存凭证（{int(age)}s 前抓取），探测是否仍然有效...")
+        if self._safe_probe(auth_info):
+            self.store.mark_ok(auth_info)
+            self.logger.info(f"✅ '{name}' 缓存凭证有效，跳过抓包")
+            return dict(auth_info)
+        self.store.mark_invalid(auth_info)
+        self.logger.info(f"♻️ '{name}' 缓存凭证已失效")
+        return None
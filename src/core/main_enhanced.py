@@ -11,45 +11,35 @@
 
 import os
 import sys
+import argparse
 import logging
 from datetime import datetime
 import traceback
 
-from config import get_crawler_config, get_database_config
+from config import get_crawler_config, get_database_config, get_logging_config
 from src.database.database_manager import DatabaseManager
 from src.core.automated_crawler import AutomatedCrawler
+from src.utils.log_setup import setup_queue_logging
 
 
 def setup_logging() -> logging.Logger:
-    """初始化日志（同时输出到控制台与文件）"""
-    logger = logging.getLogger("wechat_spider_main")
-    logger.setLevel(logging.INFO)
-
-    # 避免重复添加 handler
-    if logger.handlers:
-        return logger
-
-    log_dir = os.path.join(os.getcwd(), 'logs')
-    os.makedirs(log_dir, exist_ok=True)
-    log_filename = os.path.join(log_dir, f"wechat_spider_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
-
-    file_handler = logging.FileHandler(log_filename, encoding='utf-8')
-    file_handler.setLevel(logging.INFO)
-
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
-
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
-
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    return logger
+    """
+    初始化日志：控制台、logs/ 下的文本日志与 JSON Lines 结构化日志，
+    由队列后台线程统一写出（见 src/utils/log_setup.py）
+    """
+    setup_queue_logging(get_logging_config())
+    return logging.getLogger("wechat_spider_main")
 
 
 def main():
-    """主程序入口 - 全自动化爬取"""
+    """主程序入口 - 全自动化爬取（--plan 只输出运行规划，不爬取）"""
+    parser = argparse.ArgumentParser(description="微信公众号全自动爬取")
+    parser.add_argument('--plan', action='store_true', help="只预测本次运行的请求数与耗时，检查调度窗口后退出")
+    args, _ = parser.parse_known_args()
+    if args.plan:
+        from src.core import run_planner
+        sys.exit(run_planner.main([]))
+
     logger = setup_logging()
 
     logger.info("=" * 80)
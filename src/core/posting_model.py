@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+公众号发文节奏模型：为自适应 max_pages 预测「翻到第几页才会越过时间下界」
+
+列表接口 profile_ext?action=getmsg 的 offset/count 以「推送」(general_msg_list 中的一条) 为单位，
+一次推送包含 1 条主文章 + 若干副文章。因此：
+- 按星期几分别对每日推送次数做 EWMA（工作日集中发文的账号不会被周末拉低/抬高）
+- 每次推送的文章数分布用于估计窗口内的文章数
+- 每个星期几同时维护指数加权方差（不低于泊松方差 λ，集中/突发发文的账号方差更大）
+- 越过下界时的 offset = 下界之后已记录的推送数（上次完整抓取已看到）+ 此后新增推送的预测值，
+  预测部分：均值 = Σ λ_d，方差 = 逐日波动 Σ σ²_d + 速率估计误差（同一星期几的天数完全相关，
+  随区间长度平方增长）；加上 z·σ 的置信余量后换算为页数
+
+模型由每次完整抓取时记录的列表历史（推送时间 + 文章数 + 覆盖的时间区间）拟合，
+历史保存在 data/runtime/posting_model.json。
+
+用法（离线评估，对比原估算与本模型；默认使用固定种子生成的合成列表历史，可复现）:
+    python -m src.core.posting_model --eval
+    python -m src.core.posting_model --eval --synthetic-days 150 --seed 0 --per-page 5 --days 30
+    python -m src.core.posting_model --eval --history data/runtime/posting_model.json   # 实际记录的列表历史
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+BEIJING_TZ = timezone(timedelta(hours=8))
+DAY_SEC = 86400
+
+
+def _day_start(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, BEIJING_TZ).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class PostingModel:
+    """单个公众号的发文节奏模型"""
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        # 星期一=0 ... 星期日=6 的每日推送次数 EWMA
+        self.dow_rate: List[Optional[float]] = [None] * 7
+        self.dow_var: List[float] = [0.0] * 7
+        # 每次推送文章数 -> 出现次数
+        self.push_sizes: Counter = Counter()
+        self.observed_days = 0
+
+    def fit(self, pushes: List[Tuple[float, int]], covered_from: float, covered_to: float) -> 'PostingModel':
+        """
+        :param pushes: [(推送时间戳, 文章数)]
+        :param covered_from/covered_to: 列表历史完整覆盖的时间区间（区间内的推送均已观测到）
+        """
+        self.dow_rate = [None] * 7
+        self.dow_var = [0.0] * 7
+        self.push_sizes = Counter(n for ts, n in pushes if covered_from <= ts <= covered_to)
+        per_day = Counter(_day_start(ts).date() for ts, _ in pushes if covered_from <= ts <= covered_to)
+        # 首尾两天可能只覆盖了一部分，只用完整覆盖的日期
+        day = _day_start(covered_from) + timedelta(days=1)
+        last = _day_start(covered_to)
+        self.observed_days = 0
+        while day < last:
+            count = per_day.get(day.date(), 0)
+            dow = day.weekday()
+            prev = self.dow_rate[dow]
+            if prev is None:
+                self.dow_rate[dow] = count
+            else:
+                diff = count - prev
+                self.dow_rate[dow] = prev + self.alpha * diff
+                self.dow_var[dow] = (1 - self.alpha) * (self.dow_var[dow] + self.alpha * diff * diff)
+            self.observed_days += 1
+            day += timedelta(days=1)
+        return self
+
+    # --------------- 预测 ---------------
+    def daily_rate(self, dow: int) -> float:
+        rate = self.dow_rate[dow]
+        if rate is not None:
+            return rate
+        known = [r for r in self.dow_rate if r is not None]
+        return sum(known) / len(known) if known else 0.0
+
+    def daily_var(self, dow: int) -> float:
+        rate = self.daily_rate(dow)
+        var = self.dow_var[dow] if self.dow_rate[dow] is not None else max(self.dow_var)
+        return max(var, rate)
+
+    def mean_push_size(self) -> float:
+        total = sum(self.push_sizes.values())
+        if not total:
+            return 1.0
+        return sum(n * c for n, c in self.push_sizes.items()) / total
+
+    def expected_pushes_between(self, start_ts: float, end_ts: float) -> Tuple[float, float]:
+        """[start_ts, end_ts] 内推送数的 (均值, 方差)"""
+        days_per_dow = [0.0] * 7
+        day = _day_start(start_ts)
+        while day.timestamp() < end_ts:
+            day_ts = day.timestamp()
+            overlap = min(end_ts, day_ts + DAY_SEC) - max(start_ts, day_ts)
+            if overlap > 0:
+                days_per_dow[day.weekday()] += overlap / DAY_SEC
+            day += timedelta(days=1)
+        # EWMA 估计量自身的方差约为 α/(2-α)·σ²
+        estimator_share = self.alpha / (2 - self.alpha)
+        mean = var = 0.0
+        for dow, n in enumerate(days_per_dow):
+            mean += self.daily_rate(dow) * n
+            var += self.daily_var(dow) * (n + estimator_share * n * n)
+        return mean, var
+
+    def expected_articles(self, days_back: int, now: datetime = None) -> float:
+        now = now or datetime.now(BEIJING_TZ)
+        lower = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days_back)
+        mean, _ = self.expected_pushes_between(lower.timestamp(), now.timestamp())
+        return mean * self.mean_push_size()
+
+    def predict_offset(self, lower_ts: float, now_ts: float, z: float = 1.28, known: Dict = None) -> float:
+        """
+        预测越过 lower_ts 时列表的 offset（下界之后的推送数，含置信余量）
+        :param known: 已记录的列表历史 {'pushes', 'covered_from', 'covered_to'}，覆盖到下界时只需预测其后的新增推送
+        """
+        start_ts = lower_ts
+        known_count = 0
+        if known and known['covered_from'] <= lower_ts < known['covered_to']:
+            known_count = sum(1 for ts, _ in known['pushes'] if lower_ts <= ts <= known['covered_to'])
+            start_ts = known['covered_to']
+        mean, var = self.expected_pushes_between(start_ts, now_ts)
+        return known_count + mean + z * math.sqrt(max(var, 0.0))
+
+    def predict_pages(self, days_back: int, pushes_per_page: int, z: float = 1.28, now: datetime = None,
+                      known: Dict = None) -> int:
+        """
+        预测越过下界（days_back 天前 00:00）需要翻的页数：
+        ceil(offset / 每页推送数) + 1（越界的那一页本身也要取到才能确认）
+        """
+        now = now or datetime.now(BEIJING_TZ)
+        lower = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days_back)
+        offset = self.predict_offset(lower.timestamp(), now.timestamp(), z, known)
+        return int(math.ceil(offset / max(1, pushes_per_page))) + 1
+
+
+class PostingHistoryStore:
+    """各公众号列表历史的持久化（线程安全）"""
+
+    def __init__(self, path: str = 'data/runtime/posting_model.json', history_days: int = 180):
+        self.path = path
+        self.history_days = history_days
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.data: Dict[str, Dict] = {}
+        self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.data = json.load(f)
+        except Exception:
+            self.data = {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_file = self.path + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp_file, self.path)
+
+    def record(self, account: str, pushes: List[Tuple[float, int]], covered_from: float, covered_to: float):
+        """记录一次完整抓取看到的推送；与已有区间重叠时合并，不连续时以本次为准"""
+        if not pushes and covered_to - covered_from < DAY_SEC:
+            return
+        with self._lock:
+            entry = self.data.get(account)
+            merged = {}
+            if entry and covered_from <= entry['covered_to'] and covered_to >= entry['covered_from']:
+                merged = {int(ts): n for ts, n in entry['pushes']}
+                covered_from = min(covered_from, entry['covered_from'])
+                covered_to = max(covered_to, entry['covered_to'])
+            for ts, n in pushes:
+                merged[int(ts)] = int(n)
+            covered_from = max(covered_from, covered_to - self.history_days * DAY_SEC)
+            self.data[account] = {
+                'covered_from': covered_from,
+                'covered_to': covered_to,
+                'pushes': sorted([ts, n] for ts, n in merged.items() if ts >= covered_from),
+            }
+            try:
+                self._save()
+            except Exception as e:
+                self.logger.warning(f"⚠️ 写入发文节奏历史失败: {e}")
+
+    def model(self, account: str, alpha: float = 0.3, min_days: int = 14) -> Optional[PostingModel]:
+        """完整覆盖天数不足 min_days 时返回 None（回退到原估算）"""
+        with self._lock:
+            entry = self.data.get(account)
+        if not entry:
+            return None
+        model = PostingModel(alpha).fit([tuple(p) for p in entry['pushes']], entry['covered_from'], entry['covered_to'])
+        return model if model.observed_days >= min_days else None
+
+    def predict_pages(self, account: str, days_back: int, pushes_per_page: int, alpha: float = 0.3,
+                      z: float = 1.28, min_days: int = 14) -> Optional[int]:
+        """结合已记录的推送与模型预测页数；历史不足时返回 None"""
+        model = self.model(account, alpha, min_days)
+        if not model:
+            return None
+        with self._lock:
+            entry = self.data.get(account)
+        return model.predict_pages(days_back, pushes_per_page, z, known=entry)
+
+
+# --------------- 离线评估 ---------------
+# 合成历史的结束时间（固定，保证评估结果可复现）
+SYNTHETIC_END = datetime(2026, 1, 1, tzinfo=BEIJING_TZ)
+# 合成公众号的发文形态：每个星期几（周一为 0）的日均推送次数、每次推送的文章数范围、突发概率与突发日推送次数
+SYNTHETIC_PROFILES = {
+    'steady': {'rates': [1.0] * 7, 'push_size': (1, 3), 'burst_prob': 0.0, 'burst_rate': 0.0},
+    'weekday': {'rates': [1.5] * 5 + [0.2, 0.2], 'push_size': (1, 4), 'burst_prob': 0.0, 'burst_rate': 0.0},
+    'bursty': {'rates': [0.3] * 7, 'push_size': (1, 2), 'burst_prob': 0.1, 'burst_rate': 5.0},
+}
+
+
+def _poisson(rng: random.Random, lam: float) -> int:
+    if lam <= 0:
+        return 0
+    threshold, k, p = math.exp(-lam), 0, 1.0
+    while True:
+        p *= rng.random()
+        if p <= threshold:
+            return k
+        k += 1
+
+
+def synthetic_history(days: int = 150, per_profile: int = 3, seed: int = 0) -> Dict[str, Dict]:
+    """
+    生成与 posting_model.json 同格式的合成列表历史：每种发文形态 per_profile 个公众号，
+    逐日按泊松分布抽取推送次数（突发日改用 burst_rate），推送时间落在 8:00-22:00
+    """
+    rng = random.Random(seed)
+    end = SYNTHETIC_END.timestamp()
+    start = end - days * DAY_SEC
+    history = {}
+    for profile, spec in SYNTHETIC_PROFILES.items():
+        for i in range(per_profile):
+            pushes = []
+            for day in range(days):
+                day_ts = start + day * DAY_SEC
+                rate = spec['rates'][datetime.fromtimestamp(day_ts, BEIJING_TZ).weekday()]
+                if spec['burst_prob'] and rng.random() < spec['burst_prob']:
+                    rate = spec['burst_rate']
+                for _ in range(_poisson(rng, rate)):
+                    ts = day_ts + rng.uniform(8, 22) * 3600
+                    pushes.append([int(ts), rng.randint(*spec['push_size'])])
+            history[f"{profile}_{i + 1}"] = {'covered_from': start, 'covered_to': end, 'pushes': sorted(pushes)}
+    return history
+
+
+def _pages_needed(pushes: List[Tuple[float, int]], lower_ts: float, now_ts: float, pushes_per_page: int) -> int:
+    """真实需要的页数：下界之后的推送全部翻完，再加越界的一页"""
+    newer = sum(1 for ts, _ in pushes if lower_ts <= ts <= now_ts)
+    return int(math.ceil(newer / max(1, pushes_per_page))) + 1
+
+
+def _legacy_pages(pushes, fit_from, fit_to, days, per_page, base_daily=2, min_pages=5) -> int:
+    """原 decide_max_pages 的核心估算：近期日均文章数 × 天数 / 每页条数 × 1.2"""
+    span_days = max(1.0, (fit_to - fit_from) / DAY_SEC)
+    articles = sum(n for ts, n in pushes if fit_from <= ts <= fit_to)
+    daily_avg = articles / span_days if articles else base_daily
+    pages = int((daily_avg * days) / max(1, per_page) + 0.999)
+    pages = int(pages * 1.2) if pages > 0 else min_pages
+    return max(min_pages, pages)
+
+
+def evaluate(history: Dict[str, Dict], days: int, per_page: int, z: float = 1.28, alpha: float = 0.3,
+             min_days: int = 14, gap_days: float = 1, min_pages: int = 5) -> Dict:
+    """
+    滚动评估：模拟每 gap_days 天运行一次、每次抓取最近 days 天。
+    在每个运行时刻 T，两种方法都只能使用 T-gap_days（上一次运行）之前的列表历史：
+    - legacy：上次运行窗口内的日均文章数 × days / 每页条数 × 1.2（原 decide_max_pages）
+    - model：已记录推送 + 发文节奏模型预测
+    与真实所需页数比较多翻的页数与欠估次数（未触达下界）
+    """
+    result = {name: {'evals': 0, 'wasted': 0, 'undershoots': 0} for name in ('legacy', 'model')}
+    gap = gap_days * DAY_SEC
+    for account, entry in history.items():
+        pushes = [tuple(p) for p in entry.get('pushes', [])]
+        start, end = entry['covered_from'], entry['covered_to']
+        t = start + (min_days + days) * DAY_SEC + gap
+        while t <= end:
+            last_run = t - gap
+            known = {'pushes': [p for p in pushes if p[0] <= last_run], 'covered_from': start, 'covered_to': last_run}
+            now = datetime.fromtimestamp(t, BEIJING_TZ)
+            lower_ts = (now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days)).timestamp()
+            truth = _pages_needed(pushes, lower_ts, t, per_page)
+            model = PostingModel(alpha).fit(known['pushes'], start, last_run)
+            estimates = {
+                'legacy': _legacy_pages(pushes, last_run - days * DAY_SEC, last_run, days, per_page, min_pages=min_pages),
+                'model': max(min_pages, model.predict_pages(days, per_page, z, now=now, known=known)),
+            }
+            for name, est in estimates.items():
+                stats = result[name]
+                stats['evals'] += 1
+                stats['wasted'] += max(0, est - truth)
+                if est < truth:
+                    stats['undershoots'] += 1
+            t += gap
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="发文节奏模型离线评估")
+    parser.add_argument('--eval', action='store_true', required=True, help="运行滚动评估")
+    parser.add_argument('--history', default=None,
+                        help="列表历史文件（如 data/runtime/posting_model.json）；缺省时使用合成历史")
+    parser.add_argument('--synthetic-days', type=int, default=150, help="合成历史的天数")
+    parser.add_argument('--seed', type=int, default=0, help="合成历史的随机种子")
+    parser.add_argument('--days', type=int, default=30, help="模拟抓取的 days_back")
+    parser.add_argument('--per-page', type=int, default=5, help="每页条数（articles_per_page）")
+    parser.add_argument('--z', type=float, default=1.28, help="置信余量 z 值")
+    parser.add_argument('--alpha', type=float, default=0.3, help="EWMA 平滑系数")
+    parser.add_argument('--gap-days', type=float, default=1, help="两次运行的间隔天数")
+    args = parser.parse_args(argv)
+
+    if args.history:
+        with open(args.history, 'r', encoding='utf-8') as f:
+            history = json.load(f)
+        source = args.history
+    else:
+        history = synthetic_history(args.synthetic_days, seed=args.seed)
+        source = f"合成历史 {args.synthetic_days} 天 (seed={args.seed}，{'/'.join(SYNTHETIC_PROFILES)})"
+    result = evaluate(history, args.days, args.per_page, args.z, args.alpha, gap_days=args.gap_days)
+    print(f"📊 {source}：{len(history)} 个公众号，days_back={args.days}，每页 {args.per_page} 条，"
+          f"运行间隔 {args.gap_days} 天")
+    for name, stats in result.items():
+        n = stats['evals'] or 1
+        print(f"   {name:<7} 评估 {stats['evals']} 次 | 多翻 {stats['wasted']} 页 (平均 {stats['wasted'] / n:.2f}) | "
+              f"欠估 {stats['undershoots']} 次 ({stats['undershoots'] / n:.1%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
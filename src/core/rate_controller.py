@@ -0,0 +1,184 @@
+import json
+import os
+import threading
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+BEIJING_TZ = timezone(timedelta(hours=8))
+
+
+class AdaptiveRateController:
+    """
+    AIMD 自适应请求速率控制
+
+    - 响应正常：速率加性增加 (rate += increase)
+    - freq control / ret=-3 / 验证码：速率乘性退避 (rate *= backoff)
+    - 学到的安全速率按账号与凭证分别持久化，下次运行从两者中较保守的值起步
+    - 每次被限流时的速率记为上限(ceiling)，加性增长不会越过 ceiling 的 90%，
+      在上限附近连续无异常一段时间后才缓慢上探，避免在限流边缘反复锯齿
+
+    速率单位为 次/分钟，对外以请求间隔(秒)提供给 rate_limit 使用。
+    """
+
+    # 在上限附近连续无异常多少次后允许上探
+    CEILING_PROBE_AFTER = 50
+    # 每次上探时上限放宽的比例
+    CEILING_PROBE_FACTOR = 1.05
+    # 每多少次无异常响应持久化一次
+    SAVE_EVERY = 20
+
+    def __init__(self, config: Dict, account: str = "", credential: str = ""):
+        crawler_cfg = config or {}
+        self.enabled = crawler_cfg.get('adaptive_rate_enabled', False)
+        self.static_interval = float(crawler_cfg.get('min_interval', 3))
+        self.min_interval = float(crawler_cfg.get('adaptive_rate_min_interval', 2))
+        self.max_interval = float(crawler_cfg.get('adaptive_rate_max_interval', 60))
+        self.increase = float(crawler_cfg.get('adaptive_rate_increase', 0.5))
+        self.backoff = float(crawler_cfg.get('adaptive_rate_backoff', 0.5))
+        self.state_file = crawler_cfg.get('adaptive_rate_state_file', 'data/runtime/rate_state.json')
+        self.account = account or ""
+        self.credential = credential or ""
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._clean_streak = 0
+        self._since_save = 0
+        self.ceiling: Optional[float] = None
+        self.rate = 60.0 / max(self.static_interval, 0.001)
+        self.state: Dict = {}
+        if self.enabled:
+            self._load_state()
+            self._init_rate()
+
+    # --------------- state persistence ---------------
+    def _load_state(self):
+        try:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    self.state = json.load(f)
+            else:
+                self.state = {}
+        except Exception:
+            self.state = {}
+        self.state.setdefault('accounts', {})
+        self.state.setdefault('credentials', {})
+
+    def _save_state(self):
+        # 合并写入：并发的多个控制器共享同一状态文件，只覆盖自己负责的条目
+        entry = {
+            'safe_rate': round(self.rate, 4),
+            'ceiling': round(self.ceiling, 4) if self.ceiling else None,
+            'ts': datetime.now(BEIJING_TZ).strftime('%Y-%m-%d %H:%M:%S')
+        }
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+            self._load_state()
+            if self.account:
+                self.state['accounts'][self.account] = entry
+            if self.credential:
+                self.state['credentials'][self.credential] = entry
+            tmp_file = self.state_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.state_file)
+            self._since_save = 0
+        except Exception as e:
+            self.logger.warning(f"⚠️ 写入速率状态文件失败: {e}")
+
+    def _init_rate(self):
+        known = []
+        for scope, key in (('accounts', self.account), ('credentials', self.credential)):
+            entry = self.state.get(scope, {}).get(key) if key else None
+            if entry and entry.get('safe_rate'):
+                known.append(entry)
+        if known:
+            # 账号与凭证都有记录时取更保守（更慢）的一方
+            entry = min(known, key=lambda e: e['safe_rate'])
+            self.rate = float(entry['safe_rate'])
+            ceilings = [e['ceiling'] for e in known if e.get('ceiling')]
+            self.ceiling = min(ceilings) if ceilings else None
+        self.rate = self._clamp(self.rate)
+
+    # --------------- AIMD ---------------
+    def _clamp(self, rate: float) -> float:
+        max_rate = 60.0 / max(self.min_interval, 0.001)
+        min_rate = 60.0 / max(self.max_interval, 0.001)
+        return max(min_rate, min(max_rate, rate))
+
+    def current_interval(self) -> float:
+        """当前请求间隔（秒）；未启用时返回静态配置 min_interval"""
+        if not self.enabled:
+            return self.static_interval
+        with self._lock:
+            return 60.0 / self.rate
+
+    def on_success(self):
+        """记录一次无异常响应：加性增加速率"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._clean_streak += 1
+            self._since_save += 1
+            new_rate = self.rate + self.increase
+            if self.ceiling:
+                soft_cap = self.ceiling * 0.9
+                if new_rate > soft_cap:
+                    if self._clean_streak >= self.CEILING_PROBE_AFTER:
+                        # 在上限附近稳定运行足够久，缓慢上探
+                        self.ceiling *= self.CEILING_PROBE_FACTOR
+                        self._clean_streak = 0
+                    new_rate = max(self.rate, min(new_rate, self.ceiling * 0.9))
+            self.rate = self._clamp(new_rate)
+            if self._since_save >= self.SAVE_EVERY:
+                self._save_state()
+
+    def on_throttle(self, signal: str):
+        """记录一次限流信号（freq_control / ret_-3 / captcha）：乘性退避并立即持久化"""
+        if not self.enabled:
+            return
+        with self._lock:
+            old_rate = self.rate
+            # 上限取历次触发限流时速率的滑动平均
+            self.ceiling = old_rate if not self.ceiling else (self.ceiling + old_rate) / 2
+            self.rate = self._clamp(old_rate * self.backoff)
+            self._clean_streak = 0
+            self.logger.warning(
+                f"⚠️ 限流信号 {signal}：请求速率 {old_rate:.2f} -> {self.rate:.2f} 次/分钟 "
+                f"(间隔 {60.0 / self.rate:.1f}s)"
+            )
+            self._save_state()
+
+    def flush(self):
+        """持久化当前学到的速率（一次抓取结束时调用）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._save_state()
+
+
+class GlobalRequestBudget:
+    """
+    全局请求预算：多账号并行抓取时，所有 worker 共享的请求节奏
+    以固定最小间隔发放请求许可（线程安全），与各 spider 自身的 rate_limit 叠加生效
+    """
+
+    def __init__(self, max_requests_per_minute: float):
+        self.max_rpm = float(max_requests_per_minute or 0)
+        self.interval = 60.0 / self.max_rpm if self.max_rpm > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self) -> float:
+        """阻塞直到获得一次请求许可，返回等待的秒数"""
+        if self.interval <= 0:
+            return 0.0
+        with self._lock:
+            now = time.time()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+        return wait
@@ -0,0 +1,296 @@
+"""
+请求台账：记录每一次对外请求（列表 profile_ext、文章页面、re-key），供离线分析限流规律
+
+每条记录：时间、请求类型(kind: list/article/rekey)、凭证(credential，即微信会话)、key 代次(key_id)、
+公众号、耗时、响应字节数、结果(outcome) 以及请求前的刻意等待(delay)。
+记录在内存中攒批，每 request_ledger_batch_size 条或每 request_ledger_flush_interval_sec 秒
+以一次事务写入 SQLite（只追加），运行结束时写出剩余记录。
+
+分析（何时、在什么请求速率下、同一凭证/同一 key 连续请求多少次后出现 freq control / 验证码）:
+    python -m src.core.request_ledger
+    python -m src.core.request_ledger --since-hours 24 --window 300 --events freq_control,captcha
+    python -m src.core.request_ledger --credential uin:MTIz... --json ledger_report.json
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    credential TEXT,
+    key_id TEXT,
+    account TEXT,
+    latency_ms INTEGER,
+    bytes INTEGER,
+    outcome TEXT,
+    delay_ms INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_requests_credential_ts ON requests (credential, ts);
+CREATE INDEX IF NOT EXISTS idx_requests_outcome ON requests (outcome);
+"""
+
+# 视为限流信号的结果
+DEFAULT_EVENTS = ('freq_control', 'captcha', 'ret_-3')
+# 速率分桶上界（次/分钟）
+RATE_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 20)
+
+
+def key_id(auth_info: dict) -> str:
+    """x-wechat-key 的短摘要：同一会话 re-key 后变化，用于统计同一 key 连续请求数"""
+    key = ((auth_info or {}).get('headers') or {}).get('x-wechat-key') or ''
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:10] if key else ''
+
+
+class RequestLedger:
+    """线程安全，由 AutomatedCrawler 创建并在所有 spider 间共享；未启用时 record 为空操作"""
+
+    def __init__(self, config: Dict = None):
+        config = config or {}
+        self.enabled = config.get('request_ledger_enabled', False)
+        self.path = config.get('request_ledger_file', 'data/runtime/request_ledger.db')
+        self.batch_size = max(1, int(config.get('request_ledger_batch_size', 50)))
+        self.flush_interval = float(config.get('request_ledger_flush_interval_sec', 5.0))
+        self.run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._buffer: List[tuple] = []
+        self._last_flush = time.time()
+        self._conn = None
+        self.recorded = 0
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def record(self, kind: str, credential: str, key: str, account: str, latency_sec: float,
+               nbytes: int, outcome: str, delay_sec: float, ts: float = None):
+        if not self.enabled:
+            return
+        row = (self.run_id, ts or time.time(), kind, credential, key, account or '',
+               int(round((latency_sec or 0) * 1000)), int(nbytes or 0), outcome or 'ok',
+               int(round((delay_sec or 0) * 1000)))
+        with self._lock:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.batch_size or time.time() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.time()
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    """INSERT INTO requests (run_id, ts, kind, credential, key_id, account, latency_ms, bytes,
+                                             outcome, delay_ms) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    rows
+                )
+            self.recorded += len(rows)
+        except sqlite3.Error as e:
+            self.logger.warning(f"⚠️ 写入请求台账失败（丢弃 {len(rows)} 条）: {e}")
+
+    def flush(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._flush_locked()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        self.logger.info(f"🧾 请求台账已写入 {self.path}（本次运行 {self.recorded} 条）")
+
+
+# --------------- 分析 ---------------
+def load_rows(path: str, since_ts: float = 0, credential: str = None) -> List[Dict]:
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        sql = "SELECT * FROM requests WHERE ts >= ?"
+        params: list = [since_ts]
+        if credential:
+            sql += " AND credential = ?"
+            params.append(credential)
+        return [dict(r) for r in conn.execute(sql + " ORDER BY ts, id", params)]
+    finally:
+        conn.close()
+
+
+def _bucket_label(rate: float) -> str:
+    lower = 0
+    for upper in RATE_BUCKETS:
+        if rate < upper:
+            return f"{lower}-{upper}"
+        lower = upper
+    return f">={RATE_BUCKETS[-1]}"
+
+
+def analyze(rows: List[Dict], window_sec: float = 300, events=DEFAULT_EVENTS, min_samples: int = 50) -> Dict:
+    """
+    对每条请求计算：同一凭证在前 window_sec 秒内的请求速率（次/分钟）、本次运行中该凭证的第几次请求、
+    当前 key 的第几次请求；据此给出限流事件明细、按速率分桶的事件率与事件前请求数分布
+    :param min_samples: 速率分桶至少有多少次请求才参与"未出现事件的最高速率"判断
+    """
+    events = set(events)
+    by_credential: Dict[tuple, List[Dict]] = defaultdict(list)
+    for row in rows:
+        by_credential[(row['run_id'], row['credential'])].append(row)
+
+    event_rows = []
+    buckets: Dict[str, Dict] = {}
+    for (_, credential), seq in by_credential.items():
+        times = [r['ts'] for r in seq]
+        # 同一会话下多个公众号的 key 交替使用，按 key 分别计数
+        key_counts = Counter()
+        last_event_ts = None
+        for n, row in enumerate(seq, 1):
+            key_counts[row['key_id']] += 1
+            key_seq = key_counts[row['key_id']]
+            # 前 window_sec 秒内（不含本次）同一凭证的请求数
+            recent = n - 1 - bisect.bisect_left(times, row['ts'] - window_sec, 0, n - 1)
+            # 会话刚开始时按实际时长折算，至少按 1 分钟计，避免前几次请求速率虚高
+            span = min(window_sec, max(60.0, row['ts'] - times[0]))
+            rate = recent * 60.0 / span
+            label = _bucket_label(rate)
+            bucket = buckets.setdefault(label, {'requests': 0, 'events': 0})
+            bucket['requests'] += 1
+            if row['outcome'] in events:
+                bucket['events'] += 1
+                event_rows.append({
+                    'time': datetime.fromtimestamp(row['ts']).strftime('%Y-%m-%d %H:%M:%S'),
+                    'run_id': row['run_id'],
+                    'kind': row['kind'],
+                    'outcome': row['outcome'],
+                    'account': row['account'],
+                    'credential': credential,
+                    'nth_on_credential': n,
+                    'nth_on_key': key_seq,
+                    'rate_per_min': round(rate, 2),
+                    'delay_sec': round((row['delay_ms'] or 0) / 1000, 2),
+                    'minutes_since_session_start': round((row['ts'] - times[0]) / 60, 1),
+                    'minutes_since_last_event': round((row['ts'] - last_event_ts) / 60, 1)
+                    if last_event_ts else None,
+                })
+                last_event_ts = row['ts']
+
+    def order(label: str) -> float:
+        return float(label.lstrip('>=').split('-')[0])
+
+    rate_table = []
+    for label in sorted(buckets, key=order):
+        b = buckets[label]
+        rate_table.append({'rate_per_min': label, 'requests': b['requests'], 'events': b['events'],
+                           'events_per_1000': round(b['events'] * 1000 / b['requests'], 2)})
+
+    def distribution(values: List[float]) -> Optional[Dict]:
+        if not values:
+            return None
+        return {'min': min(values), 'median': statistics.median(values), 'max': max(values)}
+
+    # 从低到高、直到第一次出现事件为止样本充足的最高速率分桶，可作为 pacing 上限的参考
+    safe = None
+    for entry in rate_table:
+        if entry['events']:
+            break
+        if entry['requests'] >= min_samples:
+            safe = entry
+    return {
+        'requests': len(rows),
+        'window_sec': window_sec,
+        'span': [datetime.fromtimestamp(rows[0]['ts']).strftime('%Y-%m-%d %H:%M:%S'),
+                 datetime.fromtimestamp(rows[-1]['ts']).strftime('%Y-%m-%d %H:%M:%S')] if rows else None,
+        'by_kind': dict(Counter(r['kind'] for r in rows)),
+        'by_outcome': dict(Counter(r['outcome'] for r in rows)),
+        'credentials': len({c for _, c in by_credential}),
+        'events': event_rows,
+        'rate_buckets': rate_table,
+        'requests_before_event': {
+            'on_credential': distribution([e['nth_on_credential'] for e in event_rows]),
+            'on_key': distribution([e['nth_on_key'] for e in event_rows]),
+            'minutes_since_session_start': distribution([e['minutes_since_session_start'] for e in event_rows]),
+        },
+        'highest_event_free_bucket': safe,
+    }
+
+
+def print_report(report: Dict, max_events: int = 50):
+    print("=" * 70)
+    print(f"🧾 请求台账：{report['requests']} 次请求，{report['credentials']} 个凭证，时间 {report['span']}")
+    print(f"   按类型: {report['by_kind']}")
+    print(f"   按结果: {report['by_outcome']}")
+    events = report['events']
+    print(f"🚦 限流事件 {len(events)} 次（速率按前 {report['window_sec']:g} 秒同一凭证请求数计算）")
+    for e in events[:max_events]:
+        since_last = f"，距上次事件 {e['minutes_since_last_event']} 分钟" if e['minutes_since_last_event'] else ""
+        print(f"   {e['time']} {e['outcome']:<12} {e['kind']:<7} {e['account']} | 凭证第 {e['nth_on_credential']} 次、"
+              f"key 第 {e['nth_on_key']} 次请求 | {e['rate_per_min']} 次/分钟 | 前置等待 {e['delay_sec']}s | "
+              f"会话开始后 {e['minutes_since_session_start']} 分钟{since_last}")
+    if len(events) > max_events:
+        print(f"   ...（另有 {len(events) - max_events} 次）")
+    print("📊 按请求速率分桶（次/分钟）:")
+    for entry in report['rate_buckets']:
+        print(f"   {entry['rate_per_min']:>6}: 请求 {entry['requests']:>6}，事件 {entry['events']:>4}，"
+              f"每千次 {entry['events_per_1000']}")
+    before = report['requests_before_event']
+    if before['on_credential']:
+        print(f"🔢 事件前请求数 — 同一凭证: {before['on_credential']}，同一 key: {before['on_key']}，"
+              f"会话开始后分钟数: {before['minutes_since_session_start']}")
+    safe = report['highest_event_free_bucket']
+    if safe:
+        print(f"💡 {safe['rate_per_min']} 次/分钟及以下未出现限流事件（样本 {safe['requests']} 次请求）")
+    print("=" * 70)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="请求台账分析：限流事件发生的时间、速率与请求数")
+    parser.add_argument('--db', default='data/runtime/request_ledger.db', help="台账文件")
+    parser.add_argument('--since-hours', type=float, default=0, help="只分析最近若干小时（0 = 全部）")
+    parser.add_argument('--credential', default=None, help="只分析某个凭证（如 uin:MTIz...）")
+    parser.add_argument('--window', type=float, default=300, help="计算请求速率的滑动窗口（秒）")
+    parser.add_argument('--events', default=','.join(DEFAULT_EVENTS), help="视为限流事件的结果，逗号分隔")
+    parser.add_argument('--max-events', type=int, default=50, help="最多列出的事件数")
+    parser.add_argument('--min-samples', type=int, default=50, help="速率分桶参与安全速率判断的最少请求数")
+    parser.add_argument('--json', default=None, help="报告另存为 JSON 文件")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"❌ 台账文件不存在: {args.db}（需启用 request_ledger_enabled）")
+        return 1
+    since_ts = time.time() - args.since_hours * 3600 if args.since_hours else 0
+    rows = load_rows(args.db, since_ts, args.credential)
+    report = analyze(rows, args.window, [e.strip() for e in args.events.split(',') if e.strip()], args.min_samples)
+    print_report(report, args.max_events)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""
+运行指标：按阶段记录耗时、字节数与结果，导出 Prometheus 文本文件与 JSON 运行报告
+
+阶段 (phase)：
+- capture / recapture：凭证抓包（AutomatedCrawler、CredentialPipeline）
+- listing：列表请求 profile_ext
+- article_fetch：文章页面请求（网络部分，结果为该文章的最终判定）
+- parse：文章页面解析（正文、时间、名称、统计数据、key 过期判定）
+- db_write：数据库写入（DatabaseManager.insert_article）
+- rekey：爬取中途刷新 key
+- account：单个公众号从开始爬取到结束的总耗时
+结果 (outcome)：ok、freq_control、ret_-3、captcha、key_expired、not_article_page、duplicate、error 等
+
+刻意等待 (sleep) 按公众号与原因累计：rate_limit、burst_pause、article_delay、page_delay、
+account_delay、retry_backoff、global_budget、breaker_cooldown
+
+每 run_metrics_flush_interval_sec 秒及运行结束时原子写出：
+- data/runtime/metrics.prom：Prometheus 文本格式（可由 node_exporter textfile collector 采集）
+- data/runtime/run_report.json：按阶段/公众号汇总，并给出每个公众号各阶段与等待占总耗时的比例
+
+未启用时所有记录方法均为空操作。
+"""
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, Tuple
+
+# 阶段耗时直方图的桶上界（秒）
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+# 计入公众号耗时分解的阶段（capture 发生在公众号爬取开始之前，不计入）
+BREAKDOWN_PHASES = ('listing', 'article_fetch', 'parse', 'db_write', 'rekey', 'recapture')
+
+
+class PhaseTimer:
+    """一次阶段计时；调用方可在结束前修改 outcome / bytes，finish() 只记录一次"""
+
+    __slots__ = ('metrics', 'phase', 'account', 'outcome', 'bytes', '_started', '_elapsed', '_finished')
+
+    def __init__(self, metrics: 'RunMetrics', phase: str, account: str, outcome: str):
+        self.metrics = metrics
+        self.phase = phase
+        self.account = account
+        self.outcome = outcome
+        self.bytes = 0
+        self._started = time.perf_counter()
+        self._elapsed = None
+        self._finished = False
+
+    @property
+    def elapsed(self) -> float:
+        return self._elapsed if self._elapsed is not None else time.perf_counter() - self._started
+
+    def stop(self):
+        """冻结耗时（结果稍后才能确定时先停表）"""
+        if self._elapsed is None:
+            self._elapsed = time.perf_counter() - self._started
+
+    def finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        self.stop()
+        self.metrics.observe(self.phase, self.account, self._elapsed, self.outcome, self.bytes)
+
+
+class RunMetrics:
+    """线程安全，由 AutomatedCrawler 创建并在所有 spider / 数据库连接间共享"""
+
+    def __init__(self, config: Dict = None):
+        config = config or {}
+        self.enabled = config.get('run_metrics_enabled', False)
+        self.prom_file = config.get('run_metrics_prom_file', 'data/runtime/metrics.prom')
+        self.report_file = config.get('run_metrics_report_file', 'data/runtime/run_report.json')
+        self.flush_interval = float(config.get('run_metrics_flush_interval_sec', 30))
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # (phase, account, outcome) -> {'calls', 'seconds', 'bytes', 'max'}
+        self._phases: Dict[Tuple[str, str, str], Dict] = {}
+        # phase -> 各桶计数（最后一个为 +Inf）
+        self._buckets: Dict[str, list] = {}
+        # (account, reason) -> {'count', 'seconds'}
+        self._sleeps: Dict[Tuple[str, str], Dict] = {}
+        self.started_at = time.time()
+        self._last_flush = time.time()
+        self._finished = False
+
+    # --------------- 记录 ---------------
+    def timer(self, phase: str, account: str = '', outcome: str = 'ok') -> PhaseTimer:
+        return PhaseTimer(self, phase, account or '', outcome)
+
+    @contextlib.contextmanager
+    def phase(self, phase: str, account: str = '', outcome: str = 'ok') -> Iterator[PhaseTimer]:
+        """with metrics.phase('db_write', name) as t: ...; t.outcome = 'duplicate'（异常时记为 error）"""
+        timer = self.timer(phase, account, outcome)
+        try:
+            yield timer
+        except Exception:
+            timer.outcome = 'error'
+            raise
+        finally:
+            timer.finish()
+
+    def observe(self, phase: str, account: str, seconds: float, outcome: str = 'ok', nbytes: int = 0):
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = self._phases.setdefault((phase, account or '', outcome or 'ok'),
+                                            {'calls': 0, 'seconds': 0.0, 'bytes': 0, 'max': 0.0})
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+            entry['bytes'] += int(nbytes or 0)
+            entry['max'] = max(entry['max'], seconds)
+            buckets = self._buckets.setdefault(phase, [0] * (len(DURATION_BUCKETS) + 1))
+            slot = next((i for i, upper in enumerate(DURATION_BUCKETS) if seconds <= upper), len(DURATION_BUCKETS))
+            buckets[slot] += 1
+        self._maybe_flush()
+
+    def record_sleep(self, account: str, reason: str, seconds: float):
+        if not self.enabled or seconds <= 0:
+            return
+        with self._lock:
+            entry = self._sleeps.setdefault((account or '', reason), {'count': 0, 'seconds': 0.0})
+            entry['count'] += 1
+            entry['seconds'] += seconds
+        self._maybe_flush()
+
+    # --------------- 导出 ---------------
+    def _maybe_flush(self):
+        if time.time() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def report(self) -> Dict:
+        """JSON 运行报告"""
+        with self._lock:
+            phases = {k: dict(v) for k, v in self._phases.items()}
+            sleeps = {k: dict(v) for k, v in self._sleeps.items()}
+            finished = self._finished
+        now = time.time()
+
+        def add(summary: Dict, phase: str, outcome: str, entry: Dict):
+            item = summary.setdefault(phase, {'calls': 0, 'seconds': 0.0, 'bytes': 0, 'max_sec': 0.0, 'outcomes': {}})
+            item['calls'] += entry['calls']
+            item['seconds'] += entry['seconds']
+            item['bytes'] += entry['bytes']
+            item['max_sec'] = max(item['max_sec'], entry['max'])
+            item['outcomes'][outcome] = item['outcomes'].get(outcome, 0) + entry['calls']
+
+        totals: Dict[str, Dict] = {}
+        accounts: Dict[str, Dict] = {}
+        for (phase, account, outcome), entry in phases.items():
+            add(totals, phase, outcome, entry)
+            if account:
+                add(accounts.setdefault(account, {'phases': {}, 'sleep': {}})['phases'], phase, outcome, entry)
+        sleep_totals: Dict[str, float] = {}
+        for (account, reason), entry in sleeps.items():
+            sleep_totals[reason] = sleep_totals.get(reason, 0.0) + entry['seconds']
+            if account:
+                acct = accounts.setdefault(account, {'phases': {}, 'sleep': {}})
+                acct['sleep'][reason] = acct['sleep'].get(reason, 0.0) + entry['seconds']
+
+        for acct in accounts.values():
+            wall = acct['phases'].get('account', {}).get('seconds', 0.0)
+            acct['wall_sec'] = round(wall, 3)
+            acct['sleep_sec'] = round(sum(acct['sleep'].values()), 3)
+            if wall > 0:
+                breakdown = {p: acct['phases'][p]['seconds'] / wall for p in BREAKDOWN_PHASES if p in acct['phases']}
+                breakdown['sleep'] = acct['sleep_sec'] / wall
+                breakdown['other'] = max(0.0, 1.0 - sum(breakdown.values()))
+                acct['breakdown'] = {k: round(v, 4) for k, v in breakdown.items()}
+
+        def rounded(summary: Dict) -> Dict:
+            for item in summary.values():
+                item['seconds'] = round(item['seconds'], 3)
+                item['max_sec'] = round(item['max_sec'], 3)
+            return summary
+
+        return {
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'updated_at': datetime.fromtimestamp(now).isoformat(timespec='seconds'),
+            'finished': finished,
+            'elapsed_sec': round(now - self.started_at, 3),
+            'phases': rounded(totals),
+            'sleep': {k: round(v, 3) for k, v in sleep_totals.items()},
+            'accounts': {name: {**acct, 'phases': rounded(acct['phases']),
+                                'sleep': {k: round(v, 3) for k, v in acct['sleep'].items()}}
+                         for name, acct in sorted(accounts.items())},
+        }
+
+    @staticmethod
+    def _labels(**labels) -> str:
+        def esc(value) -> str:
+            return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        return '{' + ','.join(f'{k}="{esc(v)}"' for k, v in labels.items()) + '}'
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            phases = sorted(self._phases.items())
+            buckets = sorted((k, list(v)) for k, v in self._buckets.items())
+            sleeps = sorted(self._sleeps.items())
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        metric('wechat_crawl_phase_seconds_total', 'counter', '各阶段累计耗时（秒）')
+        for (phase, account, outcome), e in phases:
+            lines.append(f"wechat_crawl_phase_seconds_total{self._labels(phase=phase, account=account, outcome=outcome)} {e['seconds']:.6f}")
+        metric('wechat_crawl_phase_calls_total', 'counter', '各阶段调用次数')
+        for (phase, account, outcome), e in phases:
+            lines.append(f"wechat_crawl_phase_calls_total{self._labels(phase=phase, account=account, outcome=outcome)} {e['calls']}")
+        metric('wechat_crawl_phase_bytes_total', 'counter', '各阶段响应字节数')
+        for (phase, account, outcome), e in phases:
+            if e['bytes']:
+                lines.append(f"wechat_crawl_phase_bytes_total{self._labels(phase=phase, account=account, outcome=outcome)} {e['bytes']}")
+        metric('wechat_crawl_phase_duration_seconds', 'histogram', '单次阶段耗时分布（秒）')
+        sums: Dict[str, float] = {}
+        for (phase, _, _), e in phases:
+            sums[phase] = sums.get(phase, 0.0) + e['seconds']
+        for phase, counts in buckets:
+            cumulative = 0
+            for upper, count in zip(list(DURATION_BUCKETS) + ['+Inf'], counts):
+                cumulative += count
+                lines.append(f"wechat_crawl_phase_duration_seconds_bucket{self._labels(phase=phase, le=upper)} {cumulative}")
+            lines.append(f"wechat_crawl_phase_duration_seconds_sum{self._labels(phase=phase)} {sums.get(phase, 0.0):.6f}")
+            lines.append(f"wechat_crawl_phase_duration_seconds_count{self._labels(phase=phase)} {cumulative}")
+        metric('wechat_crawl_sleep_seconds_total', 'counter', '刻意等待的累计时长（秒）')
+        for (account, reason), e in sleeps:
+            lines.append(f"wechat_crawl_sleep_seconds_total{self._labels(account=account, reason=reason)} {e['seconds']:.6f}")
+        metric('wechat_crawl_run_start_timestamp_seconds', 'gauge', '本次运行开始时间')
+        lines.append(f"wechat_crawl_run_start_timestamp_seconds {self.started_at:.3f}")
+        metric('wechat_crawl_run_elapsed_seconds', 'gauge', '本次运行已用时长（秒）')
+        lines.append(f"wechat_crawl_run_elapsed_seconds {time.time() - self.started_at:.3f}")
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _atomic_write(path: str, text: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_file = path + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_file, path)
+
+    def flush(self):
+        if not self.enabled:
+            return
+        self._last_flush = time.time()
+        # 多个 worker 可能同时触发定时写出，共用同一个临时文件
+        with self._flush_lock:
+            try:
+                self._atomic_write(self.prom_file, self.prometheus_text())
+                self._atomic_write(self.report_file, json.dumps(self.report(), ensure_ascii=False, indent=2))
+            except Exception as e:
+                self.logger.warning(f"⚠️ 写入运行指标失败: {e}")
+
+    def close(self):
+        """运行结束：写出最终结果"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._finished = True
+        self.flush()
+        self.logger.info(f"📈 运行指标已写入: {self.prom_file}, {self.report_file}")
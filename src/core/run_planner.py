@@ -0,0 +1,404 @@
+"""
+运行规划与 ETA：按配置、目标列表与历史统计预测一次运行的请求数与耗时，运行中持续发布剩余时间
+
+每个公众号的预测：
+- 文章数：发文节奏模型（posting_model.json）> 自适应统计的日均文章数（max_pages_stats.json）> adaptive_base_daily_posts
+- 页数：ceil(文章数 / (每页推送数 × 平均每次推送文章数)) + 1（越界页），不超过 max_pages；发文节奏模型可直接预测页数
+- 请求：列表 页数 + 1（Cookie 验证），文章 文章数；网络耗时取上次运行报告（run_report.json）中的平均值
+- 等待：文章间/页面间随机延迟取均值，频率控制只计不足 min_interval 的部分，每 10 个请求的额外暂停，
+  公众号间延迟（串行模式）与全局请求预算（并行模式）
+上次运行的实际/预测耗时比乘以该次运行所用的校准系数（均记录在 eta.json）作为本次的校准系数。
+
+用法:
+    python -m src.core.run_planner                       # 使用 config.yaml 与其中的 excel_file
+    python -m src.core.run_planner --window-minutes 240  # 检查能否在调度窗口内完成
+    python -m src.core.run_planner --deadline 06:30 --json plan.json
+    python main.py --plan
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from src.core.backfill_manager import BackfillManager
+from src.core.posting_model import PostingHistoryStore
+
+# 无历史数据时的默认值（秒）
+DEFAULT_LATENCY = {'list': 1.0, 'article': 1.5, 'capture': 60.0}
+# spider 每 10 个请求额外暂停 5~10 秒
+BURST_EVERY = 10
+BURST_PAUSE_SEC = 7.5
+# 各等待/耗时分量对应的配置项，用于提示哪些配置主导了总耗时
+COMPONENT_SOURCES = {
+    'article_delay': 'article_delay_range',
+    'page_delay': 'page_delay_range',
+    'account_delay': 'account_delay',
+    'rate_limit': 'min_interval / adaptive_rate_*',
+    'burst_pause': '每 10 个请求的额外暂停',
+    'global_budget': 'global_max_requests_per_minute',
+    'capture': '凭证抓包',
+    'network': '请求与解析耗时',
+}
+
+
+def _mean(value_range, default: float) -> float:
+    try:
+        low, high = value_range
+        return (float(low) + float(high)) / 2
+    except (TypeError, ValueError):
+        return default
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(max(0, seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{secs:02d}s"
+
+
+class RunPlanner:
+    """根据配置与 data/runtime 下的历史文件预测每个公众号及整次运行的请求数与耗时"""
+
+    def __init__(self, config: Dict):
+        self.config = config
+        self.delay_scale = float(config.get('delay_scale', 1.0))
+        self.days_back = int(config.get('days_back', 90))
+        self.max_pages = int(config.get('max_pages', 200))
+        self.articles_per_page = max(1, int(config.get('articles_per_page', 5)))
+        self.account_workers = max(1, int(config.get('account_workers', 1) or 1))
+        self.capture_lookahead = max(0, int(config.get('capture_lookahead', 0) or 0))
+        self.global_rpm = float(config.get('global_max_requests_per_minute', 0) or 0)
+        self.article_concurrency = max(1, int(config.get('article_fetch_concurrency', 1) or 1))
+        self.account_delay = float(config.get('account_delay', 15))
+        self.article_delay = _mean(config.get('article_delay_range'), 12.5)
+        self.page_delay = _mean(config.get('page_delay_range'), 15)
+        self.min_interval = float(config.get('min_interval', 3))
+        self.base_daily = float(config.get('adaptive_base_daily_posts', 2))
+        self.backfill = BackfillManager(config)
+        posting_file = config.get('posting_model_file', 'data/runtime/posting_model.json')
+        self.posting_history = PostingHistoryStore(
+            posting_file, history_days=int(config.get('posting_model_history_days', 180))
+        ) if os.path.exists(posting_file) else None
+        self.latency = self._historical_latency(config.get('run_metrics_report_file', 'data/runtime/run_report.json'))
+        self.calibration = self._calibration(config.get('run_eta_file', 'data/runtime/eta.json'))
+
+    @staticmethod
+    def _historical_latency(report_file: str) -> Dict[str, float]:
+        """上次运行报告中各类请求的平均耗时（文章 = 请求 + 解析）"""
+        latency = dict(DEFAULT_LATENCY)
+        try:
+            with open(report_file, 'r', encoding='utf-8') as f:
+                phases = json.load(f).get('phases', {})
+        except (OSError, ValueError):
+            return latency
+
+        def per_call(*names) -> Optional[float]:
+            calls = phases.get(names[0], {}).get('calls', 0)
+            seconds = sum(phases.get(name, {}).get('seconds', 0.0) for name in names)
+            return seconds / calls if calls else None
+
+        for kind, names in (('list', ('listing',)), ('article', ('article_fetch', 'parse')), ('capture', ('capture',))):
+            value = per_call(*names)
+            if value is not None:
+                latency[kind] = value
+        return latency
+
+    @staticmethod
+    def _calibration(eta_file: str) -> float:
+        """
+        上次完整运行所用的校准系数 × 实际/预测耗时比，限制在 [0.5, 3]
+
+        上次的预测已乘过当时的校准系数，直接取实际/预测比会在相邻两次运行间来回摆动
+        """
+        try:
+            with open(eta_file, 'r', encoding='utf-8') as f:
+                last = json.load(f)
+        except (OSError, ValueError):
+            return 1.0
+        planned, actual = last.get('planned_total_sec'), last.get('actual_total_sec')
+        if not last.get('finished') or not planned or not actual:
+            return 1.0
+        applied = float(last.get('calibration') or 1.0)
+        return min(3.0, max(0.5, applied * actual / planned))
+
+    # --------------- 单个公众号 ---------------
+    def _window_days(self, account: str):
+        """(需翻过的天数, 窗口下界之后不抓取的天数)：分段回填时为该公众号当前阶段，否则为 (days_back, 0)"""
+        if self.backfill.is_active():
+            stage = self.backfill.decide_stage(account)
+            if stage:
+                return stage.upper_days, stage.lower_days
+        return self.days_back, 0
+
+    def plan_account(self, account: str) -> Dict:
+        reach_days, newer_days = self._window_days(account)
+        # 自然日模式窗口含当天
+        window_days = reach_days - newer_days + (0 if newer_days else 1)
+        articles = pages = None
+        push_size = 1.0
+        source = 'default'
+        model = self.posting_history.model(
+            account, alpha=float(self.config.get('posting_model_alpha', 0.3)),
+            min_days=int(self.config.get('posting_model_min_history_days', 14))
+        ) if self.posting_history else None
+        if model:
+            push_size = model.mean_push_size() or 1.0
+            articles = model.expected_articles(reach_days) - (model.expected_articles(newer_days) if newer_days else 0)
+            pages = model.predict_pages(reach_days, self.articles_per_page,
+                                        z=float(self.config.get('posting_model_confidence_z', 1.28)))
+            source = 'posting_model'
+        elif self.backfill.account_stats(account):
+            stat = self.backfill.account_stats(account)
+            articles = stat.get('recent_avg_daily', self.base_daily) * window_days
+            source = 'history'
+        if articles is None:
+            articles = self.base_daily * window_days
+        if pages is None:
+            pages = int(math.ceil(articles * reach_days / max(1, window_days) /
+                                  (self.articles_per_page * push_size))) + 1
+        pages = max(1, min(self.max_pages, pages))
+        articles = int(round(articles))
+
+        list_requests = pages + 1
+        requests = list_requests + articles
+        scale = self.delay_scale
+        components = {
+            'network': list_requests * self.latency['list'] + articles * self.latency['article'],
+            'article_delay': articles * self.article_delay * scale / self.article_concurrency,
+            'page_delay': max(0, pages - 1) * self.page_delay * scale,
+            'burst_pause': (requests // BURST_EVERY) * BURST_PAUSE_SEC * scale,
+        }
+        # 频率控制只补足请求间隔中未被其他等待覆盖的部分
+        interval = self.min_interval * scale
+        article_gap = self.article_delay * scale / self.article_concurrency + self.latency['article']
+        components['rate_limit'] = articles * max(0.0, interval - article_gap) / self.article_concurrency \
+            + list_requests * max(0.0, interval - self.page_delay * scale)
+        crawl_sec = sum(components.values()) * self.calibration
+        return {
+            'account': account,
+            'source': source,
+            'pages': pages,
+            'articles': articles,
+            'requests': requests,
+            'crawl_sec': crawl_sec,
+            'capture_sec': self.latency['capture'],
+            'components': components,
+        }
+
+    # --------------- 整次运行 ---------------
+    def combine(self, accounts: List[Dict]) -> Dict:
+        """汇总一组公众号的预测（串行 / 并行 / 流水线调度）"""
+        components = {name: 0.0 for name in COMPONENT_SOURCES}
+        for acc in accounts:
+            for name, value in acc['components'].items():
+                components[name] += value * self.calibration
+        crawl_total = sum(a['crawl_sec'] for a in accounts)
+        capture_total = sum(a['capture_sec'] for a in accounts)
+        requests = sum(a['requests'] for a in accounts)
+        n = len(accounts)
+        if self.account_workers > 1:
+            crawl_wall = max(crawl_total / self.account_workers, max((a['crawl_sec'] for a in accounts), default=0))
+            if self.global_rpm:
+                budget_wall = requests / self.global_rpm * 60 * self.delay_scale
+                if budget_wall > crawl_wall:
+                    components['global_budget'] = budget_wall - crawl_wall
+                    crawl_wall = budget_wall
+        else:
+            crawl_wall = crawl_total
+            components['account_delay'] = max(0, n - 1) * self.account_delay * self.delay_scale
+            crawl_wall += components['account_delay']
+        # 流水线模式下只有第一个公众号的抓包不与爬取重叠
+        capture_wall = capture_total if self.capture_lookahead == 0 else (accounts[0]['capture_sec'] if n else 0)
+        components['capture'] = capture_wall
+        total = crawl_wall + capture_wall
+        return {
+            'accounts': n,
+            'requests': requests,
+            'list_requests': sum(a['pages'] + 1 for a in accounts),
+            'article_requests': sum(a['articles'] for a in accounts),
+            'total_sec': total,
+            'components': components,
+        }
+
+    def plan(self, targets: List[Dict]) -> Dict:
+        accounts = [self.plan_account(t['name']) for t in targets]
+        summary = self.combine(accounts)
+        ranked = sorted(summary['components'].items(), key=lambda kv: kv[1], reverse=True)
+        summary['dominant'] = [
+            {'component': name, 'seconds': round(sec, 1),
+             'share': round(sec / summary['total_sec'], 3) if summary['total_sec'] else 0.0,
+             'config': COMPONENT_SOURCES[name]}
+            for name, sec in ranked if sec > 0
+        ]
+        summary['per_account'] = accounts
+        summary['calibration'] = round(self.calibration, 3)
+        summary['latency'] = {k: round(v, 3) for k, v in self.latency.items()}
+        return summary
+
+
+def window_end(config: Dict, start: datetime, window_minutes: float = None, deadline: str = None) -> Optional[datetime]:
+    """调度窗口结束时间：--deadline HH:MM（下一次出现）优先，其次窗口时长（分钟）"""
+    deadline = deadline or config.get('run_deadline') or ''
+    if deadline:
+        hour, minute = (int(x) for x in deadline.split(':'))
+        end = start.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        return end if end > start else end + timedelta(days=1)
+    minutes = window_minutes if window_minutes is not None else float(config.get('run_window_minutes', 0) or 0)
+    return start + timedelta(minutes=minutes) if minutes else None
+
+
+def print_plan(plan: Dict, start: datetime, end: Optional[datetime], max_accounts: int = 30):
+    finish = start + timedelta(seconds=plan['total_sec'])
+    print("=" * 70)
+    print(f"🗓️ 运行规划：{plan['accounts']} 个公众号，预计请求 {plan['requests']} 次"
+          f"（列表 {plan['list_requests']}，文章 {plan['article_requests']}）")
+    print(f"⏱️ 预计耗时 {format_duration(plan['total_sec'])}，{start:%H:%M} 开始则约 {finish:%m-%d %H:%M} 结束"
+          f"（校准系数 {plan['calibration']}，平均耗时 {plan['latency']}）")
+    print("📊 耗时构成:")
+    for entry in plan['dominant']:
+        print(f"   {entry['component']:<14} {format_duration(entry['seconds']):>8}  {entry['share'] * 100:5.1f}%  ← {entry['config']}")
+    print("📋 各公众号:")
+    for acc in sorted(plan['per_account'], key=lambda a: a['crawl_sec'], reverse=True)[:max_accounts]:
+        print(f"   {acc['account']:<20} 页 {acc['pages']:>4} | 文章 {acc['articles']:>5} | 请求 {acc['requests']:>5} | "
+              f"{format_duration(acc['crawl_sec']):>8} | 依据 {acc['source']}")
+    if len(plan['per_account']) > max_accounts:
+        print(f"   ...（另有 {len(plan['per_account']) - max_accounts} 个）")
+    if end:
+        if finish > end:
+            over = (finish - end).total_seconds()
+            top = plan['dominant'][0] if plan['dominant'] else None
+            print(f"⚠️ 预计超出调度窗口（{end:%m-%d %H:%M}）{format_duration(over)}"
+                  + (f"，最大耗时项为 {top['component']}（{top['config']}）" if top else ""))
+        else:
+            print(f"✅ 预计可在调度窗口（{end:%m-%d %H:%M}）内完成，余量 {format_duration((end - finish).total_seconds())}")
+    print("=" * 70)
+
+
+class RunEta:
+    """
+    运行中的 ETA：每个公众号结束时按已完成公众号的实际/预测耗时比修正剩余预测，
+    原子写入 run_eta_file（默认 data/runtime/eta.json）；预计超出调度窗口时告警一次
+    """
+
+    def __init__(self, config: Dict, targets: List[Dict]):
+        # 没有待爬公众号（如 __init__ 中的占位实例）时不预测、不写文件
+        self.enabled = bool(config.get('run_eta_enabled', False) and targets)
+        self.path = config.get('run_eta_file', 'data/runtime/eta.json')
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.started = datetime.now()
+        self._started_ts = time.time()
+        self.planner = None
+        self.accounts = {}
+        self.plan = None
+        self.window_end = None
+        self._warned = False
+        self._done: Dict[str, float] = {}
+        if not self.enabled:
+            return
+        self.planner = RunPlanner(config)
+        self.accounts = {t['name']: self.planner.plan_account(t['name']) for t in targets}
+        self.plan = self.planner.combine(list(self.accounts.values()))
+        self.window_end = window_end(config, self.started)
+        self.logger.info(f"🗓️ 预计本次运行 {len(targets)} 个公众号、{self.plan['requests']} 次请求，"
+                         f"耗时约 {format_duration(self.plan['total_sec'])}")
+        self._publish()
+
+    def account_done(self, account: str, elapsed_sec: float):
+        if not self.enabled or account not in self.accounts:
+            return
+        with self._lock:
+            self._done[account] = self._done.get(account, 0.0) + elapsed_sec
+        self._publish()
+
+    def _estimate(self) -> Dict:
+        with self._lock:
+            done = dict(self._done)
+        planned_done = sum(self.accounts[a]['crawl_sec'] for a in done)
+        ratio = min(4.0, max(0.25, sum(done.values()) / planned_done)) if planned_done else 1.0
+        remaining = [a for name, a in self.accounts.items() if name not in done]
+        remaining_sec = self.planner.combine(remaining)['total_sec'] * ratio if remaining else 0.0
+        elapsed = time.time() - self._started_ts
+        return {
+            'started_at': self.started.strftime('%Y-%m-%d %H:%M:%S'),
+            'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'accounts_total': len(self.accounts),
+            'accounts_done': len(done),
+            'elapsed_sec': round(elapsed, 1),
+            'remaining_sec': round(remaining_sec, 1),
+            'eta': (datetime.now() + timedelta(seconds=remaining_sec)).strftime('%Y-%m-%d %H:%M:%S'),
+            'pace_ratio': round(ratio, 3),
+            'planned_total_sec': round(self.plan['total_sec'], 1),
+            'calibration': round(self.planner.calibration, 3),
+            'window_end': self.window_end.strftime('%Y-%m-%d %H:%M:%S') if self.window_end else None,
+            'finished': False,
+        }
+
+    def _publish(self, final: bool = False):
+        estimate = self._estimate()
+        if final:
+            estimate.update(finished=True, remaining_sec=0.0, actual_total_sec=estimate['elapsed_sec'])
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_file = self.path + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(estimate, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.path)
+        except Exception as e:
+            self.logger.warning(f"⚠️ 写入 ETA 失败: {e}")
+        if final:
+            return
+        self.logger.info(f"⏱️ 进度 {estimate['accounts_done']}/{estimate['accounts_total']}，"
+                         f"预计剩余 {format_duration(estimate['remaining_sec'])}，约 {estimate['eta']} 完成")
+        if self.window_end and not self._warned and \
+                datetime.now() + timedelta(seconds=estimate['remaining_sec']) > self.window_end:
+            self._warned = True
+            self.logger.warning(f"⚠️ 按当前进度预计 {estimate['eta']} 完成，将超出调度窗口（{estimate['window_end']}）")
+
+    def finish(self):
+        """运行结束：记录实际总耗时，供下次规划校准"""
+        if self.enabled:
+            self._publish(final=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="运行规划：预测请求数与耗时，检查调度窗口")
+    parser.add_argument('--excel', default=None, help="目标公众号 Excel（默认使用配置中的 excel_file）")
+    parser.add_argument('--window-minutes', type=float, default=None, help="调度窗口时长（分钟）")
+    parser.add_argument('--deadline', default=None, help="调度窗口结束时刻 HH:MM")
+    parser.add_argument('--start', default=None, help="计划开始时刻 HH:MM（默认现在）")
+    parser.add_argument('--json', default=None, help="规划另存为 JSON 文件")
+    args = parser.parse_args(argv)
+
+    from config.config_manager import get_crawler_config
+    from src.core.automated_crawler import read_targets_from_excel
+    config = get_crawler_config()
+    targets = read_targets_from_excel(args.excel or config.get('excel_file', 'target_articles.xlsx'))
+    if not targets:
+        print("❌ 未找到任何有效的公众号链接")
+        return 1
+    start = datetime.now()
+    if args.start:
+        hour, minute = (int(x) for x in args.start.split(':'))
+        start = start.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if start < datetime.now():
+            start += timedelta(days=1)
+    plan = RunPlanner(config).plan(targets)
+    end = window_end(config, start, args.window_minutes, args.deadline)
+    print_plan(plan, start, end)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(plan, f, ensure_ascii=False, indent=2)
+    if end and start + timedelta(seconds=plan['total_sec']) > end:
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
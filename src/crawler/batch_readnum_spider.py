@@ -12,28 +12,61 @@ import time
 import random
 import requests
 import pandas as pd
-import winreg
 import ctypes
 import contextlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import logging
 from datetime import datetime, timedelta, timezone
 from bs4 import BeautifulSoup
+try:
+    import winreg  # 仅 Windows：临时禁用系统代理
+except ImportError:
+    winreg = None
 
-from src.proxy.read_cookie import ReadCookie
+from src.proxy.read_cookie import ReadCookie, CAPTURE_LOCK
 from src.ui.wechat_browser_automation import WeChatBrowserAutomation, UI_AUTOMATION_AVAILABLE
 from src.utils import utils
 from src.database.database_manager import DatabaseManager
+from src.core.rate_controller import AdaptiveRateController
+from src.core.credential_health import CredentialHealth
+from src.core.article_index import ArticleIndex
+from src.core.run_metrics import RunMetrics
+from src.core.request_ledger import RequestLedger, key_id
+from src.crawler.key_expiry_classifier import KeyExpiryClassifier, KEY_EXPIRED, SUSPECT
 from config import get_crawler_config
 
+# 逐篇文章的请求参数/请求头/正则命中等细节记为 DEBUG，生产环境默认 INFO 级别下不输出
+logger = logging.getLogger(__name__)
+
+
 class BatchReadnumSpider:
     """批量微信公众号阅读量抓取器"""
+
+    # 系统代理临时禁用的引用计数（并发抓取时多个线程共享同一次禁用/恢复）
+    _proxy_guard_lock = threading.Lock()
+    _proxy_guard_depth = 0
+    _proxy_guard_restore = None
+    # 这些停止原因说明时间窗口已完整覆盖；list_failed（频率控制/网络错误）与 captcha 属于中断
+    FINISHED_STOP_REASONS = ('lower_bound', 'history_end', 'max_pages')
     
-    def __init__(self, auth_info: dict = None, save_to_db=False, db_config=None, unit_name="", crawler_config=None):
+    def __init__(self, auth_info: dict = None, save_to_db=False, db_config=None, unit_name="", crawler_config=None,
+                 request_budget=None, bypass_system_proxy=False, on_credential_invalid=None, circuit_breaker=None,
+                 journal=None, key_refresher=None, metrics=None, request_ledger=None):
         """
         初始化批量阅读量抓取器
         :param auth_info: 包含appmsg_token, biz, cookie_str和headers的字典
         :param save_to_db: 是否保存到数据库
         :param db_config: 数据库配置
         :param unit_name: 单位名称（公众号名称）
+        :param request_budget: 可选，多账号并行时共享的全局请求预算(GlobalRequestBudget)
+        :param bypass_system_proxy: 请求直连、不读取系统代理（抓包与爬取并行时使用，此时不再临时改动系统代理）
+        :param on_credential_invalid: 可选回调 f(auth_info)，列表接口返回 ret=-3 时调用（如通知凭证代理使该凭证失效）
+        :param circuit_breaker: 可选，多账号共享的验证码熔断器(CaptchaCircuitBreaker)
+        :param journal: 可选，本公众号的运行日志句柄(AccountJournal)，记录翻页游标与已处理文章，崩溃后据此恢复
+        :param key_refresher: 可选回调 f(article_url) -> auth_info，刷新 key 时代替本地抓包（如由凭证提供者统一获取）
+        :param metrics: 可选，本次运行共享的运行指标(RunMetrics)，记录各阶段耗时/结果与等待时间
+        :param request_ledger: 可选，本次运行共享的请求台账(RequestLedger)，逐条记录对外请求
         """
         # 初始化认证信息
         self.appmsg_token = None
@@ -45,18 +78,24 @@ class BatchReadnumSpider:
         self.save_to_db = save_to_db
         self.unit_name = unit_name
         self.db_manager = None
+        # 运行指标（未传入时为空操作）
+        self.metrics = metrics or RunMetrics()
+        # 请求台账（未传入时为空操作）；_pacing_delay 为距上一次请求以来的刻意等待
+        self.request_ledger = request_ledger or RequestLedger()
+        self._pacing_delay = 0.0
+        self._pacing_lock = threading.Lock()
 
         # 初始化数据库连接
         if self.save_to_db:
             try:
                 if db_config:
-                    self.db_manager = DatabaseManager(**db_config)
+                    self.db_manager = DatabaseManager(**db_config, metrics=self.metrics, metrics_account=unit_name)
                 else:
-                    self.db_manager = DatabaseManager()  # 使用默认配置
-                print("✅ 数据库连接已建立，将实时保存文章数据")
+                    self.db_manager = DatabaseManager(metrics=self.metrics, metrics_account=unit_name)  # 使用默认配置
+                logger.info("✅ 数据库连接已建立，将实时保存文章数据")
             except Exception as e:
-                print(f"❌ 数据库连接失败: {e}")
-                print("⚠️ 将只保存到文件，不保存到数据库")
+                logger.error("❌ 数据库连接失败: %s", e)
+                logger.warning("⚠️ 将只保存到文件，不保存到数据库")
                 self.save_to_db = False
 
         # 请求头配置 - 参考spider_readnum.py的成功实现
@@ -80,7 +119,7 @@ class BatchReadnumSpider:
         if self.auth_info:
             self.load_auth_info()
         else:
-            print("❌ BatchReadnumSpider 初始化时未提供认证数据。")
+            logger.error("❌ BatchReadnumSpider 初始化时未提供认证数据。")
 
         # 数据存储 - 统一存储所有字段
         self.articles_data = []
@@ -92,21 +131,66 @@ class BatchReadnumSpider:
         self.min_interval = self.crawler_config.get('min_interval', 3)
         self.article_delay_range = self.crawler_config.get('article_delay_range', [10, 15])
         self.page_delay_range = self.crawler_config.get('page_delay_range', [10, 20])
+        # 所有等待时间的缩放系数（离线回放/基准测试时缩短等待，正式抓取为 1.0）
+        self.delay_scale = float(self.crawler_config.get('delay_scale', 1.0))
         self.refresh_count_cfg = self.crawler_config.get('refresh_count', 3)
         self.refresh_delay_cfg = self.crawler_config.get('refresh_delay', 3.0)
         self.timeout = self.crawler_config.get('timeout', 30)
+        # 公众号平台地址（离线回放/基准测试时指向本地假服务）
+        self.mp_base_url = self.crawler_config.get('mp_base_url', 'https://mp.weixin.qq.com').rstrip('/')
         self.max_retries = self.crawler_config.get('max_retries', 3)
+        # AIMD 自适应速率（未启用时退化为静态 min_interval）
+        self.rate_controller = AdaptiveRateController(
+            self.crawler_config,
+            account=self.unit_name or self.biz or "",
+            credential=utils.credential_id(self.auth_info)
+        )
+        # 单页内文章并发抓取数（1 = 与原串行流程完全一致）
+        self.article_concurrency = max(1, int(self.crawler_config.get('article_fetch_concurrency', 1) or 1))
+        self._rate_lock = threading.Lock()
+        # 并发模式下文章间延迟的共享节奏：相邻两篇文章的开始时间间隔 article_delay / 并发数
+        self._article_slot = 0.0
+        self._article_slot_lock = threading.Lock()
+        self.request_budget = request_budget
+        self.bypass_system_proxy = bypass_system_proxy
+        # requests 中将代理显式设为 None 即忽略环境/系统代理
+        self.request_proxies = {'http': None, 'https': None} if bypass_system_proxy else None
+        self.on_credential_invalid = on_credential_invalid
+        self.circuit_breaker = circuit_breaker
+        self.journal = journal
+        self.key_refresher = key_refresher
+        # 因验证码/熔断中止时的恢复位置 {'page', 'article_index'}，供上层暂存后继续
+        self.captcha_resume = None
+        # 本次抓取是否完整跑完（停止原因属于 FINISHED_STOP_REASONS），用于推进分段回填阶段
+        self.crawl_finished = False
+        # 本次抓取的统计（供自适应 max_pages 学习），见 _new_crawl_stats
+        self._stats_lock = threading.Lock()
+        self.crawl_stats = self._new_crawl_stats()
+        # 最近一次列表响应 can_msg_continue == 0：已翻到公众号历史消息的尽头
+        self.list_exhausted = False
+        # 本次抓取列表中看到的推送 {推送时间戳: 文章数}，用于拟合发文节奏模型
+        self.listing_pushes = {}
+        # 本地文章索引：记录每次列表响应，用于窗口规划与跳过阅读量已稳定/近期已获取的文章
+        self.article_index = ArticleIndex.shared(
+            self.crawler_config.get('article_index_file', 'data/runtime/article_index.db')
+        ) if self.crawler_config.get('article_index_enabled', False) else None
+        self.index_settle_sec = float(self.crawler_config.get('article_index_settle_days', 7)) * 86400
+        self.index_refresh_interval_sec = float(self.crawler_config.get('article_index_refresh_interval_hours', 0)) * 3600
 
         # 创建数据目录
         os.makedirs("./data/readnum_batch", exist_ok=True)
         # key 刷新节流
         self.last_key_refresh_time = None
         self.min_rekey_interval_sec = self.crawler_config.get('min_rekey_interval_sec', 1500)
+        # 凭证健康度：预测 key 过期并在页面间空闲时提前刷新（未启用时为空操作）
+        self.credential_health = CredentialHealth(self.crawler_config)
+        # 阅读量为 0 时综合多个信号判断 key 是否真的过期
+        self.expiry_classifier = KeyExpiryClassifier(self.crawler_config)
 
     def load_auth_info(self):
         """从传入的认证数据加载认证信息和headers"""
         if not self.auth_info:
-            print("❌ 未传入有效的认证数据，无法加载认证信息。")
+            logger.error("❌ 未传入有效的认证数据，无法加载认证信息。")
             return False
 
         try:
@@ -127,29 +211,29 @@ class BatchReadnumSpider:
                 missing_headers = [h for h in key_headers if h not in captured_headers]
 
                 if missing_headers:
-                    print(f"⚠️ 缺少关键headers: {missing_headers}")
+                    logger.warning("⚠️ 缺少关键headers: %s", missing_headers)
                     # 如果缺少x-wechat-key，使用默认值（来自spider_readnum.py的成功实现）
                     if 'x-wechat-key' in missing_headers:
-                        print("🔑 使用默认的x-wechat-key值")
+                        logger.debug("🔑 使用默认的x-wechat-key值")
                 else:
-                    print(f"✅ 已更新所有 {len(captured_headers)} 个请求头参数，包含关键的x-wechat-key")
+                    logger.debug("✅ 已更新所有 %s 个请求头参数，包含关键的x-wechat-key", len(captured_headers))
 
                 # 显示x-wechat-key的前20个字符用于验证
                 if 'x-wechat-key' in captured_headers:
-                    print(f"🔑 x-wechat-key: {captured_headers['x-wechat-key'][:20]}...")
+                    logger.debug("🔑 x-wechat-key: %s...", captured_headers['x-wechat-key'][:20])
                 elif 'x-wechat-key' in self.headers:
-                    print(f"🔑 使用默认x-wechat-key: {self.headers['x-wechat-key'][:20]}...")
+                    logger.debug("🔑 使用默认x-wechat-key: %s...", self.headers['x-wechat-key'][:20])
             else:
-                print("⚠️ 未获取到headers信息，使用默认的x-wechat-key")
-                print(f"🔑 默认x-wechat-key: {self.headers['x-wechat-key'][:20]}...")
+                logger.warning("⚠️ 未获取到headers信息，使用默认的x-wechat-key")
+                logger.debug("🔑 默认x-wechat-key: %s...", self.headers['x-wechat-key'][:20])
 
-            print(f"✅ 成功加载认证信息")
-            print(f"   __biz: {self.biz}")
-            print(f"   appmsg_token: {self.appmsg_token[:20]}...")
-            print(f"   headers: {list(captured_headers.keys())}")
+            logger.info("✅ 成功加载认证信息")
+            logger.debug("   __biz: %s", self.biz)
+            logger.debug("   appmsg_token: %s...", self.appmsg_token[:20])
+            logger.debug("   headers: %s", list(captured_headers.keys()))
             return True
         except Exception as e:
-            print(f"❌ 加载认证信息失败: {e}")
+            logger.error("❌ 加载认证信息失败: %s", e)
             return False
 
     def validate_cookie(self):
@@ -157,24 +241,24 @@ class BatchReadnumSpider:
         验证Cookie是否有效
         :return: 是否有效
         """
-        print("🔍 验证Cookie有效性...")
+        logger.debug("🔍 验证Cookie有效性...")
 
         if not all([self.appmsg_token, self.biz, self.cookie_str]):
-            print("❌ 认证信息不完整")
+            logger.error("❌ 认证信息不完整")
             return False
 
         try:
             # 尝试获取第一页文章列表来验证Cookie
-            print("🔍 尝试获取文章列表以验证Cookie...")
+            logger.debug("🔍 尝试获取文章列表以验证Cookie...")
             test_articles = self.get_article_list(begin_page=0, count=1)
             if test_articles:
-                print("✅ Cookie验证成功")
+                logger.info("✅ Cookie验证成功")
                 return True
             else:
-                print("❌ Cookie验证失败，可能已过期")
+                logger.error("❌ Cookie验证失败，可能已过期")
                 return False
         except Exception as e:
-            print(f"❌ Cookie验证过程中出错: {e}")
+            logger.error("❌ Cookie验证过程中出错: %s", e)
             return False
 
 
@@ -183,66 +267,118 @@ class BatchReadnumSpider:
     def manage_system_proxy(self, proxy_address="127.0.0.1:8080"):
         """
         代理管理上下文管理器，临时禁用系统代理
+        支持嵌套/并发进入：首个进入者禁用代理，最后一个退出者恢复代理
         """
         INTERNET_OPTION_SETTINGS_CHANGED = 39
         INTERNET_OPTION_REFRESH = 37
         InternetSetOption = ctypes.windll.wininet.InternetSetOptionW
-        
-        original_state = {"enabled": False, "server": ""}
-        was_active = False
-        key = None
-        
+        cls = BatchReadnumSpider
+
+        with cls._proxy_guard_lock:
+            cls._proxy_guard_depth += 1
+            if cls._proxy_guard_depth == 1:
+                cls._proxy_guard_restore = None
+                key = None
+                try:
+                    # 打开注册表项
+                    key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, 
+                                       r"Software\Microsoft\Windows\CurrentVersion\Internet Settings", 
+                                       0, winreg.KEY_READ | winreg.KEY_WRITE)
+
+                    # 读取原始代理状态
+                    original_state = {"enabled": False, "server": ""}
+                    try:
+                        original_state["enabled"] = winreg.QueryValueEx(key, "ProxyEnable")[0] == 1
+                        original_state["server"] = winreg.QueryValueEx(key, "ProxyServer")[0]
+                    except FileNotFoundError:
+                        pass
+
+                    # 检查代理是否是我们需要禁用的那个
+                    if original_state["enabled"] and original_state["server"] == proxy_address:
+                        cls._proxy_guard_restore = proxy_address
+                        logger.debug("🔧 检测到活动代理 %s，正在临时禁用...", proxy_address)
+                        winreg.SetValueEx(key, "ProxyEnable", 0, winreg.REG_DWORD, 0)
+                        InternetSetOption(0, INTERNET_OPTION_SETTINGS_CHANGED, 0, 0)
+                        InternetSetOption(0, INTERNET_OPTION_REFRESH, 0, 0)
+                except Exception:
+                    cls._proxy_guard_depth -= 1
+                    raise
+                finally:
+                    if key:
+                        winreg.CloseKey(key)
+
         try:
-            # 打开注册表项
-            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, 
-                               r"Software\Microsoft\Windows\CurrentVersion\Internet Settings", 
-                               0, winreg.KEY_READ | winreg.KEY_WRITE)
-            
-            # 读取原始代理状态
-            try:
-                original_state["enabled"] = winreg.QueryValueEx(key, "ProxyEnable")[0] == 1
-                original_state["server"] = winreg.QueryValueEx(key, "ProxyServer")[0]
-            except FileNotFoundError:
-                pass
-            
-            # 检查代理是否是我们需要禁用的那个
-            if original_state["enabled"] and original_state["server"] == proxy_address:
-                was_active = True
-                print(f"🔧 检测到活动代理 {proxy_address}，正在临时禁用...")
-                winreg.SetValueEx(key, "ProxyEnable", 0, winreg.REG_DWORD, 0)
-                InternetSetOption(0, INTERNET_OPTION_SETTINGS_CHANGED, 0, 0)
-                InternetSetOption(0, INTERNET_OPTION_REFRESH, 0, 0)
-            
             yield  # 执行主代码块
-            
         finally:
-            # 恢复原始代理设置
-            if was_active and key:
-                print(f"🔧 正在恢复代理 {proxy_address}...")
-                winreg.SetValueEx(key, "ProxyEnable", 0, winreg.REG_DWORD, 1)
-                InternetSetOption(0, INTERNET_OPTION_SETTINGS_CHANGED, 0, 0)
-                InternetSetOption(0, INTERNET_OPTION_REFRESH, 0, 0)
-            if key:
-                winreg.CloseKey(key)
+            with cls._proxy_guard_lock:
+                cls._proxy_guard_depth -= 1
+                if cls._proxy_guard_depth == 0 and cls._proxy_guard_restore:
+                    # 恢复原始代理设置
+                    restore_address = cls._proxy_guard_restore
+                    cls._proxy_guard_restore = None
+                    logger.debug("🔧 正在恢复代理 %s...", restore_address)
+                    key = winreg.OpenKey(winreg.HKEY_CURRENT_USER,
+                                       r"Software\Microsoft\Windows\CurrentVersion\Internet Settings",
+                                       0, winreg.KEY_WRITE)
+                    try:
+                        winreg.SetValueEx(key, "ProxyEnable", 0, winreg.REG_DWORD, 1)
+                        InternetSetOption(0, INTERNET_OPTION_SETTINGS_CHANGED, 0, 0)
+                        InternetSetOption(0, INTERNET_OPTION_REFRESH, 0, 0)
+                    finally:
+                        winreg.CloseKey(key)
     
     def rate_limit(self):
-        """智能频率控制"""
+        """智能频率控制（线程安全：并发抓取时所有线程共享同一节奏预算）"""
+        with self._rate_lock:
+            self._rate_limit_locked()
+
+    def _rate_limit_locked(self):
         current_time = time.time()
         time_since_last = current_time - self.last_request_time
+        min_interval = self.rate_controller.current_interval() * self.delay_scale
         
-        if time_since_last < self.min_interval:
-            sleep_time = self.min_interval - time_since_last
-            print(f"⏳ 频率控制：等待 {sleep_time:.1f} 秒...")
-            time.sleep(sleep_time)
+        if time_since_last < min_interval:
+            sleep_time = min_interval - time_since_last
+            logger.debug("⏳ 频率控制：等待 %.1f 秒...", sleep_time)
+            self._sleep(sleep_time, 'rate_limit')
         
+        # 多账号并行时再从全局预算中领取一次请求许可
+        if self.request_budget:
+            waited = self.request_budget.acquire()
+            self.metrics.record_sleep(self.unit_name, 'global_budget', waited)
+            self._add_pacing(waited)
+
         self.last_request_time = time.time()
         self.request_count += 1
         
         # 每10个请求增加额外延迟
         if self.request_count % 10 == 0:
-            extra_delay = random.randint(5, 10)
-            print(f"⏳ 第{self.request_count}个请求，额外延迟 {extra_delay} 秒...")
-            time.sleep(extra_delay)
+            extra_delay = random.randint(5, 10) * self.delay_scale
+            logger.debug("⏳ 第%s个请求，额外延迟 %.1f 秒...", self.request_count, extra_delay)
+            self._sleep(extra_delay, 'burst_pause')
+
+    def _sleep(self, seconds: float, reason: str):
+        """刻意等待，并按原因计入运行指标"""
+        if seconds > 0:
+            time.sleep(seconds)
+            self.metrics.record_sleep(self.unit_name, reason, seconds)
+            self._add_pacing(seconds)
+
+    def _add_pacing(self, seconds: float):
+        if seconds and seconds > 0:
+            with self._pacing_lock:
+                self._pacing_delay += seconds
+
+    def _take_pacing(self) -> float:
+        """取出本次请求之前累计的刻意等待并清零"""
+        with self._pacing_lock:
+            delay, self._pacing_delay = self._pacing_delay, 0.0
+        return delay
+
+    def _ledger(self, kind: str, timer, delay: float):
+        """把一次请求（耗时/字节数/结果取自阶段计时）写入请求台账"""
+        self.request_ledger.record(kind, utils.credential_id(self.auth_info), key_id(self.auth_info),
+                                   self.unit_name, timer.elapsed, timer.bytes, timer.outcome, delay)
     
     def get_article_list(self, begin_page=0, count=10):
         """
@@ -252,14 +388,14 @@ class BatchReadnumSpider:
         :return: 文章列表
         """
         if not all([self.appmsg_token, self.biz, self.cookie_str]):
-            print("❌ 认证信息不完整，无法获取文章列表")
+            logger.error("❌ 认证信息不完整，无法获取文章列表")
             return []
         
         # 频率控制
         self.rate_limit()
         
         # 构建请求URL
-        page_url = "https://mp.weixin.qq.com/mp/profile_ext"
+        page_url = f"{self.mp_base_url}/mp/profile_ext"
         params = {
             "action": "getmsg",
             "__biz": self.biz,
@@ -287,72 +423,97 @@ class BatchReadnumSpider:
         headers = self.headers.copy()
         headers["Cookie"] = self.cookie_str
         
+        pacing = self._take_pacing()
+        timer = self.metrics.timer('listing', self.unit_name, outcome='error')
         try:
-            print(f"📡 获取文章列表：第{begin_page+1}页，每页{count}篇")
+            logger.debug("📡 获取文章列表：第%s页，每页%s篇", begin_page+1, count)
             
             # 增加简单重试机制（最多 self.max_retries 次）
             for attempt in range(1, self.max_retries + 1):
                 try:
-                    response = requests.get(page_url, params=params, headers=headers, verify=False, timeout=self.timeout)
+                    self._count_request('list')
+                    response = requests.get(page_url, params=params, headers=headers, verify=False, timeout=self.timeout,
+                                            proxies=self.request_proxies)
                     break
                 except Exception as e:
                     if attempt == self.max_retries:
-                        print(f"❌ 请求失败（第{attempt}次/共{self.max_retries}次）: {e}")
+                        logger.error("❌ 请求失败（第%s次/共%s次）: %s", attempt, self.max_retries, e)
                         return []
                     wait = min(3, attempt)
-                    print(f"⚠️ 请求异常第{attempt}次，{wait}s后重试: {e}")
-                    time.sleep(wait)
+                    logger.warning("⚠️ 请求异常第%s次，%ss后重试: %s", attempt, wait, e)
+                    self._sleep(wait * self.delay_scale, 'retry_backoff')
             
+            timer.bytes = len(response.content)
             if response.status_code != 200:
-                print(f"❌ 请求失败，状态码: {response.status_code}")
+                logger.error("❌ 请求失败，状态码: %s", response.status_code)
+                timer.outcome = f"http_{response.status_code}"
                 return []
             
             # 解析响应
             try:
                 content_json = response.json()
             except:
-                print("❌ 响应不是有效的JSON格式")
-                print(f"🔍 响应内容前500字符: {response.text[:500]}")
+                logger.error("❌ 响应不是有效的JSON格式")
+                logger.debug("🔍 响应内容前500字符: %s", response.text[:500])
                 return []
 
             # 调试：打印响应的关键信息
-            print(f"🔍 响应状态: {response.status_code}")
-            print(f"🔍 响应键: {list(content_json.keys())}")
+            logger.debug("🔍 响应状态: %s", response.status_code)
+            logger.debug("🔍 响应键: %s", list(content_json.keys()))
 
             # 检查是否有错误
             if "base_resp" in content_json:
                 base_resp = content_json["base_resp"]
-                print(f"🔍 base_resp: {base_resp}")
+                logger.debug("🔍 base_resp: %s", base_resp)
                 if base_resp.get("err_msg") == "freq control":
-                    print("⚠️ 遇到频率控制限制，建议稍后重试")
+                    logger.warning("⚠️ 遇到频率控制限制，建议稍后重试")
+                    self.rate_controller.on_throttle('freq_control')
+                    timer.outcome = 'freq_control'
                     return []
                 elif base_resp.get("ret") != 0:
-                    print(f"❌ API返回错误: ret={base_resp.get('ret')}, err_msg={base_resp.get('err_msg')}")
+                    logger.error("❌ API返回错误: ret=%s, err_msg=%s", base_resp.get('ret'), base_resp.get('err_msg'))
+                    timer.outcome = f"ret_{base_resp.get('ret')}"
                     return []
 
             # 检查是否需要验证
             if content_json.get("ret") == -3:
-                print("❌ Cookie验证失败，可能已过期")
-                print("💡 可能的原因:")
-                print("   1. Cookie已过期（通常24小时后过期）")
-                print("   2. Cookie格式不正确或被截断")
-                print("   3. 微信检测到异常访问模式")
-                print("💡 解决方案:")
-                print("   1. 重新运行程序获取新的Cookie")
-                print("   2. 确保在微信中正常访问文章后再抓取")
-                print("   3. 降低抓取频率，增加延迟时间")
+                self.rate_controller.on_throttle('ret_-3')
+                timer.outcome = 'ret_-3'
+                self.credential_health.on_expired()
+                if self.on_credential_invalid:
+                    try:
+                        self.on_credential_invalid(self.auth_info)
+                    except Exception as e:
+                        logger.warning("⚠️ 凭证失效回调出错: %s", e)
+                logger.error("❌ Cookie验证失败，可能已过期")
+                logger.info("💡 可能的原因:")
+                logger.info("   1. Cookie已过期（通常24小时后过期）")
+                logger.info("   2. Cookie格式不正确或被截断")
+                logger.info("   3. 微信检测到异常访问模式")
+                logger.info("💡 解决方案:")
+                logger.info("   1. 重新运行程序获取新的Cookie")
+                logger.info("   2. 确保在微信中正常访问文章后再抓取")
+                logger.info("   3. 降低抓取频率，增加延迟时间")
                 return []
 
             # 解析文章列表
             if "general_msg_list" not in content_json:
-                print("❌ 响应中没有找到文章列表")
-                print(f"🔍 完整响应: {content_json}")
+                logger.error("❌ 响应中没有找到文章列表")
+                logger.debug("🔍 完整响应: %s", content_json)
+                timer.outcome = 'empty'
                 return []
             
             articles_json = json.loads(content_json["general_msg_list"])
             articles = []
+            self.list_exhausted = content_json.get("can_msg_continue") == 0
+            index_rows = []
             
-            for item in articles_json.get("list", []):
+            for item_no, item in enumerate(articles_json.get("list", [])):
+                push_ts = item.get("comm_msg_info", {}).get("datetime", 0)
+                if push_ts and "app_msg_ext_info" in item:
+                    self.listing_pushes[push_ts] = 1 + len(item["app_msg_ext_info"].get("multi_app_msg_item_list", []))
+                push_offset = begin_page * count + item_no
+                first_article = len(articles)
                 # 处理主文章
                 if "app_msg_ext_info" in item and item["app_msg_ext_info"].get("content_url"):
                     main_article = item["app_msg_ext_info"]
@@ -374,13 +535,22 @@ class BatchReadnumSpider:
                             "digest": sub_article.get("digest", ""),
                             "create_time": item.get("comm_msg_info", {}).get("datetime", 0)
                         })
-            
-            print(f"✅ 成功获取 {len(articles)} 篇文章")
+                index_rows.extend({**a, 'offset': push_offset} for a in articles[first_article:])
+
+            if self.article_index:
+                self.article_index.record_listing(self.biz, index_rows)
+            self.rate_controller.on_success()
+            self._breaker_success()
+            logger.info("✅ 成功获取 %s 篇文章", len(articles))
+            timer.outcome = 'ok'
             return articles
             
         except Exception as e:
-            print(f"❌ 获取文章列表失败: {e}")
+            logger.error("❌ 获取文章列表失败: %s", e)
             return []
+        finally:
+            timer.finish()
+            self._ledger('list', timer, pacing)
 
     def extract_article_content_and_stats(self, article_url):
         """
@@ -395,20 +565,24 @@ class BatchReadnumSpider:
         # 频率控制
         self.rate_limit()
 
+        # 网络请求与页面解析分别计时；请求的结果为该文章的最终判定
+        pacing = self._take_pacing()
+        fetch = self.metrics.timer('article_fetch', self.unit_name, outcome='error')
+        parse = None
         try:
-            print(f"📊 抓取统计数据: {article_url[:50]}...")
+            logger.debug("📊 抓取统计数据: %s...", article_url[:50])
 
             # 修复HTML编码的URL
             import html
             clean_url = html.unescape(article_url)
-            print(f"🔍 清理后URL: {clean_url}")
+            logger.debug("🔍 清理后URL: %s", clean_url)
 
             # 解析URL获取参数
             from urllib.parse import urlparse, parse_qs
             parsed_url = urlparse(clean_url)
             query_params = parse_qs(parsed_url.query)
 
-            print(f"🔍 解析到的参数: {query_params}")
+            logger.debug("🔍 解析到的参数: %s", query_params)
 
             # 构建请求参数，参考spider_readnum.py的成功实现
             # 注意：spider_readnum.py中参数都是列表格式
@@ -425,44 +599,51 @@ class BatchReadnumSpider:
 
             params['wx_header'] = ['1']
 
-            print(f"🔍 请求参数: {params}")
+            logger.debug("🔍 请求参数: %s", params)
 
             # 使用实例的headers（已经包含了抓包获取的关键参数）
             headers = self.headers.copy()
 
-            print(f"🔍 使用headers: {list(headers.keys())}")
+            logger.debug("🔍 使用headers: %s", list(headers.keys()))
 
             # 验证关键的x-wechat-key是否存在
             if 'x-wechat-key' in headers:
-                print(f"🔑 确认x-wechat-key存在: {headers['x-wechat-key'][:20]}...")
+                logger.debug("🔑 确认x-wechat-key存在: %s...", headers['x-wechat-key'][:20])
             else:
-                print("❌ 警告：x-wechat-key不存在，可能无法获取阅读量数据")
+                logger.error("❌ 警告：x-wechat-key不存在，可能无法获取阅读量数据")
 
             # 添加Cookie
             headers['Cookie'] = self.cookie_str
 
-            # 使用代理管理器临时禁用系统代理
-            with self.manage_system_proxy("127.0.0.1:8080"):
+            # 使用代理管理器临时禁用系统代理（直连模式下无需改动系统代理）
+            proxy_guard = contextlib.nullcontext() if self.bypass_system_proxy else self.manage_system_proxy("127.0.0.1:8080")
+            with proxy_guard:
                 # 使用GET请求访问文章页面
-                base_url = "https://mp.weixin.qq.com/s"
+                base_url = f"{self.mp_base_url}/s"
                 # 获取单篇文章：同样使用超时与重试
                 for attempt in range(1, self.max_retries + 1):
                     try:
-                        response = requests.get(base_url, params=params, headers=headers, timeout=self.timeout)
+                        self._count_request('article')
+                        response = requests.get(base_url, params=params, headers=headers, timeout=self.timeout,
+                                                proxies=self.request_proxies)
                         break
                     except Exception as e:
                         if attempt == self.max_retries:
-                            print(f"❌ 文章请求失败（第{attempt}次/共{self.max_retries}次）: {e}")
+                            logger.error("❌ 文章请求失败（第%s次/共%s次）: %s", attempt, self.max_retries, e)
                             return None
                         wait = min(3, attempt)
-                        print(f"⚠️ 文章请求异常第{attempt}次，{wait}s后重试: {e}")
-                        time.sleep(wait)
+                        logger.warning("⚠️ 文章请求异常第%s次，%ss后重试: %s", attempt, wait, e)
+                        self._sleep(wait * self.delay_scale, 'retry_backoff')
 
+                fetch.stop()
+                fetch.bytes = len(response.content)
                 if response.status_code != 200:
-                    print(f"❌ 文章请求失败，状态码: {response.status_code}")
+                    logger.error("❌ 文章请求失败，状态码: %s", response.status_code)
+                    fetch.outcome = f"http_{response.status_code}"
                     return None
 
                 html_content = response.text
+                parse = self.metrics.timer('parse', self.unit_name)
 # ----- 保存到html-----debug测试
                 # # 保存HTML内容到debug目录
                 # try:
@@ -497,9 +678,11 @@ class BatchReadnumSpider:
 
                 # 检查是否遇到验证码页面
                 if "环境异常" in html_content or "完成验证" in html_content or "secitptpage/verify" in html_content:
-                    print("⚠️ 遇到微信验证码页面，需要手动验证")
-                    print(f"📄 请手动在浏览器中访问: {article_url}")
-                    print("💡 建议：降低抓取频率，增加延迟时间")
+                    logger.warning("⚠️ 遇到微信验证码页面，需要手动验证")
+                    logger.info("📄 请手动在浏览器中访问: %s", article_url)
+                    logger.info("💡 建议：降低抓取频率，增加延迟时间")
+                    self.rate_controller.on_throttle('captcha')
+                    fetch.outcome = 'captcha'
                     return {
                         'read_count': -1,  # 用-1表示验证码页面
                         'like_count': -1,
@@ -509,7 +692,8 @@ class BatchReadnumSpider:
 
                 # 检查是否为真实文章页面
                 if "js_content" not in html_content and "rich_media_content" not in html_content:
-                    print("⚠️ 非文章页面，可能被重定向或文章不存在")
+                    logger.warning("⚠️ 非文章页面，可能被重定向或文章不存在")
+                    fetch.outcome = 'not_article_page'
                     return {
                         'read_count': -2,  # 用-2表示非文章页面
                         'like_count': -2,
@@ -547,100 +731,131 @@ class BatchReadnumSpider:
                 }
 
                 # 使用spider_readnum.py中验证成功的正则表达式提取统计数据
-
-                # 提取阅读量 - 使用成功验证的模式
-                read_num_match = re.search(r"var cgiData = {[^}]*?read_num: '(\d+)'", html_content)
-                read_count = int(read_num_match.group(1)) if read_num_match else 0
+                stats = self.extract_stats(html_content)
+                read_count = stats['read_count']
 
                 if read_count > 0:
-                    print(f"🔍 阅读量: {read_count}")
+                    logger.debug("🔍 阅读量: %s", read_count)
                 else:
-                    print("⚠️ 未找到阅读量数据，可能该文章未公开显示阅读量")
+                    logger.debug("⚠️ 未找到阅读量数据，可能该文章未公开显示阅读量")
 
                 article_data["read_count"] = read_count
 
-                # 若阅读量为0且非验证码/非文章页面，标记为疑似key过期，供上层触发re-key
-                if read_count == 0:
+                # 若阅读量为0且非验证码/非文章页面，判定是否真的key过期，供上层触发re-key
+                verdict = self.expiry_classifier.classify(html_content, read_count)
+                article_data["stats_status"] = verdict.label
+                if verdict.label == KEY_EXPIRED:
                     article_data["error"] = article_data.get("error") or "key_expired"
+                elif read_count == 0:
+                    logger.debug("ℹ️ 阅读量为0但判定key仍有效（%s: %s）", verdict.label, '; '.join(verdict.reasons))
 
-                # 提取点赞数 - 使用成功验证的模式
-                like_num_match = re.search(r"window\.appmsg_bar_data = {[^}]*?like_count: '(\d+)'", html_content)
-                like_count = int(like_num_match.group(1)) if like_num_match else 0
-
-                if like_count > 0:
-                    print(f"🔍 点赞数: {like_count}")
+                if stats['like_count'] > 0:
+                    logger.debug("🔍 点赞数: %s", stats['like_count'])
                 else:
-                    print("⚠️ 未找到点赞数据")
-
-                article_data["like_count"] = like_count
-
-                # 提取历史点赞数 - 使用成功验证的模式
-                old_like_num_match = re.search(r"window\.appmsg_bar_data = {[^}]*?old_like_count: '(\d+)'", html_content)
-                old_like_count = int(old_like_num_match.group(1)) if old_like_num_match else 0
-
-                if old_like_count > 0:
-                    print(f"🔍 历史点赞数: {old_like_count}")
-
-                article_data["old_like_count"] = old_like_count
-
-                # 提取分享数 - 使用成功验证的模式
-                share_count_match = re.search(r"window\.appmsg_bar_data = {[^}]*?share_count: '(\d+)'", html_content)
-                share_count = int(share_count_match.group(1)) if share_count_match else 0
-
-                if share_count > 0:
-                    print(f"🔍 分享数: {share_count}")
-
-                article_data["share_count"] = share_count
-
-                print(f"✅ 统计数据: 阅读{article_data['read_count']} 点赞{article_data['like_count']} 分享{article_data['share_count']}")
+                    logger.debug("⚠️ 未找到点赞数据")
+                if stats['old_like_count'] > 0:
+                    logger.debug("🔍 历史点赞数: %s", stats['old_like_count'])
+                if stats['share_count'] > 0:
+                    logger.debug("🔍 分享数: %s", stats['share_count'])
+
+                article_data["like_count"] = stats['like_count']
+                article_data["old_like_count"] = stats['old_like_count']
+                article_data["share_count"] = stats['share_count']
+
+                self.rate_controller.on_success()
+                self._breaker_success()
+                logger.info("✅ %s: 阅读%s 点赞%s 分享%s", article_data['title'][:30], article_data['read_count'], article_data['like_count'], article_data['share_count'])
+                fetch.outcome = article_data.get('error') or 'ok'
                 return article_data
 
         except Exception as e:
-            print(f"❌ 提取统计数据失败: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("❌ 提取统计数据失败: %s", e)
             return None
+        finally:
+            fetch.finish()
+            self._ledger('article', fetch, pacing)
+            if parse:
+                parse.finish()
 
-    def refresh_wechat_key_for_article(self, article_url: str) -> bool:
+    def refresh_wechat_key_for_article(self, article_url: str, proactive: bool = False) -> bool:
         """
         触发一次临时抓包以刷新 x-wechat-key：
         1) 启动抓包器
         2) 优先刷新当前微信文章窗口；若失败/无新包，回退为发送链接再点击
         3) 读取最新cookie/headers，更新当前实例认证信息
+        :param proactive: 由健康度模型在空闲窗口内主动发起（不受 min_rekey_interval_sec 节流）
         """
+        timer = None
         try:
             now_ts = time.time()
             # 简单的节流，避免短时间内多次re-key
-            if self.last_key_refresh_time and (now_ts - self.last_key_refresh_time) < self.min_rekey_interval_sec:
+            if not proactive and self.last_key_refresh_time and (now_ts - self.last_key_refresh_time) < self.min_rekey_interval_sec:
                 remain = int(self.min_rekey_interval_sec - (now_ts - self.last_key_refresh_time))
-                print(f"⏳ 距上次key刷新过短（剩余{remain}s），跳过本次re-key")
+                logger.info("⏳ 距上次key刷新过短（剩余%ss），跳过本次re-key", remain)
                 return False
 
-            print("🔄 开始临时刷新x-wechat-key流程…")
-            reader = ReadCookie()
-            if not reader.start_cookie_extractor():
-                print("❌ 抓包器启动失败，无法刷新key")
+            logger.info("🔄 开始临时刷新x-wechat-key流程…")
+            self._count_request('rekey')
+            pacing = self._take_pacing()
+            timer = self.metrics.timer('rekey', self.unit_name, outcome='failed')
+            if self.key_refresher:
+                auth_info = self.key_refresher(article_url)
+            else:
+                with CAPTURE_LOCK:
+                    auth_info = self._capture_fresh_auth_info(article_url)
+
+            if not auth_info:
+                logger.error("❌ 未能获取新的认证信息（x-wechat-key）")
+                return False
+
+            # 用新的认证信息更新当前实例
+            logger.info("✅ 获取到新的认证信息，正在更新请求头…")
+            self.auth_info = auth_info
+            if not self.load_auth_info():
+                logger.warning("⚠️ 新认证信息加载失败")
                 return False
 
+            self.last_key_refresh_time = time.time()
+            self.credential_health.track(self.auth_info, fresh=True)
+            self.expiry_classifier.reset()
+            logger.info("✅ x-wechat-key刷新完成")
+            timer.outcome = 'ok'
+            return True
+        except Exception as e:
+            logger.error("❌ 刷新key流程异常: %s", e)
+            return False
+        finally:
+            if timer:
+                timer.finish()
+                self._ledger('rekey', timer, pacing)
+
+    def _capture_fresh_auth_info(self, article_url: str):
+        """启动抓包器并通过刷新/重新打开文章窗口获取新的认证信息（调用方需持有 CAPTURE_LOCK）"""
+        try:
+            reader = ReadCookie()
+            if not reader.start_cookie_extractor(biz=self.biz):
+                logger.error("❌ 抓包器启动失败，无法刷新key")
+                return None
+
             # 优先：只刷新当前文章窗口，避免再次发送链接
             captured = False
             try:
                 if UI_AUTOMATION_AVAILABLE:
                     autom = WeChatBrowserAutomation()
-                    print("🔁 正在刷新当前微信文章窗口以触发新请求…")
+                    logger.info("🔁 正在刷新当前微信文章窗口以触发新请求…")
                     autom.auto_refresh_browser(refresh_count=self.refresh_count_cfg,
                                                refresh_delay=self.refresh_delay_cfg,
                                                cookie_reader=reader)
                 else:
-                    print("⚠️ UI自动化不可用，跳过窗口刷新步骤")
+                    logger.warning("⚠️ UI自动化不可用，跳过窗口刷新步骤")
             except Exception as e:
-                print(f"⚠️ 刷新文章窗口时出错: {e}")
+                logger.warning("⚠️ 刷新文章窗口时出错: %s", e)
 
             # 等待抓包结果（先给较短时间）
             if reader.wait_for_new_cookie(timeout=45):
                 captured = True
             else:
-                print("⚠️ 刷新未触发到新包，回退为重新打开该文章…")
+                logger.warning("⚠️ 刷新未触发到新包，回退为重新打开该文章…")
                 try:
                     if UI_AUTOMATION_AVAILABLE:
                         autom = WeChatBrowserAutomation()
@@ -648,9 +863,9 @@ class BatchReadnumSpider:
                         # 再等一次
                         captured = reader.wait_for_new_cookie(timeout=90)
                     else:
-                        print("❌ UI自动化不可用，无法回退到重新打开链接")
+                        logger.error("❌ UI自动化不可用，无法回退到重新打开链接")
                 except Exception as e:
-                    print(f"❌ 回退重新打开链接时出错: {e}")
+                    logger.error("❌ 回退重新打开链接时出错: %s", e)
 
             auth_info = None
             if captured:
@@ -662,23 +877,31 @@ class BatchReadnumSpider:
             except Exception:
                 pass
 
-            if not captured or not auth_info:
-                print("❌ 未能获取新的认证信息（x-wechat-key）")
-                return False
-
-            # 用新的认证信息更新当前实例
-            print("✅ 获取到新的认证信息，正在更新请求头…")
-            self.auth_info = auth_info
-            if not self.load_auth_info():
-                print("⚠️ 新认证信息加载失败")
-                return False
-
-            self.last_key_refresh_time = time.time()
-            print("✅ x-wechat-key刷新完成")
-            return True
+            return auth_info if captured else None
         except Exception as e:
-            print(f"❌ 刷新key流程异常: {e}")
-            return False
+            logger.error("❌ 抓包刷新key时出错: %s", e)
+            return None
+
+    def extract_stats(self, html_content):
+        """
+        从页面脚本中提取阅读量、点赞数、历史点赞数、分享数（未找到记为 0）
+        :param html_content: HTML内容
+        :return: {'read_count', 'like_count', 'old_like_count', 'share_count'}
+        """
+        # 提取阅读量 - 使用成功验证的模式
+        read_num_match = re.search(r"var cgiData = {[^}]*?read_num: '(\d+)'", html_content)
+        # 提取点赞数 - 使用成功验证的模式
+        like_num_match = re.search(r"window\.appmsg_bar_data = {[^}]*?like_count: '(\d+)'", html_content)
+        # 提取历史点赞数 - 使用成功验证的模式
+        old_like_num_match = re.search(r"window\.appmsg_bar_data = {[^}]*?old_like_count: '(\d+)'", html_content)
+        # 提取分享数 - 使用成功验证的模式
+        share_count_match = re.search(r"window\.appmsg_bar_data = {[^}]*?share_count: '(\d+)'", html_content)
+        return {
+            'read_count': int(read_num_match.group(1)) if read_num_match else 0,
+            'like_count': int(like_num_match.group(1)) if like_num_match else 0,
+            'old_like_count': int(old_like_num_match.group(1)) if old_like_num_match else 0,
+            'share_count': int(share_count_match.group(1)) if share_count_match else 0,
+        }
 
     def extract_article_content(self, html_content):
         """
@@ -716,25 +939,25 @@ class BatchReadnumSpider:
                 content_text = content_text.strip()
 
                 if content_text:
-                    print(f"✅ 成功提取文章内容，长度: {len(content_text)} 字符")
+                    logger.debug("✅ 成功提取文章内容，长度: %s 字符", len(content_text))
                     return content_text
 
             # 方法2: 如果BeautifulSoup失败，使用spider_readnum.py中验证成功的正则表达式方法
-            print("🔄 尝试使用正则表达式方法提取内容...")
+            logger.debug("🔄 尝试使用正则表达式方法提取内容...")
             content_match = re.search(r'id="js_content".*?>(.*?)</div>', html_content, re.S)
             if content_match:
                 # 简单清理HTML标签
                 content = re.sub(r'<.*?>', '', content_match.group(1))
                 content = content.strip()
                 if content:
-                    print(f"✅ 正则表达式方法成功提取内容，长度: {len(content)} 字符")
+                    logger.debug("✅ 正则表达式方法成功提取内容，长度: %s 字符", len(content))
                     return content
 
-            print("⚠️ 未找到文章内容")
+            logger.warning("⚠️ 未找到文章内容")
             return "未找到文章内容"
 
         except Exception as e:
-            print(f"⚠️ 提取文章内容失败: {e}")
+            logger.warning("⚠️ 提取文章内容失败: %s", e)
             return "提取内容失败"
 
     def extract_publish_time(self, html_content):
@@ -744,14 +967,14 @@ class BatchReadnumSpider:
         :return: 发布时间
         """
         try:
-            print("🔍 开始提取发布时间...")
+            logger.debug("🔍 开始提取发布时间...")
 
             # 优先尝试提取 var createTime = '2025-08-04 14:02'; 格式
             createtime_pattern = r"var createTime = '([^']+)'"
             match = re.search(createtime_pattern, html_content)
             if match:
                 found_time = match.group(1)
-                print(f"✅ 通过createTime变量找到发布时间: {found_time}")
+                logger.debug("✅ 通过createTime变量找到发布时间: %s", found_time)
                 return found_time
 
             # 尝试多种方式提取发布时间
@@ -782,14 +1005,14 @@ class BatchReadnumSpider:
                 match = re.search(pattern, html_content)
                 if match:
                     found_time = match.group(1)
-                    print(f"✅ 通过{description}找到发布时间: {found_time}")
+                    logger.debug("✅ 通过%s找到发布时间: %s", description, found_time)
 
                     # 如果是时间戳，转换为日期格式
                     if pattern.endswith("时间戳格式"):
                         try:
                             timestamp = int(found_time)
                             formatted_time = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
-                            print(f"🔄 时间戳转换结果: {formatted_time}")
+                            logger.debug("🔄 时间戳转换结果: %s", formatted_time)
                             return formatted_time
                         except:
                             pass
@@ -797,7 +1020,7 @@ class BatchReadnumSpider:
                     return found_time
 
             # 如果都没找到，尝试搜索任何包含日期的文本
-            print("🔍 尝试搜索任何日期格式...")
+            logger.debug("🔍 尝试搜索任何日期格式...")
             general_date_patterns = [
                 r'(\d{4}-\d{1,2}-\d{1,2})',
                 r'(\d{4}/\d{1,2}/\d{1,2})',
@@ -807,13 +1030,13 @@ class BatchReadnumSpider:
             for pattern in general_date_patterns:
                 matches = re.findall(pattern, html_content)
                 if matches:
-                    print(f"🔍 找到可能的日期: {matches[:5]}")  # 只显示前5个
+                    logger.debug("🔍 找到可能的日期: %s", matches[:5])  # 只显示前5个
 
-            print("❌ 未找到发布时间")
+            logger.error("❌ 未找到发布时间")
             return "未找到发布时间"
 
         except Exception as e:
-            print(f"⚠️ 提取发布时间失败: {e}")
+            logger.warning("⚠️ 提取发布时间失败: %s", e)
             return "提取时间失败"
 
     def extract_account_name(self, html_content):
@@ -823,14 +1046,14 @@ class BatchReadnumSpider:
         :return: 公众号名称
         """
         try:
-            print("🔍 开始提取公众号名称...")
+            logger.debug("🔍 开始提取公众号名称...")
 
             # 优先尝试提取 wx_follow_nickname 类的div中的内容
             nickname_pattern = r'<div[^>]*class="wx_follow_nickname"[^>]*>\s*([^<]+)\s*</div>'
             match = re.search(nickname_pattern, html_content)
             if match:
                 account_name = match.group(1).strip()
-                print(f"✅ 通过wx_follow_nickname找到公众号名称: {account_name}")
+                logger.debug("✅ 通过wx_follow_nickname找到公众号名称: %s", account_name)
                 return account_name
 
             # 尝试其他可能的模式
@@ -848,14 +1071,14 @@ class BatchReadnumSpider:
                 match = re.search(pattern, html_content)
                 if match:
                     account_name = match.group(1).strip()
-                    print(f"✅ 通过{description}找到公众号名称: {account_name}")
+                    logger.debug("✅ 通过%s找到公众号名称: %s", description, account_name)
                     return account_name
 
-            print("❌ 未找到公众号名称")
+            logger.error("❌ 未找到公众号名称")
             return "未找到公众号名称"
 
         except Exception as e:
-            print(f"⚠️ 提取公众号名称失败: {e}")
+            logger.warning("⚠️ 提取公众号名称失败: %s", e)
             return "提取名称失败"
 
     def clean_html_content(self, html_content):
@@ -888,32 +1111,263 @@ class BatchReadnumSpider:
             return html_content
 
         except Exception as e:
-            print(f"⚠️ 清理HTML内容失败: {e}")
+            logger.warning("⚠️ 清理HTML内容失败: %s", e)
             return html_content
 
+    @staticmethod
+    def _article_in_window(article, cutoff_date, lower_bound_dt, upper_bound_dt, tz) -> bool:
+        """判断文章是否落在抓取时间窗口内（与批量循环中的时间过滤规则一致）"""
+        if not article.get('create_time'):
+            return True
+        try:
+            article_date = datetime.fromtimestamp(article['create_time'], tz)
+        except Exception:
+            return True
+        if lower_bound_dt and upper_bound_dt:
+            return lower_bound_dt <= article_date < upper_bound_dt
+        return article_date >= cutoff_date
+
+    def _article_delay(self) -> float:
+        low, high = self.article_delay_range if len(self.article_delay_range) == 2 else (10, 15)
+        return random.randint(low, high) * self.delay_scale
+
+    def _wait_article_slot(self):
+        """
+        并发模式的文章间延迟：所有预取线程共享一条时间线，每篇文章占用 article_delay / 并发数，
+        整页的文章间等待总量与串行模式按并发数等比例缩短，而不是完全取消
+        """
+        with self._article_slot_lock:
+            now = time.time()
+            slot = max(now, self._article_slot)
+            self._article_slot = slot + self._article_delay() / self.article_concurrency
+        if slot > now:
+            logger.debug("⏳ 文章间延迟（并发共享）%.1f 秒...", slot - now)
+            self._sleep(slot - now, 'article_delay')
+
+    def _fetch_article_task(self, article_url, stop_event):
+        """
+        并发预取任务：返回 (抓取结果, 开始时间)；已中止或会话处于熔断冷却期时不再发起请求，返回 (None, None)
+        （熔断可能由同一会话上的其他爬虫打开，因此发请求前需再次确认）
+        """
+        if stop_event.is_set():
+            return None, None
+        self._wait_article_slot()
+        if stop_event.is_set():
+            return None, None
+        if not self._breaker_allows():
+            stop_event.set()
+            return None, None
+        started = time.time()
+        return self.extract_article_content_and_stats(article_url), started
+
+    # --------------- 验证码熔断 ---------------
+    def _breaker_key(self) -> str:
+        return utils.credential_id(self.auth_info)
+
+    def _breaker_allows(self) -> bool:
+        if not self.circuit_breaker:
+            return True
+        return self.circuit_breaker.allow(self._breaker_key(), f"{self.unit_name}#{id(self)}")
+
+    # --------------- 抓取统计 ---------------
+    @staticmethod
+    def _new_crawl_stats() -> dict:
+        return {
+            'used_pages': 0,              # 成功取到列表的页数
+            'effective_articles': 0,      # 时间窗口内成功获取统计数据的文章数
+            'outdated_articles': 0,       # 早于时间下界的文章数
+            'skipped_articles': 0,        # 未抓取的文章（窗口外较新段、非文章页、已处理、中断后剩余）
+            'failed_articles': 0,         # 请求/解析失败或 re-key 后仍无阅读量
+            'last_page_effective': 0,
+            'last_page_total': 0,
+            'reached_lower_bound': False, # 已看到早于下界的文章，或已翻到历史尽头
+            'stop_reason': None,          # lower_bound | history_end | list_failed | max_pages | captcha
+            'pages': [],                  # 每页 {page, total, effective, outdated, skipped, failed}
+            'requests': {'list': 0, 'article': 0, 'rekey': 0},
+            'started_at': time.time(),
+            'planned_start_page': 0,      # 借助文章索引跳过的起始页（>0 时列表不连续）
+            'settled_articles': 0,        # 阅读量已稳定或近期已获取、按索引跳过请求（结果取自索引）的文章数
+        }
+
+    def _count_request(self, kind: str):
+        with self._stats_lock:
+            requests_by_type = self.crawl_stats['requests']
+            requests_by_type[kind] = requests_by_type.get(kind, 0) + 1
+
+    def _record_page_stats(self, page: int, total: int, effective: int, outdated: int, failed: int):
+        skipped = max(0, total - effective - outdated - failed)
+        with self._stats_lock:
+            stats = self.crawl_stats
+            stats['used_pages'] += 1
+            stats['effective_articles'] += effective
+            stats['outdated_articles'] += outdated
+            stats['skipped_articles'] += skipped
+            stats['failed_articles'] += failed
+            stats['last_page_effective'] = effective
+            stats['last_page_total'] = total
+            if outdated > 0:
+                stats['reached_lower_bound'] = True
+            stats['pages'].append({'page': page, 'total': total, 'effective': effective,
+                                   'outdated': outdated, 'skipped': skipped, 'failed': failed})
+
+    def _record_processed(self, article, result):
+        """文章统计数据已获取：写入运行日志与文章索引"""
+        if self.journal:
+            self.journal.processed_article(article.get('url'))
+        if self.article_index:
+            self.article_index.mark_stats(self.biz, article.get('url'), result.get('read_count', 0),
+                                          result.get('like_count', 0), result.get('share_count', 0))
+
+    def _store_result(self, article, result, all_results):
+        """保存一篇已确认的文章结果：实时写入数据库、加入结果列表，并记入运行日志与文章索引"""
+        if self.save_to_db and self.db_manager:
+            try:
+                # 准备数据库插入数据
+                db_article_data = {
+                    'title': result.get('title', ''),
+                    'content': result.get('content', ''),
+                    'url': result.get('url', ''),
+                    'pub_time': result.get('pub_time', ''),
+                    'crawl_time': result.get('crawl_time', ''),
+                    'unit_name': self.unit_name or result.get('account_name', ''),
+                    'view_count': result.get('read_count', 0),
+                    'like_count': result.get('like_count', 0),
+                    'share_count': result.get('share_count', 0)
+                }
+
+                success = self.db_manager.insert_article(db_article_data)
+                if success:
+                    logger.debug("💾 第%s篇文章已保存到数据库: %s", len(all_results)+1, result.get('title', 'Unknown'))
+                else:
+                    # 检查是否是因为标题重复而跳过
+                    if result.get('title', '').strip() and self.db_manager.check_article_title_exists(result.get('title', '').strip()):
+                        logger.debug("⚠️ 第%s篇文章标题重复，已跳过: %s", len(all_results)+1, result.get('title', 'Unknown'))
+                    else:
+                        logger.error("❌ 第%s篇文章数据库保存失败: %s", len(all_results)+1, result.get('title', 'Unknown'))
+            except Exception as e:
+                logger.error("❌ 数据库保存出错: %s", e)
+
+        all_results.append(result)
+        self._record_processed(article, result)
+
+    def _settle_suspect_stats(self, effective: int, failed: int):
+        """暂存的疑似过期文章有了结论：从跳过数移入有效数/失败数"""
+        with self._stats_lock:
+            stats = self.crawl_stats
+            stats['skipped_articles'] -= effective + failed
+            stats['effective_articles'] += effective
+            stats['failed_articles'] += failed
+
+    def _accept_suspects(self, all_results):
+        """后续文章取到了非零阅读量，说明 key 有效：暂存的疑似文章阅读量确实为 0，按原结果保存"""
+        if not self.suspect_articles:
+            return
+        pending, self.suspect_articles = self.suspect_articles, []
+        logger.debug("✅ key 仍有效，保存 %s 篇暂存的阅读量为0文章", len(pending))
+        for article, result in pending:
+            self._store_result(article, result, all_results)
+        self._settle_suspect_stats(len(pending), 0)
+
+    def _refetch_suspects(self, all_results, rekey_ok: bool):
+        """
+        key 过期已确认：暂存的疑似文章很可能也是用过期 key 取到的 0，re-key 成功后逐篇重新抓取；
+        re-key 失败或重新抓取失败的计入失败，不写入运行日志与文章索引，下次运行重新抓取
+        """
+        if not self.suspect_articles:
+            return
+        pending, self.suspect_articles = self.suspect_articles, []
+        effective = failed = 0
+        for article, result in pending:
+            retry_data = None
+            if rekey_ok:
+                self._sleep(random.randint(2, 4) * self.delay_scale, 'retry_backoff')
+                retry_data = self.extract_article_content_and_stats(article['url'])
+            if retry_data and not retry_data.get('error'):
+                self._store_result(article, {**result, **retry_data}, all_results)
+                effective += 1
+            else:
+                failed += 1
+        if rekey_ok:
+            logger.info("🔁 重新抓取 %s 篇 key 过期前暂存的文章：成功 %s 篇，失败 %s 篇", len(pending), effective, failed)
+        else:
+            logger.error("❌ %s 篇暂存的疑似 key 过期文章未能重新抓取，下次运行重试", failed)
+        self._settle_suspect_stats(effective, failed)
+
+    def _index_reusable(self, article) -> dict:
+        """
+        文章本次无需请求时返回索引中的统计数据：发布足够久之后已获取过（数值基本稳定），
+        或尚未稳定但距上次获取不足 article_index_refresh_interval_hours（刷新计划，0 = 每次运行都重新获取）
+        """
+        if not self.article_index:
+            return None
+        return self.article_index.reusable_stats(self.biz, article.get('url'), self.index_settle_sec,
+                                                 self.index_refresh_interval_sec)
+
+    def _plan_start_page(self, upper_bound_dt, count: int) -> tuple:
+        """
+        分段回填时借助文章索引跳过比阶段上界更新的页：
+        按索引估算第一条早于上界的推送所在页，取该页验证其最新文章不早于上界（否则可能漏掉边界文章，逐页回退）
+        :return: (起始页, {页号: 已取到的文章列表})
+        """
+        upper_ts = upper_bound_dt.timestamp()
+        offset = self.article_index.estimate_offset(self.biz, upper_ts)
+        if not offset:
+            return 0, {}
+        page = max(0, offset // max(1, count) - 1)
+        for _ in range(5):
+            if page <= 0:
+                return 0, {}
+            articles = self.get_article_list(begin_page=page, count=count)
+            if not articles:
+                return 0, {}
+            if max(a['create_time'] for a in articles) >= upper_ts:
+                logger.info("🗂️ 文章索引规划：跳过前 %s 页（均晚于阶段上界），从第 %s 页开始", page, page + 1)
+                return page, {page: articles}
+            page -= 1
+        return 0, {}
+
+    def _journal_processed(self, article) -> bool:
+        """该文章是否已在之前（崩溃前）的运行中处理过"""
+        return bool(self.journal) and self.journal.is_processed(article.get('url'))
+
+    def _breaker_success(self):
+        if self.circuit_breaker:
+            self.circuit_breaker.record_success(self._breaker_key())
+
     def batch_crawl_readnum(self, max_pages=200, articles_per_page=5, days_back=90, 
-                             lower_bound_dt=None, upper_bound_dt=None, stage_label: str = None):
+                             lower_bound_dt=None, upper_bound_dt=None, stage_label: str = None,
+                             start_page: int = 0, start_article_index: int = 0, hard_max_pages: int = None):
         """
         批量抓取文章阅读量
         :param max_pages: 最大页数
         :param articles_per_page: 每页文章数
         :param days_back: 抓取多少天内的文章
+        :param start_page: 从第几页开始（熔断/中断后恢复）
+        :param start_article_index: 起始页内从第几篇文章开始
+        :param hard_max_pages: max_pages 为估算值时的硬上限：翻满 max_pages 仍未触达时间下界则继续翻页，直到该上限
         :return: 抓取结果列表
         """
-        print(f"🚀 开始批量抓取阅读量数据")
+        self.captcha_resume = None
+        self.crawl_finished = False
+        self.crawl_stats = self._new_crawl_stats()
+        # 阅读量为0、判定器暂无法确定 key 是否有效的文章 [(文章, 结果)]，待确认后再保存
+        self.suspect_articles = []
+        self.listing_pushes = {}
+        logger.info("🚀 开始批量抓取阅读量数据")
         if lower_bound_dt and upper_bound_dt:
-            print(f"📋 分段回填阶段: {stage_label or ''} 时间窗口 {lower_bound_dt.strftime('%Y-%m-%d %H:%M:%S')} -> {upper_bound_dt.strftime('%Y-%m-%d %H:%M:%S')} (左闭右开)")
+            logger.info("📋 分段回填阶段: %s 时间窗口 %s -> %s (左闭右开)", stage_label or '', lower_bound_dt.strftime('%Y-%m-%d %H:%M:%S'), upper_bound_dt.strftime('%Y-%m-%d %H:%M:%S'))
         else:
-            print(f"📋 参数: 最大{max_pages}页，每页{articles_per_page}篇，最近{days_back}个自然日 + 当天(到当前) 内文章")
+            logger.info("📋 参数: 最大%s页，每页%s篇，最近%s个自然日 + 当天(到当前) 内文章", max_pages, articles_per_page, days_back)
 
         if not self.load_auth_info():
-            print("❌ 认证信息加载失败，无法继续")
+            logger.error("❌ 认证信息加载失败，无法继续")
             return []
 
         # 验证Cookie有效性
         if not self.validate_cookie():
-            print("❌ Cookie验证失败，请重新获取Cookie")
+            logger.error("❌ Cookie验证失败，请重新获取Cookie")
             return []
+        self.credential_health.track(self.auth_info)
 
         # 初始化结果与时间窗口（自然日语义）
         # days_back = 1 => 昨日00:00:00 到 今天当前时间
@@ -928,27 +1382,75 @@ class BatchReadnumSpider:
         else:
             today_start = now_bj.replace(hour=0, minute=0, second=0, microsecond=0)
             cutoff_date = today_start - timedelta(days=days_back)
-            print("🕒 时间窗口(自然日模式):")
-            print(f"   当前北京时间: {now_bj.strftime('%Y-%m-%d %H:%M:%S')}")
-            print(f"   起始(含): {cutoff_date.strftime('%Y-%m-%d %H:%M:%S')} —— 从该日00:00:00开始")
-            print(f"   结束(含): 当前时刻 (不等待当天结束)")
-
-        for page in range(max_pages):
-            print(f"\n{'='*50}")
-            print(f"📄 处理第 {page+1}/{max_pages} 页")
+            logger.info("🕒 时间窗口(自然日模式):")
+            logger.info("   当前北京时间: %s", now_bj.strftime('%Y-%m-%d %H:%M:%S'))
+            logger.info("   起始(含): %s —— 从该日00:00:00开始", cutoff_date.strftime('%Y-%m-%d %H:%M:%S'))
+            logger.info("   结束(含): 当前时刻 (不等待当天结束)")
+
+        planned_listing = {}
+        if self.article_index and upper_bound_dt and start_page == 0 and start_article_index == 0:
+            start_page, planned_listing = self._plan_start_page(upper_bound_dt, articles_per_page)
+            self.crawl_stats['planned_start_page'] = start_page
+
+        page_limit = max(max_pages, hard_max_pages or 0)
+        for page in range(start_page, page_limit):
+            if page >= max_pages:
+                # 估算页数已用完：已触达时间下界则停止，否则继续翻页以免漏掉窗口内较早的文章
+                if self.crawl_stats['reached_lower_bound']:
+                    self.crawl_stats['stop_reason'] = 'max_pages'
+                    break
+                if page == max_pages:
+                    logger.info("📄 估算的 %s 页已用完但未触达时间下界，继续翻页（最多 %s 页）", max_pages, page_limit)
+            logger.info("=" * 50)
+            logger.info("📄 处理第 %s/%s 页", page+1, page_limit)
+            page_started = time.time()
+            skip_before = start_article_index if page == start_page else 0
+
+            # 同一会话已被其他账号触发熔断时不再发出请求
+            if not self._breaker_allows():
+                logger.info("🔌 当前会话处于验证码熔断冷却期，暂停本公众号，稍后从此处恢复")
+                self.captcha_resume = {'page': page, 'article_index': skip_before}
+                self.crawl_stats['stop_reason'] = 'captcha'
+                break
 
             # 获取文章列表
-            articles = self.get_article_list(begin_page=page, count=articles_per_page)
+            articles = planned_listing.pop(page, None) or self.get_article_list(begin_page=page, count=articles_per_page)
 
             if not articles:
-                print("❌ 未获取到文章，停止抓取")
+                logger.error("❌ 未获取到文章，停止抓取")
+                if self.list_exhausted:
+                    self.crawl_stats['reached_lower_bound'] = True
+                    self.crawl_stats['stop_reason'] = 'history_end'
+                else:
+                    self.crawl_stats['stop_reason'] = 'list_failed'
                 break
 
             page_results = []
             outdated_count = 0
+            failed_count = 0
+            settled_count = 0
+
+            # 并发模式：预先并发抓取本页时间窗口内的文章，下方循环仍按原顺序消费结果
+            prefetched = {}
+            executor = None
+            stop_event = threading.Event()
+            if self.article_concurrency > 1:
+                executor = ThreadPoolExecutor(max_workers=self.article_concurrency)
+                for idx, pending in enumerate(articles):
+                    if idx >= skip_before and not self._journal_processed(pending) and not self._index_reusable(pending) \
+                            and self._article_in_window(pending, cutoff_date, lower_bound_dt, upper_bound_dt, beijing_tz):
+                        prefetched[idx] = executor.submit(self._fetch_article_task, pending['url'], stop_event)
+                logger.debug("⚡ 并发抓取本页 %s 篇文章（并发数 %s）", len(prefetched), self.article_concurrency)
 
             for i, article in enumerate(articles):
-                print(f"\n📖 处理文章 {i+1}/{len(articles)}: {article['title'][:30]}...")
+                if i < skip_before:
+                    continue
+                if self._journal_processed(article):
+                    logger.debug("⏭️ 文章 %s/%s 在上次运行中已处理，跳过", i+1, len(articles))
+                    continue
+                if self.journal:
+                    self.journal.cursor(page, i)
+                logger.debug("📖 处理文章 %s/%s: %s...", i+1, len(articles), article['title'][:30])
 
                 # 检查文章时间
                 if article['create_time']:
@@ -957,83 +1459,104 @@ class BatchReadnumSpider:
                         if lower_bound_dt and upper_bound_dt:
                             # 分段模式：保留 lower_bound_dt <= date < upper_bound_dt
                             if article_date < lower_bound_dt:
-                                print(f"⏰ (过深) {article_date.strftime('%Y-%m-%d %H:%M:%S')} < {lower_bound_dt.strftime('%Y-%m-%d %H:%M:%S')} 跳过")
+                                logger.debug("⏰ (过深) %s < %s 跳过", article_date.strftime('%Y-%m-%d %H:%M:%S'), lower_bound_dt.strftime('%Y-%m-%d %H:%M:%S'))
                                 outdated_count += 1
                                 continue
                             if article_date >= upper_bound_dt:
-                                print(f"⏭️ (已抓较新段) {article_date.strftime('%Y-%m-%d %H:%M:%S')} >= {upper_bound_dt.strftime('%Y-%m-%d %H:%M:%S')} 跳过")
+                                logger.debug("⏭️ (已抓较新段) %s >= %s 跳过", article_date.strftime('%Y-%m-%d %H:%M:%S'), upper_bound_dt.strftime('%Y-%m-%d %H:%M:%S'))
                                 continue
                         else:
                             if article_date < cutoff_date:
-                                print(f"⏰ 文章时间 {article_date.strftime('%Y-%m-%d %H:%M:%S')} 早于窗口起始 {cutoff_date.strftime('%Y-%m-%d %H:%M:%S')}，跳过")
+                                logger.debug("⏰ 文章时间 %s 早于窗口起始 %s，跳过", article_date.strftime('%Y-%m-%d %H:%M:%S'), cutoff_date.strftime('%Y-%m-%d %H:%M:%S'))
                                 outdated_count += 1
                                 continue
                     except Exception as _:
                         pass
 
+                # 文章索引显示阅读量已稳定或近期已获取，无需再次请求：结果取自索引，导出时不缺这篇文章
+                indexed = self._index_reusable(article)
+                if indexed:
+                    logger.debug("🗂️ 阅读量已稳定或近期已获取（文章索引中已有记录），跳过请求")
+                    all_results.append({
+                        **article,
+                        "read_count": indexed['read_count'],
+                        "like_count": indexed['like_count'],
+                        "share_count": indexed['share_count'],
+                        "crawl_time": datetime.fromtimestamp(indexed['stats_at']).strftime("%Y-%m-%d %H:%M:%S"),
+                        "pub_time": datetime.fromtimestamp(article['create_time'], beijing_tz).strftime("%Y-%m-%d %H:%M:%S") if article['create_time'] else "",
+                        "stage": stage_label or "",
+                        "stats_status": "indexed"
+                    })
+                    settled_count += 1
+                    continue
+
                 # 抓取文章内容和统计数据
-                article_data = self.extract_article_content_and_stats(article['url'])
+                fetch_started = None
+                if not self._breaker_allows():
+                    # 预取结果同样不再消费：取消本页其余预取，从当前文章恢复
+                    stop_event.set()
+                    logger.info("🔌 当前会话进入验证码熔断冷却期，暂停本公众号，稍后从此处恢复")
+                    self.captcha_resume = {'page': page, 'article_index': i}
+                    break
+                if i in prefetched:
+                    article_data, fetch_started = prefetched.pop(i).result()
+                    if fetch_started is None:
+                        # 预取时会话处于冷却期而未发请求，现已放行：改为当前线程抓取
+                        article_data = self.extract_article_content_and_stats(article['url'])
+                else:
+                    article_data = self.extract_article_content_and_stats(article['url'])
 
                 if article_data:
                     # 检查是否遇到验证码
                     if article_data.get('error') == 'captcha_required':
-                        print(f"🛑 遇到验证码，停止批量抓取")
-                        print(f"💡 建议：手动完成验证后重新运行，或降低抓取频率")
+                        logger.info("🛑 遇到验证码，停止批量抓取")
+                        logger.info("💡 建议：手动完成验证后重新运行，或降低抓取频率")
+                        stop_event.set()
+                        if self.circuit_breaker:
+                            self.circuit_breaker.record_captcha(self._breaker_key())
+                        self.captcha_resume = {'page': page, 'article_index': i}
                         break
 
                     # 检查是否为非文章页面
                     elif article_data.get('error') == 'not_article_page':
-                        print(f"⚠️ 非文章页面，跳过")
+                        logger.debug("⚠️ 非文章页面，跳过")
                         continue
 
                     # 检测疑似key过期（阅读量=0），触发一次re-key并重试当前文章
                     elif article_data.get('error') == 'key_expired':
-                        print("⚠️ 读取到阅读量为0，疑似x-wechat-key过期，尝试刷新key并重试…")
-                        rekey_ok = self.refresh_wechat_key_for_article(article['url'])
+                        logger.warning("⚠️ 读取到阅读量为0，疑似x-wechat-key过期，尝试刷新key并重试…")
+                        if fetch_started and self.last_key_refresh_time and fetch_started < self.last_key_refresh_time:
+                            # 并发预取发生在本页已完成的key刷新之前，直接用新key重试
+                            logger.info("🔁 该文章在key刷新前已预取，直接使用新key重试…")
+                            rekey_ok = True
+                        else:
+                            self.credential_health.on_expired()
+                            rekey_ok = self.refresh_wechat_key_for_article(article['url'])
                         if rekey_ok:
                             # 重试一次当前文章
-                            time.sleep(random.randint(2, 4))
+                            self._sleep(random.randint(2, 4) * self.delay_scale, 'retry_backoff')
                             retry_data = self.extract_article_content_and_stats(article['url'])
                             if retry_data and retry_data.get('read_count', 0) > 0 and not retry_data.get('error'):
-                                print("✅ 重试成功，已获取非零阅读量")
+                                logger.info("✅ 重试成功，已获取非零阅读量")
                                 result = {
                                     **article,
                                     **retry_data,
                                     "pub_time": article_date.strftime("%Y-%m-%d %H:%M:%S") if article.get('create_time') else ""
                                 }
                                 # 实时保存到数据库（与正常路径一致）
-                                if self.save_to_db and self.db_manager:
-                                    try:
-                                        db_article_data = {
-                                            'title': result.get('title', ''),
-                                            'content': result.get('content', ''),
-                                            'url': result.get('url', ''),
-                                            'pub_time': result.get('pub_time', ''),
-                                            'crawl_time': result.get('crawl_time', ''),
-                                            'unit_name': self.unit_name or result.get('account_name', ''),
-                                            'view_count': result.get('read_count', 0),
-                                            'like_count': result.get('like_count', 0),
-                                            'share_count': result.get('share_count', 0)
-                                        }
-                                        success = self.db_manager.insert_article(db_article_data)
-                                        if success:
-                                            print(f"💾 第{len(all_results)+1}篇文章已保存到数据库: {result.get('title', 'Unknown')}")
-                                        else:
-                                            if result.get('title', '').strip() and self.db_manager.check_article_title_exists(result.get('title', '').strip()):
-                                                print(f"⚠️ 第{len(all_results)+1}篇文章标题重复，已跳过: {result.get('title', 'Unknown')}")
-                                            else:
-                                                print(f"❌ 第{len(all_results)+1}篇文章数据库保存失败: {result.get('title', 'Unknown')}")
-                                    except Exception as e:
-                                        print(f"❌ 数据库保存出错: {e}")
-
+                                self._store_result(article, result, all_results)
                                 page_results.append(result)
-                                all_results.append(result)
-                                print(f"✅ 完成 {len(all_results)} 篇文章")
+                                logger.debug("✅ 完成 %s 篇文章", len(all_results))
                                 # 文章间延迟逻辑保留
+                                self._refetch_suspects(all_results, rekey_ok=True)
                             else:
-                                print("❌ 重试后阅读量仍为0或失败，继续下篇")
+                                logger.error("❌ 重试后阅读量仍为0或失败，继续下篇")
+                                failed_count += 1
+                                self._refetch_suspects(all_results, rekey_ok=False)
                         else:
-                            print("❌ 刷新key失败，继续下篇")
+                            logger.error("❌ 刷新key失败，继续下篇")
+                            failed_count += 1
+                            self._refetch_suspects(all_results, rekey_ok=False)
                         # 无论成败，进入下一篇
                         continue
 
@@ -1047,72 +1570,101 @@ class BatchReadnumSpider:
                             "stage": stage_label or ""
                         }
 
-                        # 实时保存到数据库
-                        if self.save_to_db and self.db_manager:
-                            try:
-                                # 准备数据库插入数据
-                                db_article_data = {
-                                    'title': result.get('title', ''),
-                                    'content': result.get('content', ''),
-                                    'url': result.get('url', ''),
-                                    'pub_time': result.get('pub_time', ''),
-                                    'crawl_time': result.get('crawl_time', ''),
-                                    'unit_name': self.unit_name or result.get('account_name', ''),
-                                    'view_count': result.get('read_count', 0),
-                                    'like_count': result.get('like_count', 0),
-                                    'share_count': result.get('share_count', 0)
-                                }
+                        # 阅读量为0且无法判定 key 是否有效：暂存，待后续文章确认 key 有效或 re-key 后重新抓取
+                        if article_data.get('stats_status') == SUSPECT:
+                            logger.debug("🕵️ 阅读量为0且无法判定key是否有效，暂存待确认")
+                            self.suspect_articles.append((article, result))
+                        else:
+                            self.credential_health.on_ok()
+                            if result.get('read_count', 0) > 0:
+                                self._accept_suspects(all_results)
+                            self._store_result(article, result, all_results)
+                            page_results.append(result)
 
-                                success = self.db_manager.insert_article(db_article_data)
-                                if success:
-                                    print(f"💾 第{len(all_results)+1}篇文章已保存到数据库: {result.get('title', 'Unknown')}")
-                                else:
-                                    # 检查是否是因为标题重复而跳过
-                                    if result.get('title', '').strip() and self.db_manager.check_article_title_exists(result.get('title', '').strip()):
-                                        print(f"⚠️ 第{len(all_results)+1}篇文章标题重复，已跳过: {result.get('title', 'Unknown')}")
-                                    else:
-                                        print(f"❌ 第{len(all_results)+1}篇文章数据库保存失败: {result.get('title', 'Unknown')}")
-                            except Exception as e:
-                                print(f"❌ 数据库保存出错: {e}")
-
-                        page_results.append(result)
-                        all_results.append(result)
-
-                        print(f"✅ 完成 {len(all_results)} 篇文章")
+                            logger.debug("✅ 完成 %s 篇文章", len(all_results))
                 else:
-                    print(f"❌ 统计数据获取失败")
-
-                # 文章间延迟
-                if i < len(articles) - 1:
-                    low, high = self.article_delay_range if len(self.article_delay_range) == 2 else (10, 15)
-                    delay = random.randint(low, high)
-                    print(f"⏳ 文章间延迟 {delay} 秒...")
-                    time.sleep(delay)
-
-            print(f"📊 本页完成 {len(page_results)} 篇文章，超时 {outdated_count} 篇")
+                    logger.error("❌ 统计数据获取失败")
+                    failed_count += 1
+
+                # 文章间延迟（并发模式下由预取线程按共享节奏等待，见 _wait_article_slot）
+                if executor is None and i < len(articles) - 1:
+                    delay = self._article_delay()
+                    logger.debug("⏳ 文章间延迟 %.1f 秒...", delay)
+                    self._sleep(delay, 'article_delay')
+
+            if executor is not None:
+                # 验证码中止等情况下，取消尚未开始的预取任务
+                stop_event.set()
+                executor.shutdown(wait=True, cancel_futures=True)
+
+            logger.info("📊 本页完成 %s 篇文章，超时 %s 篇", len(page_results), outdated_count)
+            # 按索引跳过的稳定文章同样在时间窗口内，计入有效数以免拉低自适应估算
+            self._record_page_stats(page, len(articles), len(page_results) + settled_count, outdated_count, failed_count)
+            self.crawl_stats['settled_articles'] += settled_count
+
+            # 遇到验证码/熔断后继续翻页只会得到更多验证码页面，直接停止
+            if self.captcha_resume:
+                self.crawl_stats['stop_reason'] = 'captcha'
+                break
 
             # 如果本页大部分文章都超时，停止抓取
             if outdated_count > len(articles) * 0.7:
-                print("🛑 大部分文章超出时间范围，停止抓取")
+                logger.info("🛑 大部分文章超出时间范围，停止抓取")
+                self.crawl_stats['stop_reason'] = 'lower_bound'
+                break
+
+            # 已翻到历史消息尽头，不再请求下一页
+            if self.list_exhausted:
+                logger.info("🏁 已到达公众号历史消息尽头，停止翻页")
+                self.crawl_stats['reached_lower_bound'] = True
+                self.crawl_stats['stop_reason'] = 'history_end'
                 break
 
-            # 页面间延迟
-            if page < max_pages - 1:
+            # 页面间延迟（凭证即将过期时利用这段空闲提前刷新key，刷新耗时计入延迟）
+            if page < page_limit - 1:
                 low, high = self.page_delay_range if len(self.page_delay_range) == 2 else (10, 20)
-                page_delay = random.randint(low, high)
-                print(f"⏳ 页面间延迟 {page_delay} 秒...")
-                time.sleep(page_delay)
+                page_delay = random.randint(low, high) * self.delay_scale
+                self.credential_health.observe_busy(time.time() - page_started)
+                idle_started = time.time()
+                if self.credential_health.refresh_due():
+                    logger.info("🩺 凭证即将过期，利用页面间空闲提前刷新x-wechat-key…")
+                    refreshed = self.refresh_wechat_key_for_article(articles[-1]['url'], proactive=True)
+                    self.credential_health.on_refresh_attempt(refreshed)
+                    if not refreshed:
+                        logger.info("🩺 主动刷新未成功，%.0f 秒内不再主动刷新", self.credential_health.retry_wait())
+                remaining_delay = page_delay - (time.time() - idle_started)
+                logger.debug("⏳ 页面间延迟 %.1f 秒...", page_delay)
+                if remaining_delay > 0:
+                    self._sleep(remaining_delay, 'page_delay')
+
+        else:
+            self.crawl_stats['stop_reason'] = 'max_pages'
+
+        if self.suspect_articles:
+            # 直到结束都无法确认 key 是否有效：不保存可能过期的 0，留待下次运行重新抓取
+            logger.warning("⚠️ %s 篇阅读量为0的文章无法确认key是否有效，未保存，下次运行重新抓取", len(self.suspect_articles))
+            self._settle_suspect_stats(0, len(self.suspect_articles))
+            self.suspect_articles = []
 
         self.articles_data = all_results
+        self.crawl_finished = not self.captcha_resume and \
+            self.crawl_stats['stop_reason'] in self.FINISHED_STOP_REASONS
+        stats = self.crawl_stats
+        logger.info("📈 抓取统计: 使用 %s 页，有效 %s 篇，超时 %s 篇，跳过 %s 篇，失败 %s 篇，触达下界 %s，停止原因 %s，请求 %s", stats['used_pages'], stats['effective_articles'], stats['outdated_articles'], stats['skipped_articles'], stats['failed_articles'], '是' if stats['reached_lower_bound'] else '否', stats['stop_reason'], stats['requests'])
+        # 持久化本次学到的安全速率
+        self.rate_controller.flush()
+        # 未用完的熔断探测权交还，避免其他 spider 一直等待
+        if self.circuit_breaker:
+            self.circuit_breaker.release_probe(self._breaker_key(), f"{self.unit_name}#{id(self)}")
 
         # 关闭数据库连接
         if self.db_manager:
             self.db_manager.disconnect()
-            print("💾 数据库连接已关闭")
+            logger.info("💾 数据库连接已关闭")
 
-        print(f"\n🎉 批量抓取完成！共获取 {len(all_results)} 篇文章的统计数据")
+        logger.info("🎉 批量抓取完成！共获取 %s 篇文章的统计数据", len(all_results))
         if self.save_to_db:
-            print(f"💾 数据已实时保存到数据库")
+            logger.info("💾 数据已实时保存到数据库")
 
         return all_results
 
@@ -1123,7 +1675,7 @@ class BatchReadnumSpider:
         :return: 保存的文件路径
         """
         if not self.articles_data:
-            print("⚠️ 没有数据可保存")
+            logger.warning("⚠️ 没有数据可保存")
             return None
 
         if not filename:
@@ -1157,13 +1709,13 @@ class BatchReadnumSpider:
             # 保存到Excel
             df.to_excel(filename, index=False, engine='openpyxl')
 
-            print(f"📊 Excel数据已保存到: {filename}")
-            print(f"📈 共保存 {len(excel_data)} 条记录")
+            logger.info("📊 Excel数据已保存到: %s", filename)
+            logger.info("📈 共保存 %s 条记录", len(excel_data))
 
             return filename
 
         except Exception as e:
-            print(f"❌ 保存Excel文件失败: {e}")
+            logger.error("❌ 保存Excel文件失败: %s", e)
             return None
 
     def save_to_json(self, filename=None):
@@ -1173,7 +1725,7 @@ class BatchReadnumSpider:
         :return: 保存的文件路径
         """
         if not self.articles_data:
-            print("⚠️ 没有数据可保存")
+            logger.warning("⚠️ 没有数据可保存")
             return None
 
         if not filename:
@@ -1195,13 +1747,13 @@ class BatchReadnumSpider:
             with open(filename, 'w', encoding='utf-8') as f:
                 json.dump(json_data, f, ensure_ascii=False, indent=2)
 
-            print(f"💾 JSON数据已保存到: {filename}")
-            print(f"📈 共保存 {len(self.articles_data)} 条记录")
+            logger.info("💾 JSON数据已保存到: %s", filename)
+            logger.info("📈 共保存 %s 条记录", len(self.articles_data))
 
             return filename
 
         except Exception as e:
-            print(f"❌ 保存JSON文件失败: {e}")
+            logger.error("❌ 保存JSON文件失败: %s", e)
             return None
 
     def generate_summary_report(self):
@@ -1247,31 +1799,31 @@ class BatchReadnumSpider:
         """打印统计摘要"""
         summary = self.generate_summary_report()
         if not summary:
-            print("⚠️ 没有数据可统计")
+            logger.warning("⚠️ 没有数据可统计")
             return
 
-        print(f"\n{'='*60}")
-        print(f"📊 批量阅读量抓取统计摘要")
-        print(f"{'='*60}")
-        print(f"📖 总文章数: {summary['total_articles']}")
-        print(f"👀 总阅读量: {summary['total_reads']:,}")
-        print(f"👍 总点赞数: {summary['total_likes']:,}")
-        print(f"📤 总分享数: {summary['total_shares']:,}")
-        print(f"📊 平均阅读量: {summary['avg_reads']:,.2f}")
-        print(f"📊 平均点赞数: {summary['avg_likes']:.2f}")
-        print(f"📊 平均分享数: {summary['avg_shares']:.2f}")
-        print(f"\n🏆 阅读量最高文章:")
-        print(f"   标题: {summary['top_article']['title']}")
-        print(f"   阅读量: {summary['top_article']['read_count']:,}")
-        print(f"   点赞数: {summary['top_article']['like_count']:,}")
-        print(f"\n⏰ 统计时间: {summary['crawl_time']}")
-        print(f"{'='*60}")
+        logger.info("=" * 60)
+        logger.info("📊 批量阅读量抓取统计摘要")
+        logger.info("=" * 60)
+        logger.info("📖 总文章数: %s", summary['total_articles'])
+        logger.info(f"👀 总阅读量: {summary['total_reads']:,}")
+        logger.info(f"👍 总点赞数: {summary['total_likes']:,}")
+        logger.info(f"📤 总分享数: {summary['total_shares']:,}")
+        logger.info(f"📊 平均阅读量: {summary['avg_reads']:,.2f}")
+        logger.info("📊 平均点赞数: %.2f", summary['avg_likes'])
+        logger.info("📊 平均分享数: %.2f", summary['avg_shares'])
+        logger.info("🏆 阅读量最高文章:")
+        logger.info("   标题: %s", summary['top_article']['title'])
+        logger.info(f"   阅读量: {summary['top_article']['read_count']:,}")
+        logger.info(f"   点赞数: {summary['top_article']['like_count']:,}")
+        logger.info("⏰ 统计时间: %s", summary['crawl_time'])
+        logger.info("=" * 60)
 
 
 def main():
     """主函数示例"""
-    print("🚀 微信公众号批量阅读量抓取器")
-    print("="*50)
+    logger.info("🚀 微信公众号批量阅读量抓取器")
+    logger.info("=" * 50)
 
     # 初始化爬虫
     spider = BatchReadnumSpider()
@@ -1288,18 +1840,16 @@ def main():
             excel_file = spider.save_to_excel()
             json_file = spider.save_to_json()
 
-            print(f"\n✅ 抓取完成！")
+            logger.info("✅ 抓取完成！")
             if excel_file:
-                print(f"📊 Excel文件: {excel_file}")
+                logger.info("📊 Excel文件: %s", excel_file)
             if json_file:
-                print(f"💾 JSON文件: {json_file}")
+                logger.info("💾 JSON文件: %s", json_file)
         else:
-            print("❌ 未获取到任何数据")
+            logger.error("❌ 未获取到任何数据")
 
     except Exception as e:
-        print(f"❌ 程序执行出错: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ 程序执行出错: %s", e)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+key 过期判定器
+
+原逻辑把任何阅读量为 0 的文章都标记为 key_expired，对新发布、转载、视频/图片消息、
+隐藏阅读数等本就不展示阅读量的文章也会触发一次代价很高的 UI 抓包刷新 key 与重试。
+这里综合多个信号，只有在凭证确实失效时才输出 key_expired：
+
+- 会话标记：页面内 appmsg_token / uin 为空，说明请求未带上有效登录态（强信号）
+- appmsg_bar_data 数值：点赞/分享等计数非零，说明统计数据真实返回，key 有效、只是阅读数隐藏；
+  只看取值不看字段是否存在——key 过期的页面同样带有 cgiData.read_num 与各计数字段，只是全为 0
+- 页面类型：视频/音频/图片/纯文字/转载等页面本身可能不展示阅读数
+- 新文章：发布不久的文章阅读数可能尚未生成
+- 连续零值：无法确定的页面连续出现 zero_streak 次，才判定为过期
+
+用法（离线评估，语料目录中放 HTML 文件与 labels.json {文件名: "key_expired"|"ok"|"stats_hidden"}，
+默认使用仓库内的标注语料 src/bench/corpus/key_expiry）:
+    python -m src.crawler.key_expiry_classifier --eval [DIR] [--legacy]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+OK = 'ok'
+STATS_HIDDEN = 'stats_hidden'
+SUSPECT = 'suspect'
+KEY_EXPIRED = 'key_expired'
+
+READ_NUM_RE = re.compile(r"var cgiData = {[^}]*?read_num: '(\d+)'")
+CGI_DATA_RE = re.compile(r"var cgiData = {([^}]*)}")
+BAR_DATA_RE = re.compile(r"window\.appmsg_bar_data = {([^}]*)}")
+BAR_COUNT_RE = re.compile(r"(like_count|old_like_count|share_count): '(\d*)'")
+APPMSG_TOKEN_RE = re.compile(r'(?:window\.)?appmsg_token\s*=\s*["\']([^"\']*)["\']')
+UIN_RE = re.compile(r'var uin\s*=\s*["\']([^"\']*)["\']')
+ITEM_SHOW_TYPE_RE = re.compile(r'item_show_type\s*=\s*["\']?(\d+)')
+CREATE_TIME_RE = re.compile(r'var ct\s*=\s*["\'](\d+)["\']')
+
+# item_show_type：0 为普通图文，其余（视频、音频、图片、纯文字、分享卡片等）可能不展示阅读数
+NORMAL_SHOW_TYPES = {'0'}
+REPOST_MARKERS = ('js_share_source', 'share_notice', 'original_primary_card')
+# 发布多久之内的文章允许阅读数为 0（秒）
+FRESH_ARTICLE_SEC = 3600
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'bench', 'corpus', 'key_expiry')
+
+
+@dataclass
+class Verdict:
+    label: str
+    reasons: List[str] = field(default_factory=list)
+
+
+def extract_signals(html_content: str, now: float = None) -> Dict:
+    """从文章页面提取判定所需的信号"""
+    html_content = html_content or ''
+    now = now or time.time()
+    read_match = READ_NUM_RE.search(html_content)
+    cgi_match = CGI_DATA_RE.search(html_content)
+    bar_match = BAR_DATA_RE.search(html_content)
+    token_match = APPMSG_TOKEN_RE.search(html_content)
+    uin_match = UIN_RE.search(html_content)
+    show_type_match = ITEM_SHOW_TYPE_RE.search(html_content)
+    ct_match = CREATE_TIME_RE.search(html_content)
+    bar_body = bar_match.group(1) if bar_match else ''
+    return {
+        'read_count': int(read_match.group(1)) if read_match else 0,
+        'has_cgi_data': bool(cgi_match),
+        'has_bar_data': bool(bar_match),
+        # 各计数的取值（字段缺失或为空时不出现）
+        'bar_counts': {k: int(v) for k, v in BAR_COUNT_RE.findall(bar_body) if v},
+        # None 表示页面中没有该变量，'' 表示变量存在但为空
+        'appmsg_token': token_match.group(1) if token_match else None,
+        'uin': uin_match.group(1) if uin_match else None,
+        'item_show_type': show_type_match.group(1) if show_type_match else None,
+        'is_repost': any(m in html_content for m in REPOST_MARKERS),
+        'article_age_sec': now - int(ct_match.group(1)) if ct_match else None,
+    }
+
+
+class KeyExpiryClassifier:
+    """
+    多信号 key 过期判定（线程安全，连续零值计数跨文章保留）
+
+    未启用时退化为原规则：阅读量为 0 即 key_expired。
+    """
+
+    def __init__(self, config: Dict = None):
+        config = config or {}
+        self.enabled = config.get('key_expiry_classifier_enabled', False)
+        self.zero_streak = max(1, int(config.get('key_expiry_zero_streak', 2)))
+        self._streak = 0
+        self._lock = threading.Lock()
+
+    def classify(self, html_content: str, read_count: int = None) -> Verdict:
+        signals = extract_signals(html_content)
+        if read_count is None:
+            read_count = signals['read_count']
+
+        with self._lock:
+            if read_count > 0:
+                self._streak = 0
+                return Verdict(OK)
+            if not self.enabled:
+                return Verdict(KEY_EXPIRED, ['read_count == 0'])
+
+            # 强信号：页面未带登录态
+            if signals['appmsg_token'] == '' or signals['uin'] == '':
+                self._streak = 0
+                return Verdict(KEY_EXPIRED, ['页面登录态为空 (appmsg_token/uin)'])
+
+            # 统计接口返回了非零计数：key 有效，只是阅读数被隐藏
+            counts = {k: v for k, v in signals['bar_counts'].items() if v > 0}
+            if counts:
+                self._streak = 0
+                return Verdict(STATS_HIDDEN, [f"appmsg_bar_data 计数非零 {counts}"])
+
+            # 页面本身可能不展示阅读数
+            explained = []
+            if signals['item_show_type'] and signals['item_show_type'] not in NORMAL_SHOW_TYPES:
+                explained.append(f"非普通图文 item_show_type={signals['item_show_type']}")
+            if signals['is_repost']:
+                explained.append('转载/分享页面')
+            age = signals['article_age_sec']
+            if age is not None and age < FRESH_ARTICLE_SEC:
+                explained.append(f'新发布文章 ({int(age)}s)')
+            if explained:
+                return Verdict(STATS_HIDDEN, explained)
+
+            # 无法确定：连续出现足够多次才判定为过期
+            self._streak += 1
+            reasons = [f'统计计数缺失或全为 0 且无法解释，连续 {self._streak}/{self.zero_streak} 次']
+            if self._streak >= self.zero_streak:
+                self._streak = 0
+                return Verdict(KEY_EXPIRED, reasons)
+            return Verdict(SUSPECT, reasons)
+
+    def reset(self):
+        """key 刷新后清空连续零值计数"""
+        with self._lock:
+            self._streak = 0
+
+
+def evaluate(corpus_dir: str, config: Dict = None) -> Dict:
+    """
+    在标注语料上评估 key_expired 判定的精确率/召回率
+    文件按名称顺序依次判定（模拟爬取时的连续零值计数）
+    """
+    with open(os.path.join(corpus_dir, 'labels.json'), 'r', encoding='utf-8') as f:
+        labels: Dict[str, str] = json.load(f)
+    classifier = KeyExpiryClassifier(config)
+    tp = fp = fn = tn = 0
+    mistakes = []
+    for name in sorted(labels):
+        with open(os.path.join(corpus_dir, name), 'r', encoding='utf-8', errors='ignore') as f:
+            verdict = classifier.classify(f.read())
+        predicted = verdict.label == KEY_EXPIRED
+        actual = labels[name] == KEY_EXPIRED
+        if predicted and actual:
+            tp += 1
+        elif predicted:
+            fp += 1
+            mistakes.append((name, 'false_positive', verdict.reasons))
+        elif actual:
+            fn += 1
+            mistakes.append((name, 'false_negative', verdict.reasons))
+        else:
+            tn += 1
+    return {
+        'total': len(labels),
+        'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn,
+        'precision': tp / (tp + fp) if tp + fp else None,
+        'recall': tp / (tp + fn) if tp + fn else None,
+        'mistakes': mistakes,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="key 过期判定器离线评估")
+    parser.add_argument('--eval', nargs='?', const=DEFAULT_CORPUS, default=DEFAULT_CORPUS, metavar='DIR',
+                        help=f"语料目录（含 HTML 文件与 labels.json），默认 {DEFAULT_CORPUS}")
+    parser.add_argument('--zero-streak', type=int, default=2, help="连续零值判定阈值")
+    parser.add_argument('--legacy', action='store_true', help="评估原规则（阅读量为0即过期）作为对照")
+    args = parser.parse_args(argv)
+
+    config = {'key_expiry_classifier_enabled': not args.legacy, 'key_expiry_zero_streak': args.zero_streak}
+    result = evaluate(args.eval, config)
+    fmt = lambda v: f"{v:.3f}" if v is not None else "n/a"
+    print(f"📊 样本 {result['total']} | TP {result['tp']} FP {result['fp']} FN {result['fn']} TN {result['tn']}")
+    print(f"🎯 precision = {fmt(result['precision'])}  recall = {fmt(result['recall'])}")
+    for name, kind, reasons in result['mistakes']:
+        print(f"   ❌ {kind}: {name} ({'; '.join(reasons)})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -15,11 +15,13 @@ from typing import Dict, List, Optional, Any
 import time
 
 from src.database.database_config import get_table_config
+from src.core.run_metrics import RunMetrics
 
 class DatabaseManager:
     """数据库管理器，负责微信公众号文章数据的数据库操作"""
     
-    def __init__(self, host='127.0.0.1', port=3306, user='root', password='root', database='faxuan', table_name: Optional[str] = None):
+    def __init__(self, host='127.0.0.1', port=3306, user='root', password='root', database='faxuan', table_name: Optional[str] = None,
+                 metrics: Optional[RunMetrics] = None, metrics_account: str = ''):
         """
         初始化数据库连接
         
@@ -29,6 +31,8 @@ class DatabaseManager:
             user: 数据库用户名
             password: 数据库密码
             database: 数据库名称
+            metrics: 运行指标（可选），记录写入耗时与结果
+            metrics_account: 运行指标中的公众号标签
         """
         self.host = host
         self.port = port
@@ -37,6 +41,8 @@ class DatabaseManager:
         self.database = database
         self.connection = None
         self.logger = logging.getLogger(__name__)
+        self.metrics = metrics or RunMetrics()
+        self.metrics_account = metrics_account
 
         # 读取表配置
         table_cfg = get_table_config()
@@ -125,6 +131,11 @@ class DatabaseManager:
         Returns:
             插入成功返回True，失败返回False
         """
+        with self.metrics.phase('db_write', self.metrics_account, outcome='error') as timer:
+            return self._insert_article(article_data, timer)
+
+    def _insert_article(self, article_data: Dict[str, Any], timer) -> bool:
+        """插入单篇文章的实际实现，timer 用于标记写入结果（ok/duplicate，异常时保持 error）"""
         if not self.is_connected():
             if not self.reconnect():
                 return False
@@ -133,6 +144,7 @@ class DatabaseManager:
         article_title = article_data.get('title', '').strip()
         if article_title and self.check_article_title_exists(article_title):
             self.logger.info(f"⚠️ 文章标题已存在，跳过插入: {article_title}")
+            timer.outcome = 'duplicate'
             return False
 
         try:
@@ -194,6 +206,7 @@ class DatabaseManager:
                 cursor.execute(sql, insert_data)
             
             self.logger.info(f"✅ 文章插入成功: {article_data.get('title', 'Unknown')} (ID: {article_id})")
+            timer.outcome = 'ok'
             return True
             
         except Exception as e:
@@ -0,0 +1,233 @@
+# capture_daemon.py
+"""
+常驻抓包守护进程
+
+原流程每个公众号都要：重置网络 -> 备份代理 -> mitmdump --version -> 启动 mitmdump -> 抓包
+-> 结束进程 -> 重置网络 -> 外网连通性检查，单个公众号的抓包准备/收尾就要数十秒。
+
+守护模式下 mitmdump 在整个运行期间只启动一次，插件(cookie_extractor.py)内置一个
+本地控制服务，按行收发 JSON 命令：
+    {"cmd": "ping"}               -> {"ok": true, "ready": ...}（ready: 代理已开始监听）
+    {"cmd": "arm", "biz": "..."}  -> 开始记录（biz 为空时记录任意公众号文章）
+    {"cmd": "disarm"}             -> 停止记录
+    {"cmd": "status"}             -> {"ok": true, "armed": ..., "biz": ..., "captured": ...}
+未 arm 时插件只转发流量、不记录凭证；每个公众号的抓包准备/收尾只剩一次 arm/disarm。
+
+- CaptureControlServer：插件侧控制服务（纯 socket 实现，不依赖 mitmproxy，可在 Linux 下测试）
+- CaptureDaemon：主进程侧客户端，负责启动/停止 mitmdump 并发送控制命令
+"""
+import json
+import logging
+import os
+import socket
+import subprocess
+import threading
+import time
+from typing import Callable, Optional
+
+from src.proxy.credential_channel import CredentialChannel
+
+ENV_CONTROL_PORT = "WECHAT_CAPTURE_CONTROL_PORT"
+
+# 当前运行中的守护进程；ReadCookie 未显式指定时自动使用它，
+# 避免守护进程运行期间其他抓包流程(如刷新key)再启动/结束 mitmdump
+_active_daemon: Optional['CaptureDaemon'] = None
+
+
+def active_daemon() -> Optional['CaptureDaemon']:
+    return _active_daemon
+
+
+def send_command(port: int, command: dict, timeout: float = 3.0) -> Optional[dict]:
+    """向控制服务发送一条命令，返回响应；连接失败返回 None"""
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=timeout) as sock:
+            sock.sendall((json.dumps(command, ensure_ascii=False) + "\n").encode('utf-8'))
+            data = b""
+            while not data.endswith(b"\n"):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+        return json.loads(data.decode('utf-8')) if data.strip() else None
+    except (OSError, ValueError):
+        return None
+
+
+class CaptureControlServer:
+    """
+    插件侧控制服务：每个连接读取一行 JSON 命令，交给 handler 处理并回写一行 JSON 响应
+    """
+
+    def __init__(self, port: int, handler: Callable[[dict], dict], host: str = "127.0.0.1"):
+        self.handler = handler
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((host, port))
+        self._server.listen(8)
+        self.port = self._server.getsockname()[1]
+        self._closed = False
+        self._thread = threading.Thread(target=self._serve, name="capture-control", daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while not self._closed:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                break
+            with conn:
+                try:
+                    conn.settimeout(5)
+                    data = b""
+                    while not data.endswith(b"\n"):
+                        chunk = conn.recv(65536)
+                        if not chunk:
+                            break
+                        data += chunk
+                    try:
+                        response = self.handler(json.loads(data.decode('utf-8')))
+                    except Exception as e:
+                        response = {'ok': False, 'error': str(e)}
+                    conn.sendall((json.dumps(response, ensure_ascii=False) + "\n").encode('utf-8'))
+                except OSError:
+                    continue
+
+    def close(self):
+        self._closed = True
+        try:
+            self._server.close()
+        except OSError:
+            pass
+
+
+def _free_port(host: str = "127.0.0.1") -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+class CaptureDaemon:
+    """
+    主进程侧：整个运行期间只启动一次 mitmdump，之后每个公众号只需 arm/disarm
+
+    :param listen_host: mitmproxy 监听地址（Linux 下测试时可绑定 127.0.0.1）
+    :param listen_port: mitmproxy 代理端口
+    :param proxy_manager: 可选，用于运行开始/结束时各做一次网络状态重置（Linux 下传 None）
+    """
+
+    def __init__(self, listen_host: str = "127.0.0.1", listen_port: int = 8080, proxy_manager=None,
+                 extractor_path: str = None, start_timeout: float = 30):
+        self.listen_host = listen_host
+        self.listen_port = listen_port
+        self.proxy_manager = proxy_manager
+        self.extractor_path = extractor_path or os.path.join(
+            os.path.dirname(os.path.realpath(__file__)), 'cookie_extractor.py')
+        self.start_timeout = start_timeout
+        self.logger = logging.getLogger(__name__)
+        self.process: Optional[subprocess.Popen] = None
+        self.control_port: Optional[int] = None
+        self.channel: Optional[CredentialChannel] = None
+        self._lock = threading.Lock()
+
+    # --------------- 生命周期 ---------------
+    def is_running(self) -> bool:
+        return bool(self.process and self.process.poll() is None)
+
+    def ensure_started(self) -> bool:
+        """守护进程未运行时启动，已运行时立即返回"""
+        global _active_daemon
+        with self._lock:
+            if self.is_running() and self.is_ready():
+                return True
+            self._terminate()
+
+            if self.proxy_manager:
+                self.proxy_manager.reset_network_state()
+                self.proxy_manager.backup_proxy_settings()
+
+            self.channel = CredentialChannel()
+            self.control_port = _free_port()
+            env = os.environ.copy()
+            env.update(self.channel.env())
+            env[ENV_CONTROL_PORT] = str(self.control_port)
+            command = ["mitmdump", "-s", self.extractor_path,
+                       "--listen-host", self.listen_host, "--listen-port", str(self.listen_port),
+                       "--ssl-insecure"]
+            self.logger.info(f"🚀 启动常驻抓包守护进程: {' '.join(command)}")
+            try:
+                self.process = subprocess.Popen(command, env=env)
+            except FileNotFoundError as e:
+                self.logger.error(f"❌ 找不到 mitmdump: {e}")
+                self.channel.close()
+                return False
+
+            deadline = time.time() + self.start_timeout
+            while time.time() < deadline:
+                if self.process.poll() is not None:
+                    self.logger.error(f"❌ 抓包守护进程已退出，返回码: {self.process.returncode}")
+                    return False
+                if self.is_ready():
+                    self.logger.info(f"✅ 抓包守护进程已就绪 (PID: {self.process.pid})")
+                    _active_daemon = self
+                    return True
+                # 插件就绪时通过凭证通道推送信号，等待可立即结束
+                self.channel.wait_ready(0.2)
+            self.logger.error(f"❌ 抓包守护进程 {self.start_timeout}s 内未就绪")
+            self._terminate()
+            return False
+
+    def _terminate(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait(timeout=3)
+        self.process = None
+        if self.channel:
+            self.channel.close()
+            self.channel = None
+
+    def stop(self):
+        """运行结束时停止守护进程，并做一次网络状态重置"""
+        global _active_daemon
+        with self._lock:
+            if self.is_running():
+                send_command(self.control_port, {'cmd': 'disarm'})
+            self._terminate()
+            if _active_daemon is self:
+                _active_daemon = None
+        if self.proxy_manager:
+            self.proxy_manager.restore_proxy_settings()
+        self.logger.info("🧹 抓包守护进程已停止")
+
+    # --------------- 控制命令 ---------------
+    def _command(self, command: dict) -> Optional[dict]:
+        if not self.control_port:
+            return None
+        return send_command(self.control_port, command)
+
+    def ping(self) -> bool:
+        response = self._command({'cmd': 'ping'})
+        return bool(response and response.get('ok'))
+
+    def is_ready(self) -> bool:
+        """插件已加载且代理已开始监听"""
+        response = self._command({'cmd': 'ping'})
+        return bool(response and response.get('ok') and response.get('ready'))
+
+    def arm(self, biz: str = None) -> bool:
+        """开始为指定 biz 记录凭证；清空上一次推送的凭证，等待方只会收到此后的新凭证"""
+        if self.channel:
+            self.channel.reset()
+        response = self._command({'cmd': 'arm', 'biz': biz})
+        return bool(response and response.get('ok'))
+
+    def disarm(self) -> bool:
+        response = self._command({'cmd': 'disarm'})
+        return bool(response and response.get('ok'))
+
+    def status(self) -> Optional[dict]:
+        return self._command({'cmd': 'status'})
@@ -1,12 +1,29 @@
 import json
+import os
 import re
-import winreg
 import atexit
 import time
 import threading
 from datetime import datetime
+from urllib.parse import unquote
 from mitmproxy import http
 
+# winreg 仅在 Windows 下可用；Linux 下（如测试守护进程控制协议）跳过系统代理设置
+try:
+    import winreg
+except ImportError:
+    winreg = None
+
+# mitmdump 以脚本方式加载本文件时，脚本所在目录位于 sys.path 中
+try:
+    from src.proxy.credential_channel import push_credential, push_ready
+    from src.proxy.credential_log import append_record, build_record
+    from src.proxy.capture_daemon import ENV_CONTROL_PORT, CaptureControlServer
+except ImportError:
+    from credential_channel import push_credential, push_ready
+    from credential_log import append_record, build_record
+    from capture_daemon import ENV_CONTROL_PORT, CaptureControlServer
+
 class WechatCookieExtractor:
     def __init__(self):
         self.keys_file = "wechat_keys.txt"
@@ -15,8 +32,20 @@ class WechatCookieExtractor:
         self.proxy_enabled = False
         self.init_keys_file()
 
-        # 立即尝试设置代理，但使用重试机制
-        self.setup_proxy_with_retry()
+        # 常驻守护模式：由主进程通过控制服务 arm/disarm，仅在 arm 期间记录凭证并开启系统代理
+        self.control_server = None
+        self.armed = True
+        self.armed_biz = None
+        self.captured_count = 0
+        self.ready = False
+        control_port = os.environ.get(ENV_CONTROL_PORT)
+        if control_port:
+            self.armed = False
+            self.control_server = CaptureControlServer(int(control_port), self.handle_control)
+            print(f"🛰️ 抓包守护模式，控制端口: {control_port}")
+        else:
+            # 立即尝试设置代理，但使用重试机制
+            self.setup_proxy_with_retry()
 
         # 注册程序退出时的清理函数
         atexit.register(self.cleanup_proxy)
@@ -42,6 +71,34 @@ class WechatCookieExtractor:
         retry_timer.start()
         return False
 
+    def handle_control(self, command: dict) -> dict:
+        """处理主进程发来的控制命令"""
+        cmd = command.get('cmd')
+        if cmd == 'ping':
+            return {'ok': True, 'ready': self.ready}
+        if cmd == 'arm':
+            self.armed_biz = unquote(command['biz']) if command.get('biz') else None
+            # 新一轮抓包允许再次记录之前见过的链接
+            self.saved_urls.clear()
+            self.saved_cookies.clear()
+            self.armed = True
+            self.set_system_proxy()
+            return {'ok': True}
+        if cmd == 'disarm':
+            self.armed = False
+            self.cleanup_proxy()
+            return {'ok': True}
+        if cmd == 'status':
+            return {'ok': True, 'ready': self.ready, 'armed': self.armed, 'biz': self.armed_biz,
+                    'captured': self.captured_count}
+        return {'ok': False, 'error': f'unknown command: {cmd}'}
+
+    def running(self):
+        """mitmproxy 钩子：代理已完全启动并开始监听，向主进程发送就绪信号"""
+        self.ready = True
+        push_ready()
+        print("✅ 抓包器已就绪")
+
     def retry_proxy_setup(self):
         """后台重试代理设置"""
         print("🔄 重试设置系统代理...")
@@ -72,6 +129,8 @@ class WechatCookieExtractor:
 
     def set_system_proxy(self):
         """设置系统代理为127.0.0.1:8080"""
+        if winreg is None:
+            return False
         try:
             # 打开注册表项
             key = winreg.OpenKey(winreg.HKEY_CURRENT_USER,
@@ -110,6 +169,10 @@ class WechatCookieExtractor:
         """拦截请求，提取微信相关的Cookie和URL"""
         request = flow.request
         
+        # 守护模式下未 arm 时只转发流量
+        if not self.armed:
+            return
+
         # 仅拦截微信公众号文章链接
         if self.is_wechat_article_url(request.pretty_url):
             self.save_keys_and_url(request)
@@ -138,6 +201,10 @@ class WechatCookieExtractor:
         if request.pretty_url in self.saved_urls:
             return
 
+        # 守护模式下只记录当前 arm 的公众号
+        if self.armed_biz and f"__biz={self.armed_biz}" not in unquote(request.pretty_url):
+            return
+
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         # 提取并合并所有关键Cookie为一行
@@ -188,8 +255,20 @@ class WechatCookieExtractor:
 
             f.write("\n")
 
+        # 结构化记录追加到凭证日志，并推送给主进程中的等待方，使其无需轮询文件
+        record = build_record(request.pretty_url, cookies_string, key_headers)
+        try:
+            append_record(record)
+        except Exception as e:
+            print(f"⚠️ 写入凭证日志失败: {e}")
+        push_credential(record)
+        self.captured_count += 1
+
         # 仅在成功保存时打印简洁信息并自动关闭代理
         print(f"✅ 已保存微信公众号文章Cookie: {request.pretty_url}")
+        if self.control_server:
+            # 守护模式：本轮抓包完成即停止记录，进程继续常驻
+            self.armed = False
         print("🎯 Cookie抓取成功，准备自动关闭代理...")
 
         # 延迟关闭代理，确保数据保存完成
@@ -204,7 +283,7 @@ class WechatCookieExtractor:
 
     def cleanup_proxy(self):
         """清理系统代理设置"""
-        if not self.proxy_enabled:
+        if not self.proxy_enabled or winreg is None:
             return
 
         try:
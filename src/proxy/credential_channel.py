@@ -0,0 +1,137 @@
+# credential_channel.py
+"""
+抓包凭证的本地推送通道
+
+mitmproxy 插件(cookie_extractor.py)加载并开始监听后推送一条 {"type": "ready"} 就绪信号；
+在写入 wechat_keys.txt 后，把同一条凭证以一行 JSON
+通过 127.0.0.1 上的 TCP 连接推送给主进程；主进程中的等待方(ReadCookie)阻塞在事件上，
+凭证到达即刻返回，不再每秒轮询文件、反复整文件解析。
+
+端口由主进程随机分配，经环境变量 WECHAT_CREDENTIAL_CHANNEL_PORT 传给 mitmdump 子进程。
+推送失败不影响插件写文件，等待方仍可回退到文件解析。
+"""
+import json
+import logging
+import os
+import socket
+import threading
+from typing import Optional
+
+ENV_PORT = "WECHAT_CREDENTIAL_CHANNEL_PORT"
+
+
+def is_valid_record(record: Optional[dict]) -> bool:
+    """凭证记录是否包含爬取所需的最少字段"""
+    return bool(record and record.get('appmsg_token') and record.get('biz') and record.get('cookie_str'))
+
+
+class CredentialChannel:
+    """
+    主进程侧的凭证接收端：监听 127.0.0.1 上的随机端口，逐行接收 JSON 凭证记录
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.logger = logging.getLogger(__name__)
+        self._event = threading.Event()
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._latest: Optional[dict] = None
+        self._closed = False
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((host, port))
+        self._server.listen(8)
+        self.port = self._server.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, name="credential-channel", daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while not self._closed:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                break
+            with conn:
+                conn.settimeout(5)
+                try:
+                    data = b""
+                    while True:
+                        chunk = conn.recv(65536)
+                        if not chunk:
+                            break
+                        data += chunk
+                    for line in data.decode('utf-8').splitlines():
+                        if line.strip():
+                            self._on_record(json.loads(line))
+                except Exception as e:
+                    self.logger.debug(f"凭证通道接收数据失败: {e}")
+
+    def _on_record(self, record: dict):
+        if record.get('type') == 'ready':
+            self._ready.set()
+            return
+        if not is_valid_record(record):
+            return
+        with self._lock:
+            self._latest = record
+        self._event.set()
+
+    @property
+    def latest(self) -> Optional[dict]:
+        """最近一次收到的有效凭证记录"""
+        with self._lock:
+            return dict(self._latest) if self._latest else None
+
+    def has_credential(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: float = None) -> Optional[dict]:
+        """阻塞直到收到有效凭证或超时，返回凭证记录或 None"""
+        if self._event.wait(timeout):
+            return self.latest
+        return None
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        """阻塞直到抓包器报告已加载并开始监听"""
+        return self._ready.wait(timeout)
+
+    def reset(self):
+        """清空已收到的凭证（常驻抓包器每次 arm 前调用）"""
+        with self._lock:
+            self._latest = None
+        self._event.clear()
+
+    def env(self) -> dict:
+        """传给 mitmdump 子进程的环境变量"""
+        return {ENV_PORT: str(self.port)}
+
+    def close(self):
+        self._closed = True
+        try:
+            self._server.close()
+        except OSError:
+            pass
+
+
+def push_ready(port: int = None) -> bool:
+    """插件侧：通知主进程抓包器已加载并开始监听"""
+    return push_credential({'type': 'ready'}, port=port)
+
+
+def push_credential(record: dict, port: int = None, timeout: float = 2.0) -> bool:
+    """
+    插件侧：把一条凭证记录推送给主进程；未配置端口或推送失败返回 False
+    """
+    if port is None:
+        try:
+            port = int(os.environ.get(ENV_PORT, 0))
+        except ValueError:
+            port = 0
+    if not port:
+        return False
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=timeout) as sock:
+            sock.sendall((json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8'))
+        return True
+    except OSError:
+        return False
@@ -0,0 +1,119 @@
+# credential_log.py
+"""
+结构化的抓包凭证日志（JSON Lines，只追加）
+
+cookie_extractor.py 每抓到一条凭证即追加一行 JSON，字段带类型：
+    captured_at   float  抓取时间（Unix 时间戳）
+    biz           str    公众号 __biz
+    uin           str    x-wechat-uin（可能为 None）
+    url           str    触发抓包的文章链接
+    cookie_str    str    合并后的关键 Cookie
+    appmsg_token  str    从 Cookie 中提取的 appmsg_token
+    headers       dict   关键请求头
+
+CredentialLogReader 记住已读取的字节偏移，每次只解析新追加的记录，
+解析开销与新增数据量成正比，而不随一天内多次换 key 后日志的增长而变慢。
+
+日志包含 Cookie 与 x-wechat-key，写在 data/runtime/ 下（不纳入版本库）；
+超过 CREDENTIAL_LOG_MAX_BYTES 时轮转为 <文件>.1，只保留一份旧日志。
+"""
+import json
+import logging
+import os
+import re
+import time
+from typing import List, Optional
+
+CREDENTIAL_LOG_FILE = "data/runtime/wechat_credentials.jsonl"
+# 单个日志文件上限（字节），超过后轮转
+CREDENTIAL_LOG_MAX_BYTES = 1024 * 1024
+
+
+def build_record(url: str, cookie_str: str, headers: dict, captured_at: float = None) -> dict:
+    """由抓到的请求信息构造一条凭证记录"""
+    biz_match = re.search(r'__biz=([^&]+)', url or '')
+    token_match = re.search(r'appmsg_token=([^;]+)', cookie_str or '')
+    headers = dict(headers or {})
+    return {
+        'captured_at': float(captured_at if captured_at is not None else time.time()),
+        'biz': biz_match.group(1) if biz_match else None,
+        'uin': headers.get('x-wechat-uin'),
+        'url': url,
+        'cookie_str': cookie_str,
+        'appmsg_token': token_match.group(1) if token_match else None,
+        'headers': headers,
+    }
+
+
+def append_record(record: dict, path: str = CREDENTIAL_LOG_FILE, max_bytes: int = CREDENTIAL_LOG_MAX_BYTES):
+    """追加一条记录；单次 write 写入整行，读取方不会看到半条记录之后的内容被当作完整行"""
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if max_bytes and os.path.exists(path) and os.path.getsize(path) >= max_bytes:
+        # 轮转：覆盖上一份旧日志，读取方通过文件标识变化从新文件开头读取
+        os.replace(path, path + ".1")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line)
+        f.flush()
+
+
+class CredentialLogReader:
+    """
+    增量读取凭证日志
+
+    :param path: 日志路径
+    :param from_end: True 时从当前文件末尾开始读取，只关心此后新抓到的凭证
+                     （替代原先删除 wechat_keys.txt 的做法）
+    """
+
+    def __init__(self, path: str = CREDENTIAL_LOG_FILE, from_end: bool = False):
+        self.path = path
+        self.offset = 0
+        # 当前读取文件的标识（inode），轮转后变化
+        self.file_id = None
+        self.latest: Optional[dict] = None
+        self.logger = logging.getLogger(__name__)
+        if from_end and os.path.exists(path):
+            stat = os.stat(path)
+            self.offset = stat.st_size
+            self.file_id = stat.st_ino
+
+    def read_new(self) -> List[dict]:
+        """解析自上次读取以来新追加的完整记录"""
+        if not os.path.exists(self.path):
+            return []
+        stat = os.stat(self.path)
+        size = stat.st_size
+        if size < self.offset or stat.st_ino != self.file_id:
+            # 文件被截断、轮转或替换，从头读取
+            self.offset = 0
+            self.file_id = stat.st_ino
+        if size == self.offset:
+            return []
+
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        # 末尾未写完的半行留到下次读取
+        end = data.rfind(b"\n")
+        if end < 0:
+            return []
+        self.offset += end + 1
+
+        records = []
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line.decode('utf-8')))
+            except (ValueError, UnicodeDecodeError) as e:
+                self.logger.debug(f"跳过无法解析的凭证记录: {e}")
+        for record in records:
+            if record.get('appmsg_token') and record.get('biz') and record.get('cookie_str'):
+                self.latest = record
+        return records
+
+    def latest_valid(self) -> Optional[dict]:
+        """读取新增记录后返回最近一条有效凭证"""
+        self.read_new()
+        return self.latest
@@ -5,21 +5,35 @@
 """
 import subprocess
 import time
-import winreg
 import logging
 import requests
 from typing import Optional
+try:
+    import winreg  # 仅 Windows：读写系统代理设置
+except ImportError:
+    winreg = None
+
+from config.config_manager import get_crawler_config
 
 class ProxyManager:
     """代理管理器，确保代理设置正确开关"""
+
+    # 外网连通性检查结果按进程（即一次运行）缓存: {'proxy': bool, 'direct': bool}
+    _connectivity_cache = {}
     
-    def __init__(self):
+    def __init__(self, external_check_enabled: Optional[bool] = None):
         self.logger = logging.getLogger(__name__)
         self.proxy_port = 8080
         self.original_proxy_settings = {}
+        # 通过百度/QQ等第三方网站验证网络，默认关闭（抓包器就绪由插件自身信号确认）
+        if external_check_enabled is None:
+            external_check_enabled = get_crawler_config().get('network_external_check_enabled', False)
+        self.external_check_enabled = external_check_enabled
         
     def is_proxy_working(self, timeout: int = 5) -> bool:
-        """检查代理服务器是否正常工作"""
+        """检查代理服务器是否正常工作（经代理访问外网，本次运行内成功一次后缓存）"""
+        if self._connectivity_cache.get('proxy'):
+            return True
         try:
             proxies = {
                 'http': f'http://127.0.0.1:{self.proxy_port}',
@@ -38,6 +52,7 @@ class ProxyManager:
                     response = requests.get(url, proxies=proxies, timeout=timeout)
                     if response.status_code == 200:
                         self.logger.debug(f"代理测试成功: {url}")
+                        ProxyManager._connectivity_cache['proxy'] = True
                         return True
                 except Exception as e:
                     self.logger.debug(f"代理测试失败 {url}: {e}")
@@ -168,11 +183,26 @@ class ProxyManager:
         except Exception:
             return False
 
-    def wait_for_proxy_ready(self, max_wait: int = 30) -> bool:
-        """等待代理服务启动完成"""
+    def wait_for_proxy_ready(self, max_wait: int = 30, ready_signal=None) -> bool:
+        """
+        等待代理服务启动完成
+        :param ready_signal: 可选，抓包器推送就绪信号的通道（CredentialChannel）；
+                             提供时以插件自身的就绪信号为准，不再依赖第三方网站
+        """
         start_time = time.time()
         self.logger.info("等待代理服务启动...")
 
+        if ready_signal is not None:
+            if ready_signal.wait_ready(max_wait) and self.is_port_listening():
+                self.logger.info(f"✅ 抓包器已报告就绪，端口 {self.proxy_port} 已开始监听 "
+                                 f"({time.time() - start_time:.1f}s)")
+                if not self.external_check_enabled or self.is_proxy_working(timeout=3):
+                    return True
+                self.logger.error("❌ 抓包器已就绪，但经代理访问外网失败")
+                return False
+            self.logger.error(f"❌ {max_wait}秒内未收到抓包器就绪信号")
+            return False
+
         # 首先等待端口开始监听
         port_ready = False
         while time.time() - start_time < 10:  # 最多等待10秒端口监听
@@ -186,6 +216,10 @@ class ProxyManager:
             self.logger.error(f"❌ 端口 {self.proxy_port} 在10秒内未开始监听")
             return False
 
+        if not self.external_check_enabled:
+            self.logger.info("✅ 代理端口已就绪（外网连通性检查未启用）")
+            return True
+
         # 然后测试代理功能
         while time.time() - start_time < max_wait:
             if self.is_proxy_working(timeout=3):
@@ -224,7 +258,12 @@ class ProxyManager:
             self.logger.warning(f"结束进程时出错: {e}")
     
     def validate_and_fix_network(self):
-        """验证网络连接正常"""
+        """验证网络连接正常（未启用外网检查时直接通过；本次运行内成功一次后缓存）"""
+        if not self.external_check_enabled:
+            self.logger.debug("外网连通性检查未启用，跳过")
+            return True
+        if self._connectivity_cache.get('direct'):
+            return True
         try:
             # 测试不使用代理是否能连接外网，使用多个备选网站
             test_urls = [
@@ -238,6 +277,7 @@ class ProxyManager:
                     response = requests.get(url, timeout=5)
                     if response.status_code == 200:
                         self.logger.info(f"✅ 网络连接正常（无代理）- 测试网站: {url}")
+                        ProxyManager._connectivity_cache['direct'] = True
                         return True
                 except Exception as e:
                     self.logger.debug(f"网络测试失败 {url}: {e}")
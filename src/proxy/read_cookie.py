@@ -4,19 +4,34 @@ import os
 import subprocess
 import time
 import logging
+import threading
 from datetime import datetime
 from src.proxy.proxy_manager import ProxyManager
+from src.proxy.credential_channel import CredentialChannel
+from src.proxy.credential_log import CREDENTIAL_LOG_FILE, CredentialLogReader
+from src.proxy.capture_daemon import active_daemon
+
+# 抓包器(8080端口/系统代理)与微信UI都是进程内唯一资源，
+# 多账号并行抓取时所有抓包/刷新key流程需串行持有该锁
+CAPTURE_LOCK = threading.RLock()
 
 class ReadCookie(object):
     """
     启动cookie_extractor.py和解析cookie文件
     """
 
-    def __init__(self, outfile="wechat_keys.txt", delete_existing_file: bool = True):
+    def __init__(self, outfile="wechat_keys.txt", delete_existing_file: bool = True,
+                 log_file: str = CREDENTIAL_LOG_FILE, daemon=None):
         self.outfile = outfile
+        # 常驻抓包守护进程（CaptureDaemon）；未指定时使用当前运行中的守护进程
+        self.daemon = daemon or active_daemon()
+        # 结构化凭证日志只追加不删除；需要新凭证时从当前末尾开始读取
+        self.log_reader = CredentialLogReader(log_file, from_end=delete_existing_file)
         self.mitm_process = None
         self.logger = logging.getLogger()
         self.proxy_manager = ProxyManager()
+        # 抓包器推送凭证的本地通道，启动抓包器时创建
+        self.channel = None
         # 根据参数决定是否删除旧文件
         if delete_existing_file and os.path.exists(self.outfile):
             os.remove(self.outfile)
@@ -27,6 +42,11 @@ class ReadCookie(object):
         解析cookie文件，提取最新的appmsg_token、biz、cookie_str和headers
         :return: appmsg_token, biz, cookie_str, headers
         """
+        # 优先增量读取结构化凭证日志，只解析新追加的记录
+        record = self.log_reader.latest_valid()
+        if record:
+            return record['appmsg_token'], record['biz'], record['cookie_str'], record.get('headers') or {}
+
         if not os.path.exists(self.outfile):
             self.logger.warning(f"文件 {self.outfile} 不存在")
             return None, None, None, None
@@ -65,10 +85,14 @@ class ReadCookie(object):
         self.logger.warning("在文件中未找到有效的Cookie数据。")
         return None, None, None, None
 
-    def start_cookie_extractor(self) -> bool:
+    def start_cookie_extractor(self, biz: str = None) -> bool:
         """
         在后台启动cookie_extractor.py进行cookie抓取 (非阻塞)
+        :param biz: 可选，守护模式下只记录该公众号的凭证
         """
+        if self.daemon:
+            return self._arm_daemon(biz)
+
         self.logger.info("🚀 开始启动Cookie抓取器...")
         
         try:
@@ -107,16 +131,28 @@ class ReadCookie(object):
                 self.logger.error(f"❌ 检查mitmdump失败: {e}")
                 return False
             
+            # 创建凭证推送通道，端口经环境变量传给抓包器
+            env = os.environ.copy()
+            try:
+                if self.channel:
+                    self.channel.close()
+                self.channel = CredentialChannel()
+                env.update(self.channel.env())
+            except OSError as e:
+                self.logger.warning(f"⚠️ 凭证推送通道创建失败，将回退为轮询文件: {e}")
+                self.channel = None
+
             # 不重定向输出，让mitmproxy直接输出到控制台，避免管道阻塞
-            self.mitm_process = subprocess.Popen(command)
+            self.mitm_process = subprocess.Popen(command, env=env)
 
             self.logger.info(f"🔄 Cookie抓取器进程已启动，PID: {self.mitm_process.pid}")
 
-            # 等待并验证代理服务正常
+            # 等待并验证代理服务正常（有推送通道时以抓包器的就绪信号为准）
             self.logger.info("步骤4: 等待代理服务启动... (最多30秒)")
-            time.sleep(3)  # 减少初始等待时间
+            if not self.channel:
+                time.sleep(3)  # 减少初始等待时间
 
-            if self.proxy_manager.wait_for_proxy_ready(max_wait=30):
+            if self.proxy_manager.wait_for_proxy_ready(max_wait=30, ready_signal=self.channel):
                 self.logger.info(f"✅ Cookie抓取器已成功启动并运行正常 (PID: {self.mitm_process.pid})")
                 return True
             else:
@@ -143,8 +179,25 @@ class ReadCookie(object):
             self.stop_cookie_extractor()
             return False
 
+    def _arm_daemon(self, biz: str = None) -> bool:
+        """守护模式：确保常驻抓包器在运行，并为本次抓包 arm"""
+        if not self.daemon.ensure_started():
+            self.logger.error("❌ 常驻抓包守护进程不可用")
+            return False
+        self.channel = self.daemon.channel
+        if not self.daemon.arm(biz):
+            self.logger.error("❌ 常驻抓包守护进程 arm 失败")
+            return False
+        self.logger.info(f"🛰️ 常驻抓包器已 arm (biz={biz or '任意'})")
+        return True
+
     def stop_cookie_extractor(self):
         """停止后台的mitmdump进程并确保代理完全关闭"""
+        if self.daemon:
+            # 守护模式：只 disarm，进程常驻到运行结束
+            self.daemon.disarm()
+            self.logger.info("🛰️ 常驻抓包器已 disarm")
+            return
         self.logger.info("🧹 开始清理抓取器资源...")
         
         # 1. 直接停止mitmproxy进程
@@ -164,6 +217,8 @@ class ReadCookie(object):
                 self.logger.error(f"停止Cookie抓取器时发生错误: {e}")
         else:
             self.logger.info("Cookie抓取器未在运行或已停止。")
+        if self.channel:
+            self.channel.close()
         
         # 2. 使用新的ProxyManager确保代理设置被清理
         self.logger.info("正在验证并清理代理设置...")
@@ -178,13 +233,32 @@ class ReadCookie(object):
         else:
             self.logger.warning("⚠️ 网络连接验证失败，可能需要手动检查")
 
+    def has_captured(self) -> bool:
+        """
+        快速判断是否已抓到有效Cookie：有推送通道时只检查事件，否则回退为解析文件
+        """
+        if self.channel and self.channel.has_credential():
+            return True
+        if self.channel:
+            return False
+        return self.log_reader.latest_valid() is not None
+
     def wait_for_new_cookie(self, timeout: int = 60) -> bool:
         """
-        在指定时间内等待wechat_keys.txt文件被创建并包含有效内容。
+        在指定时间内等待抓包器推送有效凭证；推送通道不可用时等待wechat_keys.txt文件被创建并包含有效内容。
         """
         self.logger.info(f"正在等待Cookie数据写入 '{self.outfile}'... (超时: {timeout}秒)")
         start_time = time.time()
+        if self.channel:
+            if self.channel.wait(timeout):
+                self.logger.info("已收到抓包器推送的Cookie数据。")
+                return True
+            self.logger.error("等待Cookie超时！")
+            return False
         while time.time() - start_time < timeout:
+            if self.log_reader.latest_valid():
+                self.logger.info("检测到凭证日志中的新Cookie。")
+                return True
             if os.path.exists(self.outfile) and os.path.getsize(self.outfile) > 0:
                 time.sleep(1) # 等待文件写完
                 self.logger.info("检测到Cookie文件已生成。")
@@ -196,8 +270,17 @@ class ReadCookie(object):
 
     def get_latest_cookies(self):
         """
-        获取最新的cookie信息
+        获取最新的cookie信息（优先使用推送通道收到的记录，避免重新解析文件）
         """
+        record = self.channel.latest if self.channel else None
+        if record:
+            return {
+                'appmsg_token': record['appmsg_token'],
+                'biz': record['biz'],
+                'cookie_str': record['cookie_str'],
+                'headers': record.get('headers') or {},
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
         appmsg_token, biz, cookie_str, headers = self.parse_cookie()
         if appmsg_token and biz and cookie_str:
             return {
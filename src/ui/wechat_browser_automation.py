@@ -17,10 +17,14 @@ SSL证书错误处理:
 - 自动输入 "thisisunsafe" 绕过证书错误
 - 等待页面重新加载后继续后续操作
 """
+from __future__ import annotations
 
 import time
-import pyperclip
 import logging
+try:
+    import pyperclip
+except ImportError:
+    pyperclip = None  # 仅 UI 自动化发送链接时需要
 
 # 配置常量
 WECHAT_LINK_PATTERNS = [
@@ -917,6 +921,10 @@ class WeChatBrowserAutomation:
             if not cookie_reader:
                 return False
 
+            # 推送通道可用时只检查事件，不再整文件解析
+            if hasattr(cookie_reader, 'has_captured'):
+                return cookie_reader.has_captured()
+
             # 检查输出文件是否存在且有内容
             if not hasattr(cookie_reader, 'outfile') or not cookie_reader.outfile:
                 return False
@@ -0,0 +1,113 @@
+"""
+日志初始化：所有 handler 放在 QueueListener 后台线程中，爬取线程只把日志记录放入内存队列
+
+- 控制台与按次运行的文本日志：logs/wechat_spider_<时间>.log
+- 结构化日志（JSON Lines）：logs/wechat_spider_<时间>.jsonl，每行一条 {ts, level, logger, thread, msg, ...}
+- 消息的 %-格式化推迟到后台线程（被级别过滤掉的 DEBUG 日志不做任何格式化）
+- 导入期间其他模块通过 basicConfig 添加的文件 handler（如 wechat_automation.log）一并移到队列之后，
+  控制台 handler 由这里统一提供
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime
+from typing import Dict, Optional
+
+# LogRecord 自带属性；其余属性来自 extra=，写入 JSON 行
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonLineFormatter(logging.Formatter):
+    """每条日志一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """进程内队列：原样放入记录，格式化由 QueueListener 线程中的各 handler 完成"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_queue_logging(config: Dict = None, prefix: str = 'wechat_spider') -> logging.handlers.QueueListener:
+    """
+    配置根 logger；重复调用直接返回已启动的 listener
+    :param config: 见 config_manager.get_logging_config()
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    config = config or {}
+    root = logging.getLogger()
+    root.setLevel(config.get('level', 'INFO'))
+    for name, level in (config.get('levels') or {}).items():
+        logging.getLogger(name).setLevel(level)
+
+    text_formatter = logging.Formatter(config.get('format', '%(asctime)s - %(levelname)s - %(message)s'))
+    handlers = []
+    # 保留已有的文件 handler，丢弃已有的控制台 handler（避免重复输出）
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        if isinstance(handler, logging.FileHandler):
+            handlers.append(handler)
+        else:
+            handler.close()
+
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setLevel(config.get('console_level') or config.get('level', 'INFO'))
+    console_handler.setFormatter(text_formatter)
+    handlers.append(console_handler)
+
+    log_dir = config.get('log_dir', 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    file_handler = logging.FileHandler(os.path.join(log_dir, f"{prefix}_{stamp}.log"), encoding='utf-8')
+    file_handler.setFormatter(text_formatter)
+    handlers.append(file_handler)
+    if config.get('json_enabled', True):
+        json_handler = logging.FileHandler(os.path.join(log_dir, f"{prefix}_{stamp}.jsonl"), encoding='utf-8')
+        json_handler.setFormatter(JsonLineFormatter())
+        handlers.append(json_handler)
+
+    if not config.get('queue_enabled', True):
+        for handler in handlers:
+            root.addHandler(handler)
+        return None
+
+    log_queue = queue.SimpleQueue()
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_queue_logging)
+    return _listener
+
+
+def stop_queue_logging():
+    """写出队列中剩余的日志并停止后台线程"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.flush()
+    _listener = None
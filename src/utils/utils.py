@@ -1,5 +1,8 @@
 # utils.py
 # 工具模块，将字符串变成字典
+import hashlib
+
+
 def str_to_dict(s, join_symbol="\n", split_symbol=":"):
 	s_list = s.split(join_symbol)
 	data = dict()
@@ -9,3 +12,20 @@ def str_to_dict(s, join_symbol="\n", split_symbol=":"):
 			k, v = item.split(split_symbol, 1)
 			data[k] = v.strip()
 	return data
+
+
+def credential_id(auth_info):
+	"""
+	生成凭证标识，用于按凭证维度记录限流/熔断等状态
+	x-wechat-uin 对应微信用户会话（多次 re-key 不变），优先使用；缺失时退化为 appmsg_token 摘要
+	"""
+	if not auth_info:
+		return "unknown"
+	headers = auth_info.get('headers') or {}
+	uin = headers.get('x-wechat-uin')
+	if uin:
+		return f"uin:{uin}"
+	token = auth_info.get('appmsg_token') or auth_info.get('cookie_str') or ''
+	if not token:
+		return "unknown"
+	return "tok:" + hashlib.sha1(token.encode('utf-8')).hexdigest()[:12]